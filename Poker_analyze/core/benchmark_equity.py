@@ -0,0 +1,161 @@
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from deepAI import probability_win
+from hand_evaluator import evaluate, evaluate_many
+
+DEFAULT_OUTPUT = 'benchmark_equity.json'
+
+# 參考勝率（equity = 勝率 + 平局率 / 2），數值取自公開的勝率計算器
+REFERENCE_SPOTS = [
+    {'name': 'AA vs KK', 'own_cards': ['AS', 'AH'], 'n_players': 2, 'opponent_ranges': 'KK', 'equity': 0.8195},
+    {'name': 'AKo vs QQ', 'own_cards': ['AS', 'KH'], 'n_players': 2, 'opponent_ranges': 'QQ', 'equity': 0.4313},
+    {'name': '22 vs AKo', 'own_cards': ['2S', '2H'], 'n_players': 2, 'opponent_ranges': 'AKo', 'equity': 0.5255},
+    {'name': 'AA vs 1 random', 'own_cards': ['AS', 'AH'], 'n_players': 2, 'equity': 0.8520},
+    {'name': '72o vs 1 random', 'own_cards': ['7S', '2H'], 'n_players': 2, 'equity': 0.3458},
+    {'name': 'AA vs 2 random', 'own_cards': ['AS', 'AH'], 'n_players': 3, 'equity': 0.7350},
+    {'name': 'AA vs 4 random', 'own_cards': ['AS', 'AH'], 'n_players': 5, 'equity': 0.5567},
+]
+REFERENCE_TOLERANCE = 0.006  # 參考值的容許誤差，模擬次數少時再放寬到 4 倍標準誤
+
+# 同一個翻牌情境下，各模擬模式與完整列舉的結果必須一致
+CONSISTENCY_SPOT = {'own_cards': ['AS', 'KD'], 'n_players': 2, 'common_cards': ['KC', '7H', '2S']}
+CONSISTENCY_MODES = ['vectorized', 'adaptive', 'loop']
+
+
+def check_reference_equities(trials):
+    """比對參考勝率，回傳每個情境的結果"""
+    results = []
+    for spot in REFERENCE_SPOTS:
+        start = time.perf_counter()
+        result = probability_win(spot['own_cards'], spot['n_players'], number_games=trials, seed=1,
+                                 opponent_ranges=spot.get('opponent_ranges'), details=True,
+                                 use_cache=False, use_preflop_table=False)
+        equity = result['win'] + result['tie'] / 2
+        passed = abs(equity - spot['equity']) <= max(REFERENCE_TOLERANCE, 4 * result['win_se'])
+        results.append({
+            'name': spot['name'],
+            'equity': equity,
+            'reference': spot['equity'],
+            'error': equity - spot['equity'],
+            'passed': passed,
+            'seconds': time.perf_counter() - start
+        })
+        print(f"{'通過' if passed else '失敗'} {spot['name']}：{equity:.4f}（參考值 {spot['equity']:.4f}）")
+    return results
+
+
+def check_mode_consistency():
+    """同一情境下比較各模式與完整列舉的差距（以標準誤的倍數表示）"""
+    exact = probability_win(**CONSISTENCY_SPOT, mode='exact', details=True, use_cache=False)
+    results = []
+    for mode in CONSISTENCY_MODES:
+        trials = 20_000 if mode == 'loop' else None
+        result = probability_win(**CONSISTENCY_SPOT, mode=mode, number_games=trials, seed=1, details=True,
+                                 use_cache=False, target_width=0.01 if mode == 'adaptive' else None)
+        z = abs(result['win'] - exact['win']) / max(result['win_se'], 1e-12)
+        passed = z < 4
+        results.append({'mode': mode, 'win': result['win'], 'exact_win': exact['win'], 'z': z, 'passed': passed})
+        print(f"{'通過' if passed else '失敗'} {mode} 模式：{result['win']:.4f}（完整列舉 {exact['win']:.4f}，z = {z:.2f}）")
+    return results
+
+
+def benchmark_evaluator(n_hands):
+    """測量評估器每秒可評估的 7 張牌組數（批次與單手）"""
+    rng = np.random.default_rng(0)
+    hands = np.argsort(rng.random((n_hands, 52)), axis=1)[:, :7].astype(np.int8)
+    evaluate_many(hands[:1000])  # 先建立查找表
+
+    start = time.perf_counter()
+    evaluate_many(hands)
+    batch_rate = n_hands / (time.perf_counter() - start)
+
+    single = hands[:20_000].tolist()
+    start = time.perf_counter()
+    for hand in single:
+        evaluate(hand)
+    single_rate = len(single) / (time.perf_counter() - start)
+
+    print(f"評估器：批次 {batch_rate:,.0f} 手/秒，單手 {single_rate:,.0f} 手/秒")
+    return {'batch_hands_per_second': batch_rate, 'single_hands_per_second': single_rate}
+
+
+def benchmark_trials(trials, player_counts=(2, 6, 9)):
+    """測量向量化蒙地卡羅模擬在不同玩家數下每秒的模擬次數"""
+    results = {}
+    for n_players in player_counts:
+        start = time.perf_counter()
+        probability_win(['AS', 'KH'], n_players, number_games=trials, mode='vectorized', seed=1,
+                        use_cache=False)
+        rate = trials / (time.perf_counter() - start)
+        results[str(n_players)] = rate
+        print(f"{n_players} 人：{rate:,.0f} 次模擬/秒")
+    return results
+
+
+def benchmark_memory(trials):
+    """測量一次模擬在 Python 端配置的記憶體峰值，以及行程的最大常駐記憶體"""
+    tracemalloc.start()
+    probability_win(['AS', 'KH'], 9, number_games=trials, mode='vectorized', seed=1, use_cache=False)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # ru_maxrss 在 macOS 的單位為位元組，在 Linux 為 KB
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 1024)
+    print(f"記憶體：模擬峰值 {peak / 2 ** 20:.1f} MB，行程最大常駐 {max_rss:.1f} MB")
+    return {'simulation_peak_mb': peak / 2 ** 20, 'max_rss_mb': max_rss}
+
+
+def run_benchmark(output=DEFAULT_OUTPUT, trials=200_000, quick=False):
+    """
+    執行完整的勝率引擎基準測試並寫入 JSON 結果
+    :param output: 結果檔案路徑
+    :param trials: 參考勝率與吞吐量測試的模擬次數
+    :param quick: 快速模式（減少模擬次數，只用於確認流程）
+    :return: 結果字典
+    """
+    if quick:
+        trials = 20_000
+    print("=== 參考勝率 ===")
+    reference = check_reference_equities(trials)
+    print("=== 模式一致性 ===")
+    consistency = check_mode_consistency()
+    print("=== 評估器吞吐量 ===")
+    evaluator = benchmark_evaluator(100_000 if quick else 1_000_000)
+    print("=== 模擬吞吐量 ===")
+    throughput = benchmark_trials(trials)
+    print("=== 記憶體 ===")
+    memory = benchmark_memory(trials)
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'trials': trials,
+        'reference_equities': reference,
+        'mode_consistency': consistency,
+        'evaluator': evaluator,
+        'trials_per_second': throughput,
+        'memory': memory,
+        'passed': all(item['passed'] for item in reference + consistency)
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"結果已寫入：{output}（{'全部通過' if results['passed'] else '有項目失敗'}）")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='勝率引擎的正確性與效能基準測試')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='結果 JSON 檔案路徑')
+    parser.add_argument('--trials', type=int, default=200_000, help='每項測試的模擬次數')
+    parser.add_argument('--quick', action='store_true', help='快速模式（較少模擬次數）')
+    args = parser.parse_args()
+    run_benchmark(args.output, trials=args.trials, quick=args.quick)
@@ -0,0 +1,141 @@
+import argparse
+import time
+
+import numpy as np
+
+# 加注額（跟注之外再投入的籌碼）佔「底池 + 跟注額」的比例，另外固定包含全下
+RAISE_FRACTIONS = np.linspace(0.25, 3.0, 45)
+FOLD_SCALE = 1.0  # 對手棄牌傾向：1.0 表示對手以最低防守頻率防守，使純詐唬剛好不賺不賠
+MAX_FOLD_PROBABILITY = 0.9  # 單一對手棄牌機率的上限
+
+
+def action_evs(equity, pot_size, current_bet, stack, n_opponents=1, fold_scale=FOLD_SCALE,
+               fractions=RAISE_FRACTIONS):
+    """
+    一次向量化計算棄牌、跟注（或過牌）與每個加注尺寸的期望值（批次）
+    期望值以 BB 表示，為此刻之後的籌碼淨變化（已投入底池的籌碼視為沉沒成本，棄牌為 0）；
+    對手以門檻策略應對加注：牌力低於棄牌機率的分位數就棄牌，其餘跟注（只考慮一位跟注者），
+    因此被跟注時的勝率為 (勝率 - 棄牌機率) / (1 - 棄牌機率)，勝率低於棄牌機率的部分只剩詐唬價值
+    :param equity: 每個狀態的勝率（勝率 + 平局率 / 2），形狀 (N,) 或純量
+    :param pot_size: 底池大小（已包含對手的下注）
+    :param current_bet: 需要跟注的金額
+    :param stack: 有效籌碼，0 或負值表示未知（不限制加注額，也不考慮全下）
+    :param n_opponents: 尚未棄牌的對手數，加注需要全部對手棄牌才直接贏得底池
+    :param fold_scale: 對手棄牌傾向的倍數
+    :param fractions: 加注尺寸網格
+    :return: (期望值, 本次投入的籌碼)，形狀皆為 (N, 2 + 尺寸數 + 1)，欄位依序為棄牌、跟注、各加注尺寸、全下
+    """
+    equity, pot_size, current_bet, stack, n_opponents = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(value, dtype=float)) for value in
+          (equity, pot_size, current_bet, stack, n_opponents)))
+    stack = np.where(stack > 0, stack, np.inf)
+    call = np.minimum(current_bet, stack)
+    base = pot_size + call  # 跟注後的底池
+    room = stack - call  # 跟注後還能加注的籌碼
+
+    raises = np.empty((len(equity), len(fractions) + 1))
+    np.minimum(np.outer(base, fractions), room[:, None], out=raises[:, :-1])
+    raises[:, -1] = np.where(np.isfinite(room), room, 0)
+    valid = raises > 0
+
+    # 單一對手的棄牌機率取純詐唬的損益平衡點（加注額 / 加注後的底池），全部對手都棄牌才贏得底池
+    fold = np.minimum(fold_scale * raises / np.maximum(base[:, None] + raises, 1e-9), MAX_FOLD_PROBABILITY)
+    called_equity = np.clip((equity[:, None] - fold) / (1 - fold), 0, 1)
+    called = called_equity * (base[:, None] + 2 * raises) - (call[:, None] + raises)
+    fold **= np.maximum(n_opponents, 1)[:, None]
+
+    evs = np.empty((len(equity), raises.shape[1] + 2))
+    evs[:, 0] = np.where(call > 0, 0.0, -np.inf)  # 不需跟注時過牌優於棄牌
+    evs[:, 1] = equity * base - call
+    evs[:, 2:] = np.where(valid, fold * pot_size[:, None] + (1 - fold) * called, -np.inf)
+
+    amounts = np.empty_like(evs)
+    amounts[:, 0] = 0.0
+    amounts[:, 1] = call
+    amounts[:, 2:] = call[:, None] + raises
+    return evs, amounts
+
+
+def best_actions(equity, pot_size, current_bet, stack, n_opponents=1, fold_scale=FOLD_SCALE,
+                 fractions=RAISE_FRACTIONS):
+    """
+    選出期望值最高的動作（批次，參數同 action_evs）
+    :return: 每個狀態的 {'action', 'amount', 'ev'} 字典列表；加注的 amount 為本次投入的總籌碼（跟注 + 加注額）
+    """
+    evs, amounts = action_evs(equity, pot_size, current_bet, stack, n_opponents, fold_scale, fractions)
+    best = np.argmax(evs, axis=1)
+    decisions = []
+    for row, index in enumerate(best):
+        amount = round(float(amounts[row, index]), 2)
+        if index == 0:
+            action = 'fold'
+        elif index == 1:
+            action = 'call' if amount > 0 else 'check'
+        else:
+            action = 'raise'
+        decisions.append({'action': action, 'amount': amount, 'ev': float(evs[row, index])})
+    return decisions
+
+
+def size_actions(actions, equity, pot_size, current_bet, stack, n_opponents=1, fold_scale=FOLD_SCALE,
+                 fractions=RAISE_FRACTIONS):
+    """
+    為已選定的動作決定金額並計算期望值（批次，其餘參數同 action_evs）：加注時在尺寸網格中選期望值最高的尺寸，
+    籌碼不足以加注時改為跟注；面對下注時的過牌等同棄牌
+    :param actions: 每個狀態已選定的動作（'fold'、'check'、'call' 或 'raise'）
+    :return: 每個狀態的 {'action', 'amount', 'ev'} 字典列表，amount 為本次投入的總籌碼
+    """
+    evs, amounts = action_evs(equity, pot_size, current_bet, stack, n_opponents, fold_scale, fractions)
+    decisions = []
+    for row, action in enumerate(actions):
+        index = 1
+        if action == 'raise':
+            best = 2 + int(np.argmax(evs[row, 2:]))
+            if np.isfinite(evs[row, best]):
+                index = best
+            else:
+                action = 'call'
+        if action == 'fold' or (action == 'check' and amounts[row, 1] > 0):
+            decisions.append({'action': action, 'amount': 0, 'ev': 0.0})
+        elif action == 'check':
+            decisions.append({'action': action, 'amount': 0, 'ev': float(evs[row, 1])})
+        else:
+            decisions.append({'action': action, 'amount': round(float(amounts[row, index]), 2),
+                              'ev': float(evs[row, index])})
+    return decisions
+
+
+def raise_chips(multiple, pot_size, current_bet, stack):
+    """
+    將以底池倍數表示的加注換算為本次投入的總籌碼（跟注 + 加注額，與 RAISE_FRACTIONS 相同的定義）
+    :param multiple: 加注額佔「底池 + 跟注額」的倍數
+    :param stack: 有效籌碼，0 或負值表示未知（不設上限）
+    :return: 投入的籌碼（BB）
+    """
+    chips = current_bet + multiple * (pot_size + current_bet)
+    return round(min(chips, stack) if stack > 0 else chips, 2)
+
+
+def best_action(equity, pot_size, current_bet, stack, n_opponents=1, fold_scale=FOLD_SCALE):
+    """單一狀態的最佳動作與期望值"""
+    return best_actions(equity, pot_size, current_bet, stack, n_opponents, fold_scale)[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='以期望值計算最佳動作與加注尺寸')
+    parser.add_argument('--equity', type=float, required=True, help='勝率（勝率 + 平局率 / 2）')
+    parser.add_argument('--pot', type=float, required=True, help='底池大小（BB）')
+    parser.add_argument('--bet', type=float, default=0.0, help='需要跟注的金額（BB）')
+    parser.add_argument('--stack', type=float, default=100.0, help='有效籌碼（BB）')
+    parser.add_argument('--opponents', type=int, default=1, help='尚未棄牌的對手數')
+    parser.add_argument('--fold-scale', type=float, default=FOLD_SCALE, help='對手棄牌傾向的倍數')
+    args = parser.parse_args()
+
+    decision = best_action(args.equity, args.pot, args.bet, args.stack, args.opponents, args.fold_scale)
+    repeats = 10_000
+    start = time.perf_counter()
+    for _ in range(repeats):
+        best_action(args.equity, args.pot, args.bet, args.stack, args.opponents, args.fold_scale)
+    elapsed = (time.perf_counter() - start) / repeats
+    print(f"最佳動作：{decision['action']} {decision['amount']}（EV {decision['ev']:+.2f} BB）")
+    print(f"每次計算 {elapsed * 1e6:.1f} 微秒")
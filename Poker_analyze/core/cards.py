@@ -0,0 +1,162 @@
+import functools
+import re
+
+import numpy as np
+
+RANKS = '23456789TJQKA'  # 牌面值，索引 0-12 對應 2-A
+SUITS = 'cdhs'  # 花色，索引 0-3 對應 梅花/方塊/紅心/黑桃
+
+# 視覺模型可能輸出的花色寫法（符號、中文、英文）
+_SUIT_NAMES = {
+    '♣': 0, '♧': 0, '梅花': 0, '草花': 0, 'clubs': 0, 'club': 0,
+    '♦': 1, '♢': 1, '方塊': 1, '方块': 1, '方片': 1, 'diamonds': 1, 'diamond': 1,
+    '♥': 2, '♡': 2, '紅心': 2, '红心': 2, '紅桃': 2, '红桃': 2, 'hearts': 2, 'heart': 2,
+    '♠': 3, '♤': 3, '黑桃': 3, 'spades': 3, 'spade': 3,
+}
+_SUIT_PATTERN = re.compile('|'.join(sorted(map(re.escape, _SUIT_NAMES), key=len, reverse=True)),
+                           re.IGNORECASE)
+_BRACKETS = re.compile(r'[(（\[【]([^)）\]】]*)[)）\]】]')
+_SEPARATORS = re.compile(r'[\s\-_:：,，.。/]|\bof\b', re.IGNORECASE)
+
+# 遮罩的位元配置與整數編號相同：第 suit * 13 + rank 位元代表一張牌
+FULL_DECK_MASK = (1 << 52) - 1
+SUIT_MASKS = [0x1FFF << (13 * suit) for suit in range(4)]  # 每種花色的 13 張牌
+RANK_MASKS = [sum(1 << (13 * suit + rank) for suit in range(4)) for rank in range(13)]  # 每種牌面的 4 張牌
+CARD_MASKS = [1 << card for card in range(52)]
+
+POPCOUNT = [bin(i).count('1') for i in range(1 << 13)]  # 13 位元的位元數查找表
+
+
+def _clean(text):
+    return _SEPARATORS.sub('', text).upper().replace('10', 'T')
+
+
+def _take_suits(text, suits):
+    """移除字串中的花色符號或名稱，並把找到的花色加入 suits"""
+    return _SUIT_PATTERN.sub(lambda m: suits.add(_SUIT_NAMES[m.group(0).lower()]) or ' ', text)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_text(text):
+    """解析單張牌的字串（結果會快取，重複的牌面字串只解析一次）"""
+    suits = set()
+    inside = ' '.join(_BRACKETS.findall(text))
+    rest = _clean(_take_suits(_BRACKETS.sub(' ', text), suits))
+    if not suits and len(rest) == 2 and rest[1].lower() in SUITS:  # 'AS'、'Kh'、'10c'
+        suits.add(SUITS.index(rest[1].lower()))
+        rest = rest[0]
+    # 括號外沒有花色或牌面時才採用括號內的標註，例如 'K(方塊)'、'♦(K)'
+    if inside and (not suits or not rest):
+        inside = _clean(_take_suits(inside, suits if not suits else set()))
+        rest = rest or inside
+    if len(suits) != 1 or len(rest) != 1 or rest not in RANKS:
+        raise ValueError(f"無效的牌面：{text}")
+    return suits.pop() * 13 + RANKS.index(rest)
+
+
+def card_to_int(card):
+    """
+    將牌面轉換為整數編號
+    :param card: 牌面字串，例如 'AS'、'Kh'、'10c'、'K♦'、'♠A'、'K(方塊)'、'紅心Q'，或已是整數編號
+    :return: 0-51 的整數編號（suit * 13 + rank）
+    """
+    if isinstance(card, (int, np.integer)):
+        if not 0 <= card < 52:
+            raise ValueError(f"無效的牌面：{card}")
+        return int(card)
+    return _parse_text(card.strip())
+
+
+def cards_to_ints(cards):
+    """將多張牌轉換為整數編號列表"""
+    return [card_to_int(card) for card in cards]
+
+
+def int_to_card(card_id):
+    """將整數編號轉換回牌面字串，例如 51 -> 'As'"""
+    return RANKS[card_id % 13] + SUITS[card_id // 13]
+
+
+def cards_to_mask(cards):
+    """
+    將多張牌轉換為 52 位元遮罩
+    :param cards: 牌面字串或整數編號的列表
+    :return: 遮罩整數
+    """
+    mask = 0
+    for card in cards:
+        bit = CARD_MASKS[card_to_int(card)]
+        if mask & bit:
+            raise ValueError(f"牌面重複：{card}")
+        mask |= bit
+    return mask
+
+
+def mask_to_ints(mask):
+    """列出遮罩中所有牌的整數編號（由小到大）"""
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(low.bit_length() - 1)
+        mask ^= low
+    return cards
+
+
+def popcount(mask):
+    """計算 52 位元遮罩中的牌數"""
+    return (POPCOUNT[mask & 0x1FFF] + POPCOUNT[(mask >> 13) & 0x1FFF]
+            + POPCOUNT[(mask >> 26) & 0x1FFF] + POPCOUNT[mask >> 39])
+
+
+def suit_rank_masks(mask):
+    """回傳四種花色各自的 13 位元牌面遮罩"""
+    return [(mask >> (13 * suit)) & 0x1FFF for suit in range(4)]
+
+
+def rank_mask(mask):
+    """回傳出現過的牌面（不分花色）的 13 位元遮罩"""
+    return (mask | (mask >> 13) | (mask >> 26) | (mask >> 39)) & 0x1FFF
+
+
+def suit_counts(mask):
+    """回傳四種花色各自的張數"""
+    return [POPCOUNT[suit_mask] for suit_mask in suit_rank_masks(mask)]
+
+
+def rank_counts(mask):
+    """回傳 13 種牌面各自的張數"""
+    suits = suit_rank_masks(mask)
+    return [((suits[0] >> rank) & 1) + ((suits[1] >> rank) & 1)
+            + ((suits[2] >> rank) & 1) + ((suits[3] >> rank) & 1) for rank in range(13)]
+
+
+def multiple_ranks(mask, count):
+    """回傳至少出現 count 張的牌面所組成的 13 位元遮罩（例如 count=2 為對子以上）"""
+    suits = suit_rank_masks(mask)
+    if count == 1:
+        return suits[0] | suits[1] | suits[2] | suits[3]
+    if count == 2:
+        return ((suits[0] & (suits[1] | suits[2] | suits[3])) | (suits[1] & (suits[2] | suits[3]))
+                | (suits[2] & suits[3]))
+    if count == 3:
+        return ((suits[0] & suits[1] & (suits[2] | suits[3])) | ((suits[0] | suits[1]) & suits[2] & suits[3]))
+    return suits[0] & suits[1] & suits[2] & suits[3]
+
+
+def straight_high(ranks):
+    """
+    回傳 13 位元牌面遮罩中最大順子的頂張（A-5 順子頂張為 5），沒有順子回傳 -1
+    :param ranks: 13 位元牌面遮罩（見 rank_mask）
+    """
+    # 五個連續位元都存在的位置：以位移後的 AND 一次找出所有順子
+    runs = ranks & (ranks >> 1) & (ranks >> 2) & (ranks >> 3) & (ranks >> 4)
+    if runs:
+        return runs.bit_length() - 1 + 4
+    if ranks & 0x100F == 0x100F:  # A-2-3-4-5
+        return 3
+    return -1
+
+
+def rank_values(mask):
+    """回傳遮罩中每張牌的數值（2-14，由大到小），供既有以數值計算的邏輯使用"""
+    return sorted((card % 13 + 2 for card in mask_to_ints(mask)), reverse=True)
@@ -0,0 +1,38 @@
+import argparse
+import os
+import time
+
+from mlp import load_binary_weights, load_json_weights, save_binary_weights
+
+DEFAULT_INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model.json')
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model.bin')
+
+
+def convert(input_path=DEFAULT_INPUT, output_path=DEFAULT_OUTPUT):
+    """
+    將 model.json 轉換為二進位模型檔（只保留推論權重，不含 optimizer_weights）
+    :param input_path: model.json 路徑
+    :param output_path: 輸出的二進位檔路徑
+    """
+    weights = load_json_weights(input_path)
+    size = save_binary_weights(weights, output_path)
+
+    # 重新載入確認內容一致
+    start = time.perf_counter()
+    loaded, _ = load_binary_weights(output_path)
+    elapsed = time.perf_counter() - start
+    for (kernel, bias), (loaded_kernel, loaded_bias) in zip(weights, loaded):
+        if not ((kernel == loaded_kernel).all() and (bias == loaded_bias).all()):
+            raise ValueError("轉換後的權重與原始模型不一致")
+
+    shapes = ' -> '.join(str(kernel.shape[0]) for kernel, _ in weights) + f' -> {weights[-1][0].shape[1]}'
+    print(f"模型已轉換：{output_path}（{shapes}）")
+    print(f"檔案大小：{os.path.getsize(input_path):,} -> {size:,} 位元組，載入時間 {elapsed * 1e6:.0f} 微秒")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='將 model.json 轉換為二進位模型檔')
+    parser.add_argument('--input', default=DEFAULT_INPUT, help='model.json 路徑')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='輸出的二進位檔路徑')
+    args = parser.parse_args()
+    convert(args.input, args.output)
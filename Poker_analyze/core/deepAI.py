@@ -1,5 +1,25 @@
+import re
 import time
 
+from cards import FULL_DECK_MASK, cards_to_ints, cards_to_mask, int_to_card, mask_to_ints
+from equity import (ADAPTIVE_MAX_TRIALS, DEFAULT_TRIALS, EXACT_COST_RATIO, _known_cards, adaptive_equity,
+                    equity_result, exact_combination_count, exact_equity, monte_carlo_equity,
+                    parallel_monte_carlo_equity)
+from hand_evaluator import evaluate, hand_name
+from isomorphism import canonical_key
+from lru_cache import LRUCache
+from preflop_table import MAX_OPPONENTS, load_preflop_table
+from ranges import range_equity
+
+LOOP_GAMES = 1000  # 逐局模擬（mode='loop'）預設的模擬次數
+EQUITY_CACHE_SIZE = 4096  # 勝率快取最多保留的情境數
+
+# probability_win 的勝率快取，鍵值為花色同構後的情境加上計算參數
+EQUITY_CACHE = LRUCache(maxsize=EQUITY_CACHE_SIZE)
+
+# 指定了花色的具體組合（例如 AsKs），這類範圍無法與花色同構的鍵值一起使用
+_SUITED_COMBO = re.compile(r'[2-9TJQKA][cdhs][2-9TJQKA][cdhs]', re.IGNORECASE)
+
 
 class Bot:
     def __init__(self):
@@ -8,55 +28,193 @@ class Bot:
         self.hand = ''  # 儲存手牌的描述
 
 
-def probability_win(own_cards, n_players, common_cards=None):
+def players_score(list_bots, table):
+    """
+    計算每位玩家（手牌加上公共牌）的牌力，結果寫入 Bot.score 與 Bot.hand
+    :param list_bots: 要計算的機器人列表
+    :param table: 五張公共牌
+    """
+    for bot in list_bots:
+        bot.score = evaluate(list(bot.cards) + list(table))
+        bot.hand = hand_name(bot.score)
+
+
+def probability_win(own_cards, n_players, common_cards=None, number_games=None,
+                    mode='auto', seed=None, details=False, exact_threshold=None, workers=None,
+                    target_width=None, time_budget=None, decision_threshold=None,
+                    use_preflop_table=True, opponent_ranges=None, use_cache=True, dead_cards=None,
+                    known_hands=None):
     """
     計算擁有指定手牌的機器人在德州撲克中獲勝的機率。
     :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
     :param n_players: 總共參與遊戲的玩家數量
     :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param number_games: （可選）模擬次數，預設依模式而定
+    :param mode: 'auto' 翻牌前優先查表，情境數夠少時完整列舉，否則依參數選擇自適應、平行或向量化模擬；
+                 'table' 為查詢翻牌前勝率表，'exact' 為完整列舉，'vectorized' 為向量化批次模擬，
+                 'parallel' 為多行程平行模擬，'adaptive' 為自適應精度模擬，
+                 'range' 為對上對手範圍的模擬，'loop' 為逐局模擬
+    :param seed: （可選）亂數種子
+    :param details: 是否回傳包含敗率與標準誤的完整結果字典
+    :param exact_threshold: （可選）auto 模式改用完整列舉的情境數上限，預設為模擬次數的 EXACT_COST_RATIO 倍
+    :param workers: （可選）平行模擬的工作行程數，相同 seed 與 workers 會得到相同結果
+    :param target_width: （可選）自適應模擬的勝率信賴區間目標寬度
+    :param time_budget: （可選）自適應模擬可用的時間（秒）
+    :param decision_threshold: （可選）自適應模擬的決策門檻，信賴區間不包含此值即停止
+    :param use_preflop_table: auto 模式在翻牌前是否使用預先計算的勝率表（檔案存在時）
+    :param opponent_ranges: （可選）對手範圍，例如 "TT+, AQs+, KQo"；可給單一範圍套用到所有對手，
+                            或給每位對手一個範圍的列表（格式見 ranges.parse_range）。
+                            指定後 auto 模式會改用範圍模擬
+    :param use_cache: 是否使用勝率快取（EQUITY_CACHE），花色互換後相同的情境會共用結果
+    :param dead_cards: （可選）已知不在牌堆中的牌（亮出、棄掉或燒掉的牌）
+    :param known_hands: （可選）已知的對手手牌，{對手: 兩張牌} 字典或兩張牌的列表；
+                        這些對手仍計入 n_players，opponent_ranges 只需給其餘的對手
     :return: 獲勝的機率以及平局的機率
     """
+    dead, known_holes = _known_cards(dead_cards, known_hands)
+    n_unknown = n_players - 1 - len(known_holes)  # 手牌未知的對手人數
+    if n_unknown < 0:
+        raise ValueError(f"已知手牌數（{len(known_holes)}）超過對手人數（{n_players - 1}）")
+    if opponent_ranges is not None:
+        if not isinstance(opponent_ranges, (list, tuple)):
+            opponent_ranges = [opponent_ranges] * n_unknown
+        if len(opponent_ranges) != n_unknown:
+            raise ValueError(f"對手範圍數量（{len(opponent_ranges)}）與手牌未知的對手人數（{n_unknown}）不符")
+        if mode == 'auto':
+            mode = 'range'
+
+    cache_key = None
+    if use_cache:
+        cache_key = _cache_key(own_cards, n_players, common_cards, dead, known_holes, opponent_ranges,
+                               (mode, number_games, seed, exact_threshold, workers, target_width,
+                                time_budget, decision_threshold, use_preflop_table))
+        cached = EQUITY_CACHE.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return dict(cached) if details else (cached['win'], cached['tie'])
+
+    if mode == 'auto':
+        if exact_threshold is None:  # 完整列舉的預估成本低於同樣精度的模擬時才列舉
+            exact_threshold = EXACT_COST_RATIO * (number_games or DEFAULT_TRIALS)
+        n_combinations = exact_combination_count(n_unknown, len(common_cards or []),
+                                                 len(dead) + 2 * len(known_holes))
+        if (use_preflop_table and not common_cards and not dead and not known_holes
+                and n_players - 1 <= MAX_OPPONENTS and load_preflop_table() is not None):
+            mode = 'table'
+        elif n_combinations <= exact_threshold:
+            mode = 'exact'
+        elif target_width is not None or time_budget is not None or decision_threshold is not None:
+            mode = 'adaptive'
+        else:
+            mode = 'parallel' if workers and workers > 1 else 'vectorized'
+
+    if mode == 'table':
+        if dead or known_holes:
+            raise ValueError("翻牌前勝率表不支援死牌或已知的對手手牌")
+        table = load_preflop_table()
+        if table is None:
+            raise FileNotFoundError("翻牌前勝率表不存在，請先執行 preflop_table.py 建立")
+        result = table.lookup(own_cards, n_players)
+    elif mode == 'exact':
+        result = exact_equity(own_cards, n_players, common_cards, dead, known_holes)
+    elif mode == 'vectorized':
+        result = monte_carlo_equity(own_cards, n_players, common_cards,
+                                    trials=number_games or DEFAULT_TRIALS, seed=seed,
+                                    dead_cards=dead, known_hands=known_holes)
+    elif mode == 'parallel':
+        result = parallel_monte_carlo_equity(own_cards, n_players, common_cards,
+                                             trials=number_games or DEFAULT_TRIALS,
+                                             seed=seed, workers=workers,
+                                             dead_cards=dead, known_hands=known_holes)
+    elif mode == 'adaptive':
+        result = adaptive_equity(own_cards, n_players, common_cards,
+                                 target_width=target_width, time_budget=time_budget,
+                                 decision_threshold=decision_threshold,
+                                 max_trials=number_games or ADAPTIVE_MAX_TRIALS, seed=seed,
+                                 dead_cards=dead, known_hands=known_holes)
+    elif mode == 'range':
+        # 已知的對手手牌等同只有一個組合的範圍
+        ranges = list(opponent_ranges or [None] * n_unknown)
+        ranges += [int_to_card(a) + int_to_card(b) for a, b in known_holes]
+        result = range_equity(own_cards, ranges, common_cards,
+                              trials=number_games or DEFAULT_TRIALS, seed=seed, dead_cards=dead)
+    elif mode == 'loop':
+        number_games = number_games or LOOP_GAMES
+        n_win, n_tie = _simulate_loop(own_cards, n_players, common_cards, number_games, seed,
+                                      dead, known_holes)
+        result = equity_result(n_win, n_tie, number_games)
+    else:
+        raise ValueError(f"未知的模擬模式：{mode}")
+
+    if cache_key is not None:
+        EQUITY_CACHE.put(cache_key, dict(result))
+    if details:
+        return result
+    return result['win'], result['tie']
+
+
+def _cache_key(own_cards, n_players, common_cards, dead, known_holes, opponent_ranges, params):
+    """
+    計算 probability_win 的快取鍵值
+    對手範圍只有在全部是不指定花色的範圍字串時才能快取，否則回傳 None（不使用快取）
+    :param own_cards: 自己手中的兩張牌
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: 桌面上已經揭示的公共牌
+    :param dead: 死牌
+    :param known_holes: 已知的對手手牌
+    :param opponent_ranges: 每位對手的範圍列表（或 None）
+    :param params: 其他會影響結果的參數
+    :return: 快取鍵值，或 None
+    """
+    ranges = None
+    if opponent_ranges is not None:
+        if not all(spec is None or (isinstance(spec, str) and not _SUITED_COMBO.search(spec))
+                   for spec in opponent_ranges):
+            return None
+        ranges = tuple(opponent_ranges)
+    return canonical_key(own_cards, common_cards, n_players, dead, known_holes) + (ranges,) + params
+
+
+def _simulate_loop(own_cards, n_players, common_cards, number_games, seed=None, dead=(), known_holes=()):
+    """
+    逐局模擬遊戲，回傳機器人獲勝與平局的次數
+    :param own_cards: 自己手中的兩張牌
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: 桌面上已經揭示的公共牌
+    :param number_games: 模擬遊戲的次數
+    :param seed: 亂數種子
+    :param dead: 死牌的整數編號
+    :param known_holes: 已知的對手手牌（整數編號）
+    :return: 獲勝次數以及平局次數
+    """
     import random  # 將random模組導入，用於隨機選取牌
-    from game.poker_score import players_score  # 導入評分函數，計算玩家的手牌評分
 
-    number_games = 1000  # 模擬遊戲的次數，用於估算獲勝機率
+    random = random.Random(seed)  # 使用獨立的亂數產生器，方便重現結果
     n_win = 0  # 計算機器人贏得遊戲的次數
     n_tie = 0  # 計算機器人與其他玩家平局的次數
     ai = Bot()  # 創建機器人玩家
-    ai.cards = own_cards  # 設置機器人的兩張手牌
-
-    # 建立一副撲克牌（52張）
-    deck = ['2C', '3C', '4C', '5C', '6C', '7C', '8C', '9C', 'TC', 'JC', 'QC', 'KC', 'AC',
-            '2S', '3S', '4S', '5S', '6S', '7S', '8S', '9S', 'TS', 'JS', 'QS', 'KS', 'AS',
-            '2H', '3H', '4H', '5H', '6H', '7H', '8H', '9H', 'TH', 'JH', 'QH', 'KH', 'AH',
-            '2D', '3D', '4D', '5D', '6D', '7D', '8D', '9D', 'TD', 'JD', 'QD', 'KD', 'AD']
+    ai.cards = cards_to_ints(own_cards)  # 設置機器人的兩張手牌
+    board = cards_to_ints(common_cards or [])
 
-    # 從撲克牌中移除機器人手中的兩張牌
-    [deck.remove(card) for card in ai.cards]
+    # 牌堆為 52 張牌的遮罩扣掉機器人手牌、已揭示的公共牌、死牌與已知的對手手牌
+    known_cards = [card for hole in known_holes for card in hole]
+    deck = mask_to_ints(FULL_DECK_MASK & ~cards_to_mask(ai.cards + board + list(dead) + known_cards))
+    n_missing = 5 - len(board)
 
-    # 如果桌面上已有公共牌，則也從撲克牌中移除這些牌
-    if common_cards is not None:
-        [deck.remove(card) for card in common_cards]
-
-    # 創建與對手玩家數量相符的機器人
+    # 創建與對手玩家數量相符的機器人，手牌已知的對手固定使用已知的手牌
     list_bots = []
     for nbot in range(n_players - 1):
         list_bots.append(Bot())
+    for bot, hole in zip(list_bots, known_holes):
+        bot.cards = list(hole)
+    random_bots = list_bots[len(known_holes):]
 
     # 開始模擬遊戲
     for i in range(number_games):
-        bot_deck = deck.copy()  # 每場遊戲重新洗牌，使用未被移除的牌
-
-        # 隨機分配兩張手牌給每位對手玩家
-        for bot in list_bots:
-            bot.cards = random.sample(bot_deck, 2)  # 從剩下的牌中抽取兩張牌作為手牌
-            [bot_deck.remove(bot.cards[i]) for i in range(2)]  # 將抽取的牌從牌堆中移除
-
-        # 決定桌面上的公共牌，如果公共牌已經有部分揭示，則只抽取剩下的部分
-        if common_cards is None:
-            table = random.sample(bot_deck, 5)  # 沒有公共牌，隨機抽取五張作為公共牌
-        else:
-            table = common_cards + random.sample(bot_deck, 5 - len(common_cards))  # 補足五張公共牌
+        # 一次從牌堆抽出手牌未知的對手手牌與剩下的公共牌
+        dealt = random.sample(deck, 2 * len(random_bots) + n_missing)
+        for j, bot in enumerate(random_bots):
+            bot.cards = dealt[2 * j:2 * j + 2]
+        table = board + dealt[2 * len(random_bots):]  # 補足五張公共牌
 
         # 計算每個玩家的手牌評分
         players_score(list_bots, table)  # 對所有對手計算手牌評分
@@ -73,5 +231,5 @@ def probability_win(own_cards, n_players, common_cards=None):
         elif ai.score == max(list_score):  # 如果機器人的評分與最高的對手相同
             n_tie += 1
 
-    # 返回機器人獲勝和平局的機率
-    return n_win / number_games, n_tie / number_games
+    # 返回機器人獲勝和平局的次數
+    return n_win, n_tie
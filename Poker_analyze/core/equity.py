@@ -0,0 +1,436 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import comb
+from statistics import NormalDist
+
+import numpy as np
+
+from cards import cards_to_ints
+from hand_evaluator import _rank_table, evaluate_many
+
+DEFAULT_TRIALS = 100_000  # 向量化模擬預設的模擬次數
+BATCH_SIZE = 50_000  # 每批模擬的次數，限制記憶體用量
+# 完整列舉每個情境的成本約為一次向量化模擬的 2/3（實測約 60-230 ns 對 180-270 ns），
+# 情境數低於模擬次數的 1.5 倍時完整列舉比較快，且沒有抽樣誤差
+EXACT_COST_RATIO = 1.5
+EXACT_CHUNK_ROWS = 2_000_000  # 完整列舉時每批評估的手牌數上限
+ADAPTIVE_FIRST_BATCH = 256  # 自適應模擬第一批的模擬次數，之後每批加倍
+ADAPTIVE_MAX_TRIALS = 1_000_000  # 自適應模擬的模擬次數上限
+
+_executor = None  # 平行模擬共用的行程池
+_executor_workers = 0
+
+
+def _remaining_deck(known_cards):
+    """回傳扣除已知牌之後的牌堆（以可用牌遮罩一次算出的整數編號陣列）"""
+    if len(set(known_cards)) != len(known_cards):
+        raise ValueError(f"牌面重複：{known_cards}")
+    available = np.ones(52, dtype=bool)
+    available[known_cards] = False
+    return np.flatnonzero(available).astype(np.int8)
+
+
+def _known_cards(dead_cards=None, known_hands=None):
+    """
+    整理死牌與已知的對手手牌
+    :param dead_cards: （可選）已知不在牌堆中的牌（亮出、棄掉或燒掉的牌）
+    :param known_hands: （可選）已知的對手手牌，{對手: 兩張牌} 字典或兩張牌的列表
+    :return: (死牌整數編號列表, 已知對手手牌的整數編號列表)
+    """
+    dead = cards_to_ints(dead_cards or [])
+    if isinstance(known_hands, dict):
+        known_hands = list(known_hands.values())
+    holes = [cards_to_ints(hand) for hand in known_hands or []]
+    for hole in holes:
+        if len(hole) != 2:
+            raise ValueError(f"已知手牌必須是兩張牌：{hole}")
+    return dead, holes
+
+
+def _simulate_batches(hero, board, n_opponents, trials, rng, batch_size=BATCH_SIZE, dead=(),
+                      known_holes=()):
+    """
+    向量化蒙地卡羅模擬，逐批產生每次模擬的補牌與牌力
+    產生的陣列是重複使用的緩衝區，需要保留時必須自行複製
+    :param hero: 自己兩張手牌的整數編號
+    :param board: 已知公共牌的整數編號
+    :param n_opponents: 對手人數（包含已知手牌的對手）
+    :param trials: 模擬次數
+    :param rng: numpy 亂數產生器
+    :param dead: 死牌的整數編號
+    :param known_holes: 已知的對手手牌（每位兩張的整數編號）
+    :return: 逐批產生 (補上的公共牌 (n, 5 - len(board)), 自己的牌力 (n,), 對手最大牌力 (n,))
+    """
+    n_known = len(known_holes)
+    n_random = n_opponents - n_known
+    if n_random < 0:
+        raise ValueError(f"已知手牌數（{n_known}）超過對手人數（{n_opponents}）")
+    known_cards = [card for hole in known_holes for card in hole]
+    deck = _remaining_deck(list(hero) + list(board) + list(dead) + known_cards)
+    n_missing = 5 - len(board)
+    n_draw = 2 * n_random + n_missing
+    if n_draw > len(deck):
+        raise ValueError(f"剩餘牌數不足以發給 {n_opponents} 位對手")
+
+    batch = min(trials, batch_size)
+    # 預先配置的牌堆矩陣，每一欄都是一副剩餘牌的排列（轉置存放讓每次交換都是連續記憶體）；
+    # 部分 Fisher-Yates 洗牌只需處理前 n_draw 列，且上一批的排列可以直接沿用
+    deck_matrix = np.tile(deck[:, None], (1, batch))
+    flat_deck = deck_matrix.ravel()
+    columns = np.arange(batch)
+    highs = (len(deck) - np.arange(n_draw))[:, None]
+
+    # 每位玩家七張牌：前兩張為手牌，後五張為公共牌
+    hands = np.empty((batch, n_opponents + 1, 7), dtype=np.int8)
+    hands[:, 0, :2] = hero
+    if n_known:
+        hands[:, 1:1 + n_known, :2] = known_holes
+    hands[:, :, 2:2 + len(board)] = board
+
+    done = 0
+    while done < trials:
+        n = min(batch, trials - done)
+        offsets = (rng.random((n_draw, n)) * highs).astype(np.intp)
+        for j in range(n_draw):
+            swap = (j + offsets[j]) * batch + columns[:n]
+            picked = flat_deck[swap]
+            flat_deck[swap] = deck_matrix[j, :n]
+            deck_matrix[j, :n] = picked
+
+        drawn = deck_matrix[:n_draw, :n].T
+        hands[:n, 1 + n_known:, :2] = drawn[:, :2 * n_random].reshape(n, n_random, 2)
+        hands[:n, :, 2 + len(board):] = drawn[:, None, 2 * n_random:]
+
+        scores = evaluate_many(hands[:n].reshape(-1, 7)).reshape(n, n_opponents + 1)
+        yield hands[:n, 0, 2 + len(board):], scores[:, 0], scores[:, 1:].max(axis=1)
+        done += n
+
+
+def _simulate_counts(hero, board, n_opponents, trials, rng, batch_size=BATCH_SIZE, dead=(),
+                     known_holes=()):
+    """
+    向量化蒙地卡羅模擬，回傳勝場與平手次數（參數見 _simulate_batches）
+    :return: (勝場數, 平手數)
+    """
+    n_win = 0
+    n_tie = 0
+    for _, hero_scores, best_opponent in _simulate_batches(hero, board, n_opponents, trials, rng,
+                                                           batch_size, dead, known_holes):
+        n_win += int(np.count_nonzero(hero_scores > best_opponent))
+        n_tie += int(np.count_nonzero(hero_scores == best_opponent))
+    return n_win, n_tie
+
+
+def equity_result(n_win, n_tie, trials):
+    """將勝場與平手次數整理成勝率、平手率、敗率及標準誤"""
+    win = n_win / trials
+    tie = n_tie / trials
+    loss = 1.0 - win - tie
+    return {
+        'win': win,
+        'tie': tie,
+        'loss': loss,
+        'win_se': (win * (1 - win) / trials) ** 0.5,
+        'tie_se': (tie * (1 - tie) / trials) ** 0.5,
+        'loss_se': (loss * (1 - loss) / trials) ** 0.5,
+        'trials': trials
+    }
+
+
+def monte_carlo_equity(own_cards, n_players, common_cards=None, trials=DEFAULT_TRIALS, seed=None,
+                       dead_cards=None, known_hands=None):
+    """
+    以向量化蒙地卡羅模擬計算勝率
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param trials: 模擬次數
+    :param seed: （可選）亂數種子
+    :param dead_cards: （可選）已知不在牌堆中的牌（亮出、棄掉或燒掉的牌）
+    :param known_hands: （可選）已知的對手手牌，{對手: 兩張牌} 字典或列表（對手仍計入 n_players）
+    :return: 包含 win/tie/loss 及其標準誤（*_se）與 trials 的字典
+    """
+    if n_players < 2:
+        raise ValueError(f"玩家數量至少為 2：{n_players}")
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards or [])
+    dead, known_holes = _known_cards(dead_cards, known_hands)
+    rng = np.random.default_rng(seed)
+    n_win, n_tie = _simulate_counts(hero, board, n_players - 1, trials, rng, dead=dead,
+                                    known_holes=known_holes)
+    return equity_result(n_win, n_tie, trials)
+
+
+def _init_worker():
+    """子行程啟動時先建立七張牌的查找表，避免第一批模擬承擔建表時間"""
+    _rank_table(7)
+
+
+def _get_executor(workers):
+    """取得（必要時重新建立）指定工作行程數的行程池"""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        _executor_workers = workers
+    return _executor
+
+
+def _simulate_shard(hero, board, n_opponents, trials, seed_sequence, dead=(), known_holes=()):
+    """在子行程中以獨立的亂數序列模擬一個分片，回傳 (勝場數, 平手數)"""
+    rng = np.random.default_rng(seed_sequence)
+    return _simulate_counts(hero, board, n_opponents, trials, rng, dead=dead, known_holes=known_holes)
+
+
+def parallel_monte_carlo_equity(own_cards, n_players, common_cards=None, trials=DEFAULT_TRIALS,
+                                seed=None, workers=None, dead_cards=None, known_hands=None):
+    """
+    將模擬次數切成多個分片，交給行程池平行模擬
+    每個分片都有由 seed 衍生出的獨立亂數序列，相同的 seed 與 workers 會得到相同結果
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param trials: 模擬總次數
+    :param seed: （可選）亂數種子
+    :param workers: （可選）工作行程數，預設為 CPU 核心數
+    :param dead_cards: （可選）死牌（見 monte_carlo_equity）
+    :param known_hands: （可選）已知的對手手牌（見 monte_carlo_equity）
+    :return: 與 monte_carlo_equity 相同格式的字典，並附上 workers
+    """
+    if n_players < 2:
+        raise ValueError(f"玩家數量至少為 2：{n_players}")
+    workers = workers or os.cpu_count() or 1
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards or [])
+    dead, known_holes = _known_cards(dead_cards, known_hands)
+
+    # 分片大小只由 trials 與 workers 決定，確保結果可以重現
+    shard_sizes = [trials // workers + (1 if i < trials % workers else 0) for i in range(workers)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+
+    executor = _get_executor(workers)
+    futures = [
+        executor.submit(_simulate_shard, hero, board, n_players - 1, size, seed_sequence, dead, known_holes)
+        for size, seed_sequence in zip(shard_sizes, seed_sequences) if size > 0
+    ]
+    n_win = 0
+    n_tie = 0
+    for future in futures:
+        shard_win, shard_tie = future.result()
+        n_win += shard_win
+        n_tie += shard_tie
+
+    result = equity_result(n_win, n_tie, trials)
+    result['workers'] = workers
+    return result
+
+
+def _wilson_interval(successes, trials, z):
+    """以 Wilson 分數區間估計比例的信賴區間，在勝率接近 0 或 1 時仍然可靠"""
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * (p * (1 - p) / trials + z * z / (4 * trials * trials)) ** 0.5 / denominator
+    return center - half_width, center + half_width
+
+
+def adaptive_equity(own_cards, n_players, common_cards=None, target_width=None, time_budget=None,
+                    decision_threshold=None, confidence=0.95, max_trials=ADAPTIVE_MAX_TRIALS,
+                    seed=None, dead_cards=None, known_hands=None):
+    """
+    分批模擬，勝率的信賴區間夠窄、時間用完或已足以做決策時立即停止
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param target_width: （可選）勝率信賴區間的目標寬度，例如 0.02
+    :param time_budget: （可選）可用的時間（秒）
+    :param decision_threshold: （可選）決策門檻（例如底池賠率），信賴區間不包含此值時即停止
+    :param confidence: 信賴水準
+    :param max_trials: 模擬次數上限
+    :param seed: （可選）亂數種子
+    :param dead_cards: （可選）死牌（見 monte_carlo_equity）
+    :param known_hands: （可選）已知的對手手牌（見 monte_carlo_equity）
+    :return: 與 monte_carlo_equity 相同格式的字典，另附 ci_low/ci_high/ci_width/elapsed/stop_reason
+    """
+    if n_players < 2:
+        raise ValueError(f"玩家數量至少為 2：{n_players}")
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards or [])
+    dead, known_holes = _known_cards(dead_cards, known_hands)
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    start = time.perf_counter()
+    n_win = 0
+    n_tie = 0
+    trials = 0
+    batch = ADAPTIVE_FIRST_BATCH
+    stop_reason = 'max_trials'
+    while trials < max_trials:
+        batch_start = time.perf_counter()
+        size = min(batch, max_trials - trials)
+        batch_win, batch_tie = _simulate_counts(hero, board, n_players - 1, size, rng, dead=dead,
+                                                known_holes=known_holes)
+        n_win += batch_win
+        n_tie += batch_tie
+        trials += size
+
+        ci_low, ci_high = _wilson_interval(n_win, trials, z)
+        if target_width is not None and ci_high - ci_low <= target_width:
+            stop_reason = 'target_width'
+            break
+        if decision_threshold is not None and not ci_low <= decision_threshold <= ci_high:
+            stop_reason = 'decision_threshold'
+            break
+        if time_budget is not None:
+            # 預估下一批（加倍）的耗時，避免超出時間預算
+            now = time.perf_counter()
+            if now - start + 2 * (now - batch_start) > time_budget:
+                stop_reason = 'time_budget'
+                break
+        batch = min(batch * 2, BATCH_SIZE)
+
+    result = equity_result(n_win, n_tie, trials)
+    ci_low, ci_high = _wilson_interval(n_win, trials, z)
+    result.update({
+        'ci_low': ci_low,
+        'ci_high': ci_high,
+        'ci_width': ci_high - ci_low,
+        'confidence': confidence,
+        'elapsed': time.perf_counter() - start,
+        'stop_reason': stop_reason
+    })
+    return result
+
+
+@lru_cache(maxsize=None)
+def _combination_index(n, k):
+    """回傳從 n 個位置取 k 個的所有組合（依字典序排列的索引陣列，形狀為 (C(n, k), k)）"""
+    flat = np.fromiter(itertools.chain.from_iterable(itertools.combinations(range(n), k)),
+                       dtype=np.int16, count=comb(n, k) * k)
+    return flat.reshape(comb(n, k), k)
+
+
+@lru_cache(maxsize=None)
+def _pairing_index(n_pairs):
+    """回傳把 2k 張牌分成 k 組兩張的所有分法，形狀為 ((2k-1)!!, k, 2)"""
+    def pairings(items):
+        if not items:
+            yield []
+            return
+        first = items[0]
+        for i in range(1, len(items)):
+            rest = items[1:i] + items[i + 1:]
+            for tail in pairings(rest):
+                yield [(first, items[i])] + tail
+
+    return np.array(list(pairings(list(range(2 * n_pairs)))), dtype=np.int16).reshape(-1, n_pairs, 2)
+
+
+def exact_combination_count(n_opponents, n_board_cards, n_removed_cards=0):
+    """
+    計算完整列舉需要評估的情境數（公共牌發完的方式 × 對手手牌的分配方式）
+    :param n_opponents: 手牌未知的對手人數
+    :param n_board_cards: 已知公共牌張數
+    :param n_removed_cards: 其他已知不在牌堆中的牌數（死牌與已知的對手手牌）
+    :return: 情境總數
+    """
+    n_remaining = 50 - n_board_cards - n_removed_cards
+    n_missing = 5 - n_board_cards
+    n_pairings = 1
+    for odd in range(1, 2 * n_opponents, 2):
+        n_pairings *= odd
+    return (comb(n_remaining, n_missing)
+            * comb(n_remaining - n_missing, 2 * n_opponents)
+            * n_pairings)
+
+
+def _enumerate_counts(hero, board, n_opponents, dead=(), known_holes=()):
+    """
+    完整列舉所有剩餘公共牌與對手手牌，回傳 (勝場數, 平手數, 情境總數)
+    對手之間互相對稱，所以只列舉「哪些牌發給對手」與「如何兩兩分組」，
+    每種情境的機率都相同；已知手牌的對手只需隨公共牌評估一次
+    """
+    n_known = len(known_holes)
+    n_random = n_opponents - n_known
+    if n_random < 0:
+        raise ValueError(f"已知手牌數（{n_known}）超過對手人數（{n_opponents}）")
+    known_cards = [card for hole in known_holes for card in hole]
+    deck = _remaining_deck(list(hero) + list(board) + list(dead) + known_cards)
+    n_missing = 5 - len(board)
+    if 2 * n_random + n_missing > len(deck):
+        raise ValueError(f"剩餘牌數不足以發給 {n_opponents} 位對手")
+
+    board_index = _combination_index(len(deck), n_missing)
+    opponent_index = _combination_index(len(deck) - n_missing, 2 * n_random)
+    pairing = _pairing_index(n_random) if n_random else np.empty((1, 0, 2), dtype=np.int16)
+    n_board = len(board_index)
+    n_deals = len(opponent_index) * len(pairing)
+
+    # 每種公共牌發法之後剩下的牌（在 deck 中的位置）
+    remaining = np.ones((n_board, len(deck)), dtype=bool)
+    remaining[np.arange(n_board)[:, None], board_index] = False
+    remaining = np.nonzero(remaining)[1].reshape(n_board, -1)
+
+    known_board = np.array(board, dtype=np.int8)
+    chunk = max(1, EXACT_CHUNK_ROWS // (n_deals * max(n_random, 1)))
+    n_win = 0
+    n_tie = 0
+    for start in range(0, n_board, chunk):
+        stop = min(start + chunk, n_board)
+        cb = stop - start
+        full_board = np.empty((cb, 5), dtype=np.int8)
+        full_board[:, :len(board)] = known_board
+        full_board[:, len(board):] = deck[board_index[start:stop]]
+
+        hero_hands = np.empty((cb, 7), dtype=np.int8)
+        hero_hands[:, :2] = hero
+        hero_hands[:, 2:] = full_board
+        hero_scores = evaluate_many(hero_hands)
+
+        # 已知手牌的對手在每種公共牌下的最大牌力
+        best_known = np.zeros(cb, dtype=np.int32)
+        for hole in known_holes:
+            known_hands = np.empty((cb, 7), dtype=np.int8)
+            known_hands[:, :2] = hole
+            known_hands[:, 2:] = full_board
+            best_known = np.maximum(best_known, evaluate_many(known_hands))
+
+        best_opponent = best_known[:, None]
+        if n_random:
+            # (cb, 對手牌組合, 分組方式, 對手, 2)
+            dealt = deck[remaining[start:stop][:, opponent_index]]
+            holes = dealt[:, :, pairing]
+            opp_hands = np.empty(holes.shape[:-1] + (7,), dtype=np.int8)
+            opp_hands[..., :2] = holes
+            opp_hands[..., 2:] = full_board[:, None, None, None, :]
+            opp_scores = evaluate_many(opp_hands.reshape(-1, 7)).reshape(holes.shape[:-1])
+            best_opponent = np.maximum(opp_scores.max(axis=-1).reshape(cb, -1), best_opponent)
+        n_win += int(np.count_nonzero(hero_scores[:, None] > best_opponent))
+        n_tie += int(np.count_nonzero(hero_scores[:, None] == best_opponent))
+    return n_win, n_tie, n_board * n_deals
+
+
+def exact_equity(own_cards, n_players, common_cards=None, dead_cards=None, known_hands=None):
+    """
+    完整列舉所有剩餘情境，計算精確勝率
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param n_players: 總共參與遊戲的玩家數量
+    :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param dead_cards: （可選）死牌（見 monte_carlo_equity）
+    :param known_hands: （可選）已知的對手手牌（見 monte_carlo_equity）
+    :return: 與 monte_carlo_equity 相同格式的字典，標準誤為 0，並附上 exact=True
+    """
+    if n_players < 2:
+        raise ValueError(f"玩家數量至少為 2：{n_players}")
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards or [])
+    dead, known_holes = _known_cards(dead_cards, known_hands)
+    n_win, n_tie, total = _enumerate_counts(hero, board, n_players - 1, dead, known_holes)
+    result = equity_result(n_win, n_tie, total)
+    result.update({'win_se': 0.0, 'tie_se': 0.0, 'loss_se': 0.0, 'exact': True})
+    return result
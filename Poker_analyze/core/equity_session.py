@@ -0,0 +1,99 @@
+import numpy as np
+
+from cards import cards_to_ints
+from equity import DEFAULT_TRIALS, _simulate_batches, equity_result
+from preflop_table import MAX_OPPONENTS, load_preflop_table
+
+# 每次模擬的結果編碼
+_LOSS, _TIE, _WIN = 0, 1, 2
+
+
+class EquitySession:
+    def __init__(self, own_cards, n_players, trials=DEFAULT_TRIALS, seed=None, use_preflop_table=True):
+        """
+        同一手牌跨街道的勝率計算：保留每次模擬的五張公共牌與勝負結果，
+        下一條街只保留與新公共牌相符的模擬（這些模擬正好是新條件下的均勻抽樣），
+        再補足缺少的模擬次數。翻牌前的模擬幾乎無法沿用到翻牌，因此有勝率表時直接查表
+        own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+        n_players: 總共參與遊戲的玩家數量
+        trials: 每條街的目標模擬次數
+        seed: （可選）亂數種子
+        use_preflop_table: 翻牌前是否查詢預先計算的勝率表（檔案存在時）
+        """
+        if n_players < 2:
+            raise ValueError(f"玩家數量至少為 2：{n_players}")
+        self.hero = cards_to_ints(own_cards)
+        self.n_players = n_players
+        self.trials = trials
+        self.rng = np.random.default_rng(seed)
+        self.use_preflop_table = use_preflop_table
+        self.board = None  # 目前的公共牌（整數編號）
+        self.runouts = np.empty((0, 5), dtype=np.int8)  # 每次模擬的五張公共牌，前段固定為目前的公共牌
+        self.outcomes = np.empty(0, dtype=np.int8)  # 每次模擬的結果（0 負、1 平、2 勝）
+        self.reused = 0  # 最近一次更新沿用的模擬次數
+        self.simulated = 0  # 最近一次更新新增的模擬次數
+
+    def _filter_compatible(self, board):
+        """
+        只保留與新公共牌相符的模擬：新出現的牌必須在該次模擬尚未揭示的位置中
+        （轉牌與河牌的位置可以互換，因此不要求順序）
+        """
+        if self.board is None or len(board) < len(self.board) or board[:len(self.board)] != self.board:
+            self.runouts = self.runouts[:0]
+            self.outcomes = self.outcomes[:0]
+            return
+        new_cards = np.array(board[len(self.board):], dtype=np.int8)
+        if not new_cards.size:
+            return
+        unseen = self.runouts[:, len(self.board):]
+        keep = np.ones(len(self.outcomes), dtype=bool)
+        for card in new_cards:
+            keep &= (unseen == card).any(axis=1)
+
+        # 重新排列保留的公共牌：新公共牌放在前面，其餘未揭示的牌依原順序放在後面
+        unseen = unseen[keep]
+        is_new = (unseen[:, :, None] == new_cards).any(axis=2)
+        order = np.argsort(is_new.astype(np.int8) * -8 + np.arange(unseen.shape[1]), axis=1)
+        rest = np.take_along_axis(unseen, order, axis=1)[:, len(new_cards):]
+        self.runouts = np.hstack([np.tile(np.array(board, dtype=np.int8), (len(rest), 1)), rest])
+        self.outcomes = self.outcomes[keep]
+
+    def update(self, common_cards=None):
+        """
+        依目前的公共牌更新勝率：沿用相符的模擬並補足到目標次數
+        公共牌與上一次不相容時（例如新的一手牌）會重新開始
+        :param common_cards: 桌面上已經揭示的公共牌
+        :return: 與 monte_carlo_equity 相同格式的字典，另含 reused（沿用次數）與 simulated（新增次數）
+        """
+        board = cards_to_ints(common_cards or [])
+        table = load_preflop_table() if self.use_preflop_table and self.n_players - 1 <= MAX_OPPONENTS else None
+        if not board and table is not None:
+            self.board = None  # 查表沒有留下模擬，下一條街重新開始
+            self.runouts = self.runouts[:0]
+            self.outcomes = self.outcomes[:0]
+            self.reused = self.simulated = 0
+            result = table.lookup(self.hero, self.n_players)
+            result['reused'] = result['simulated'] = 0
+            return result
+
+        self._filter_compatible(board)
+        self.board = board
+        self.reused = len(self.outcomes)
+        self.simulated = max(self.trials - self.reused, 0)
+
+        if self.simulated:
+            runouts = [self.runouts]
+            outcomes = [self.outcomes]
+            for drawn, hero_scores, best_opponent in _simulate_batches(
+                    self.hero, board, self.n_players - 1, self.simulated, self.rng):
+                known = np.tile(np.array(board, dtype=np.int8), (len(drawn), 1))
+                runouts.append(np.hstack([known, drawn]))
+                outcomes.append((np.sign(hero_scores.astype(np.int32) - best_opponent) + 1).astype(np.int8))
+            self.runouts = np.vstack(runouts)
+            self.outcomes = np.concatenate(outcomes)
+
+        counts = np.bincount(self.outcomes, minlength=3)
+        result = equity_result(int(counts[_WIN]), int(counts[_TIE]), len(self.outcomes))
+        result['reused'] = self.reused
+        result['simulated'] = self.simulated
+        return result
@@ -0,0 +1,283 @@
+import argparse
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cards import cards_to_ints
+from equity import _combination_index
+from hand_evaluator import evaluate_many
+from isomorphism import canonical_permutation
+from lru_cache import LRUCache
+from ranges import COMBO_CARDS, N_COMBOS, combo_index
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flop_strength.bin')
+FEATURES = ['hs', 'ehs', 'ehs2', 'ppot', 'npot']  # 目前牌力、E[HS]、E[HS²]、正潛力、負潛力
+N_FLOPS = 1755  # 花色同構後的翻牌數
+
+# 檔案格式：32 位元組檔頭 + float16 陣列 (1755, 1326, 5)，與翻牌衝突的手牌為 NaN
+_MAGIC = b'FLHS'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHHH')
+_HEADER_SIZE = 32
+
+_isomorphic_flops = []
+_flop_indices = {}
+_live_cache = LRUCache(maxsize=4096)  # 沒有表格時，即時計算結果的快取
+
+# 對手與自己的相對關係：0 = 自己領先、1 = 平手、2 = 自己落後
+_AHEAD, _TIED, _BEHIND = 0, 1, 2
+
+
+def isomorphic_flops():
+    """列出所有花色同構後不同的翻牌（每種取字典序最小的代表），共 1755 種"""
+    if not _isomorphic_flops:
+        flops = {canonical_permutation(flop)[0][0] for flop in _combination_index(52, 3).tolist()}
+        _isomorphic_flops.extend(sorted(flops))
+        _flop_indices.update({flop: i for i, flop in enumerate(_isomorphic_flops)})
+    return _isomorphic_flops
+
+
+def _potentials(hp):
+    """
+    由 (N, 9) 的轉移次數（目前關係 * 3 + 最終關係）計算 Billings 的正/負潛力
+    :return: (正潛力, 負潛力)
+    """
+    hp = hp.reshape(-1, 3, 3).astype(np.float64)
+    total = hp.sum(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ppot = ((hp[:, _BEHIND, _AHEAD] + hp[:, _BEHIND, _TIED] / 2 + hp[:, _TIED, _AHEAD] / 2)
+                / (total[:, _BEHIND] + total[:, _TIED] / 2))
+        npot = ((hp[:, _AHEAD, _BEHIND] + hp[:, _TIED, _BEHIND] / 2 + hp[:, _AHEAD, _TIED] / 2)
+                / (total[:, _AHEAD] + total[:, _TIED] / 2))
+    return np.nan_to_num(ppot), np.nan_to_num(npot)
+
+
+def _relation(hero_scores, opponent_scores):
+    """對手相對自己的關係（0 領先、1 平手、2 落後），陣列可廣播"""
+    return np.sign(opponent_scores.astype(np.int32) - hero_scores.astype(np.int32)) + 1
+
+
+def hand_features(own_cards, flop):
+    """
+    完整列舉計算單一手牌在翻牌上的特徵（不需要表格）
+    :param own_cards: 自己手中的兩張牌
+    :param flop: 三張翻牌
+    :return: 長度 5 的陣列 [hs, ehs, ehs2, ppot, npot]
+    """
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(flop)
+    available = np.ones(52, dtype=bool)
+    available[hero + board] = False
+    deck = np.flatnonzero(available)
+
+    opponents = deck[_combination_index(len(deck), 2)]  # (1081, 2)
+    runouts = opponents  # 轉牌與河牌的組合與對手手牌的組合相同
+    current_hero = evaluate_many([hero + board])[0]
+    current = evaluate_many(np.hstack([opponents, np.tile(board, (len(opponents), 1))]))
+    relation_now = _relation(current_hero, current)
+    hs = (np.count_nonzero(relation_now == _AHEAD)
+          + np.count_nonzero(relation_now == _TIED) / 2) / len(opponents)
+
+    final_board = np.hstack([np.tile(board, (len(runouts), 1)), runouts])  # (1081, 5)
+    final_hero = evaluate_many(np.hstack([np.tile(hero, (len(runouts), 1)), final_board]))
+    # (轉河牌, 對手) 的所有組合，排除與轉河牌衝突的對手手牌
+    valid = ~((opponents[None, :, :, None] == runouts[:, None, None, :]).any(axis=(2, 3)))
+    runout_index, opponent_index = np.nonzero(valid)
+    final = evaluate_many(np.hstack([opponents[opponent_index], final_board[runout_index]]))
+    relation_end = _relation(final_hero[runout_index], final)
+
+    per_runout = np.bincount(runout_index, weights=(relation_end == _AHEAD) + (relation_end == _TIED) / 2,
+                             minlength=len(runouts)) / valid.sum(axis=1)
+    transitions = np.bincount(relation_now[opponent_index] * 3 + relation_end, minlength=9)
+    ppot, npot = _potentials(transitions[None, :])
+    return np.array([hs, per_runout.mean(), (per_runout ** 2).mean(), ppot[0], npot[0]])
+
+
+def _flop_strength(flop):
+    """
+    一次計算某個翻牌上所有手牌的特徵
+    每種轉河牌只評估一次所有手牌，再用二維前綴和計算每手牌對所有對手的轉移次數，
+    最後扣除與自己手牌共用牌的對手
+    :param flop: 三張翻牌的整數編號
+    :return: (1326, 5) 的 float32 陣列，與翻牌衝突的手牌為 NaN
+    """
+    flop = list(flop)
+    available = np.ones(52, dtype=bool)
+    available[flop] = False
+    holding_index = np.flatnonzero(available[COMBO_CARDS].all(axis=1))
+    holdings = COMBO_CARDS[holding_index].astype(np.intp)
+    n_holdings = len(holding_index)
+
+    # 每張牌出現在哪些手牌中；conflicts[h] 為與手牌 h 共用任一張牌的手牌（含 h 本身）
+    contains = [np.flatnonzero((holdings == card).any(axis=1)) for card in range(52)]
+    first = np.array([contains[card] for card in holdings[:, 0]])
+    second = np.array([contains[card] for card in holdings[:, 1]])
+    second = second[second != np.arange(n_holdings)[:, None]].reshape(n_holdings, -1)
+    conflicts = np.hstack([first, second])
+    conflict_rows = np.repeat(np.arange(n_holdings), conflicts.shape[1])
+
+    current = evaluate_many(np.hstack([holdings, np.tile(flop, (n_holdings, 1))]))
+    relation_now = _relation(current[:, None], current[conflicts])
+
+    # 目前牌力：全部手牌的比較結果扣掉共用牌的手牌
+    ordered = np.sort(current)
+    less = np.searchsorted(ordered, current, side='left')
+    less_equal = np.searchsorted(ordered, current, side='right')
+    ahead = less - (relation_now == _AHEAD).sum(axis=1)
+    tied = (less_equal - less) - (relation_now == _TIED).sum(axis=1)
+    n_opponents = n_holdings - conflicts.shape[1]
+    hs = (ahead + tied / 2) / n_opponents
+
+    hs_sum = np.zeros(n_holdings)
+    hs2_sum = np.zeros(n_holdings)
+    runout_count = np.zeros(n_holdings)
+    transitions = np.zeros((n_holdings, 9))
+    deck = np.flatnonzero(available)
+    final = np.zeros(n_holdings, dtype=np.int32)
+    for turn, river in deck[_combination_index(len(deck), 2)].tolist():
+        valid = ~((holdings == turn) | (holdings == river)).any(axis=1)
+        heroes = np.flatnonzero(valid)
+        final[heroes] = evaluate_many(np.hstack([holdings[heroes],
+                                                 np.tile(flop + [turn, river], (len(heroes), 1))]))
+
+        # 二維前綴和：prefix[i, j] 為目前名次 < i 且最終名次 < j 的手牌數
+        current_rank, current_inverse = np.unique(current[heroes], return_inverse=True)
+        final_rank, final_inverse = np.unique(final[heroes], return_inverse=True)
+        n_current, n_final = len(current_rank), len(final_rank)
+        grid = np.bincount(current_inverse * n_final + final_inverse,
+                           minlength=n_current * n_final).reshape(n_current, n_final)
+        prefix = np.zeros((n_current + 1, n_final + 1), dtype=np.int64)
+        prefix[1:, 1:] = grid.cumsum(axis=0).cumsum(axis=1)
+
+        # 每個邊界（小於 / 小於等於 / 全部）的前綴和，組合出 3x3 的區塊計數
+        i = current_inverse
+        j = final_inverse
+        rows = np.stack([i, i + 1, np.full_like(i, n_current)], axis=1)
+        cols = np.stack([j, j + 1, np.full_like(j, n_final)], axis=1)
+        corner = prefix[rows[:, :, None], cols[:, None, :]]  # (n, 3, 3)
+        cells = np.diff(np.concatenate([np.zeros((len(heroes), 1, 3), dtype=np.int64), corner],
+                                       axis=1), axis=1)
+        cells = np.diff(np.concatenate([np.zeros((len(heroes), 3, 1), dtype=np.int64), cells],
+                                       axis=2), axis=2).reshape(-1, 9)
+
+        # 扣除與自己手牌共用牌、且在這組轉河牌下仍有效的對手
+        hero_conflicts = conflicts[heroes]
+        conflict_valid = valid[hero_conflicts]
+        relation_end = _relation(final[heroes][:, None], final[hero_conflicts])
+        removed = np.bincount((np.arange(len(heroes))[:, None] * 9
+                               + relation_now[heroes] * 3 + relation_end)[conflict_valid],
+                              minlength=len(heroes) * 9).reshape(-1, 9)
+        cells = cells - removed
+
+        river_ahead = cells[:, [0, 3, 6]].sum(axis=1)
+        river_tied = cells[:, [1, 4, 7]].sum(axis=1)
+        river_hs = (river_ahead + river_tied / 2) / cells.sum(axis=1)
+        hs_sum[heroes] += river_hs
+        hs2_sum[heroes] += river_hs ** 2
+        runout_count[heroes] += 1
+        transitions[heroes] += cells
+
+    ppot, npot = _potentials(transitions)
+    features = np.full((N_COMBOS, len(FEATURES)), np.nan, dtype=np.float32)
+    features[holding_index] = np.stack([hs, hs_sum / runout_count, hs2_sum / runout_count,
+                                        ppot, npot], axis=1)
+    return features
+
+
+def build_table(path=DEFAULT_TABLE_PATH, workers=None):
+    """
+    離線計算所有同構翻牌上 1326 種手牌的特徵，寫入二進位檔案
+    :param path: 輸出檔案路徑
+    :param workers: （可選）平行計算的工作行程數
+    """
+    flops = isomorphic_flops()
+    table = np.full((len(flops), N_COMBOS, len(FEATURES)), np.nan, dtype=np.float16)
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for index, features in enumerate(executor.map(_flop_strength, flops, chunksize=4)):
+            table[index] = features
+            if (index + 1) % 50 == 0 or index + 1 == len(flops):
+                print(f"翻牌特徵完成 {index + 1}/{len(flops)}（{time.time() - start:.0f} 秒）")
+
+    header = _HEADER.pack(_MAGIC, _VERSION, len(flops), N_COMBOS, len(FEATURES))
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(table.tobytes())
+    os.replace(temp_path, path)
+    print(f"翻牌特徵表已寫入：{path}")
+
+
+class FlopStrengthTable:
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        """
+        以記憶體映射載入翻牌特徵表
+        path: 特徵表檔案路徑
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"特徵表檔案不存在：{path}")
+        with open(path, 'rb') as f:
+            magic, version, n_flops, n_combos, n_features = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"特徵表檔案格式錯誤：{path}")
+        self.path = path
+        self.table = np.memmap(path, dtype=np.float16, mode='r', offset=_HEADER_SIZE,
+                               shape=(n_flops, n_combos, n_features))
+
+    def lookup(self, own_cards, flop):
+        """查詢手牌在翻牌上的特徵，回傳長度 5 的陣列 [hs, ehs, ehs2, ppot, npot]"""
+        flop_index, combo = table_index(own_cards, flop)
+        return self.table[flop_index, combo].astype(np.float64)
+
+
+def table_index(own_cards, flop):
+    """
+    將手牌與翻牌映射到表格索引
+    :return: (同構翻牌索引, 花色映射後的手牌組合索引)
+    """
+    isomorphic_flops()
+    (canonical_flop,), mapping = canonical_permutation(cards_to_ints(flop))
+    hero = [mapping[card] for card in cards_to_ints(own_cards)]
+    return _flop_indices[canonical_flop], combo_index(*hero)
+
+
+_loaded_tables = {}
+
+
+def load_flop_table(path=DEFAULT_TABLE_PATH):
+    """取得已載入的特徵表（同一路徑只載入一次），檔案不存在時回傳 None"""
+    if path not in _loaded_tables:
+        _loaded_tables[path] = FlopStrengthTable(path) if os.path.exists(path) else None
+    return _loaded_tables[path]
+
+
+def flop_features(own_cards, flop):
+    """
+    取得手牌在翻牌上的特徵：有特徵表時直接查表，否則即時完整列舉並快取
+    :param own_cards: 自己手中的兩張牌
+    :param flop: 三張翻牌
+    :return: {'hs', 'ehs', 'ehs2', 'ppot', 'npot'} 字典
+    """
+    if len(set(cards_to_ints(own_cards) + cards_to_ints(flop))) != 5:
+        raise ValueError(f"需要兩張手牌與三張不重複的翻牌：{own_cards} {flop}")
+    table = load_flop_table()
+    if table is not None:
+        values = table.lookup(own_cards, flop)
+    else:
+        key = table_index(own_cards, flop)
+        values = _live_cache.get(key)
+        if values is None:
+            values = hand_features(own_cards, flop)
+            _live_cache.put(key, values)
+    return dict(zip(FEATURES, values.tolist()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='建立翻牌特徵表')
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH, help='輸出檔案路徑')
+    parser.add_argument('--workers', type=int, default=None, help='平行計算的工作行程數')
+    args = parser.parse_args()
+    build_table(args.output, workers=args.workers)
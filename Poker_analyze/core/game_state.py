@@ -0,0 +1,129 @@
+import json
+from enum import IntEnum
+
+from cards import CARD_MASKS, card_to_int, int_to_card
+
+# 視覺模型用來表示沒有牌的標記
+_EMPTY_CARDS = ('NA', '(尚未發牌)')
+
+
+class Stage(IntEnum):
+    PREFLOP = 0
+    FLOP = 1
+    TURN = 2
+    RIVER = 3
+
+    @classmethod
+    def from_board_size(cls, n_cards):
+        """根據公共牌數量確定遊戲階段（張數不合理時視為翻牌前）"""
+        return {3: cls.FLOP, 4: cls.TURN, 5: cls.RIVER}.get(n_cards, cls.PREFLOP)
+
+    @property
+    def label(self):
+        """階段名稱，例如 'preflop'"""
+        return self.name.lower()
+
+
+def _parse_cards(cards):
+    """將牌面字串轉換為整數編號，略過未發牌的標記、註釋與無法辨識的牌面"""
+    parsed = []
+    for card in cards or ():
+        if isinstance(card, str) and (card in _EMPTY_CARDS or card.startswith('(')):
+            continue
+        try:
+            parsed.append(card_to_int(card))
+        except (ValueError, AttributeError, TypeError):
+            print(f"略過無法辨識的牌面：{card}")
+    return tuple(parsed)
+
+
+class GameState:
+    """
+    一次分析的遊戲狀態：手牌與公共牌以整數編號（保留順序）與 52 位元遮罩表示，
+    階段由公共牌數量決定。JSON 格式的鍵與原本的 game_state 字典相同
+    """
+    __slots__ = ('hand', 'board', 'hand_mask', 'board_mask', 'stage', 'pot_size', 'current_bet',
+                 'player_stacks', 'position')
+
+    def __init__(self, hand_cards=(), community_cards=(), pot_size=0.0, current_bet=0.0,
+                 player_stacks=None, position=''):
+        """
+        hand_cards: 手牌（牌面字串或整數編號），無效的牌面會被略過
+        community_cards: 公共牌（牌面字串或整數編號），無效的牌面會被略過
+        pot_size: 底池大小（BB）
+        current_bet: 目前下注額（BB）
+        player_stacks: {玩家: 籌碼量（BB）}
+        position: 自己的位置，例如 'BTN'
+        """
+        self.hand = _parse_cards(hand_cards)
+        self.board = _parse_cards(community_cards)
+        self.hand_mask = 0
+        for card in self.hand:
+            self.hand_mask |= CARD_MASKS[card]
+        self.board_mask = 0
+        for card in self.board:
+            self.board_mask |= CARD_MASKS[card]
+        self.stage = Stage.from_board_size(len(self.board))
+        self.pot_size = float(pot_size or 0)
+        self.current_bet = float(current_bet or 0)
+        self.player_stacks = {player: float(stack) for player, stack in (player_stacks or {}).items()}
+        self.position = position or ''
+
+    @property
+    def hand_cards(self):
+        """手牌的牌面字串，例如 ['As', 'Kh']"""
+        return [int_to_card(card) for card in self.hand]
+
+    @property
+    def community_cards(self):
+        """公共牌的牌面字串（依揭示順序）"""
+        return [int_to_card(card) for card in self.board]
+
+    @classmethod
+    def coerce(cls, game_state):
+        """接受 GameState 或原本格式的 game_state 字典"""
+        if isinstance(game_state, cls):
+            return game_state
+        return cls.from_dict(game_state)
+
+    @classmethod
+    def from_dict(cls, data):
+        """從 game_state 字典建立（缺少的欄位使用預設值，stage 由公共牌重新判斷）"""
+        return cls(
+            hand_cards=data.get('hand_cards', ()),
+            community_cards=data.get('community_cards', ()),
+            pot_size=data.get('pot_size', 0.0),
+            current_bet=data.get('current_bet', 0.0),
+            player_stacks=data.get('player_stacks'),
+            position=data.get('position', '')
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        """從 JSON 字串（例如資料庫的 game_state 欄位）建立"""
+        return cls.from_dict(json.loads(text))
+
+    def to_dict(self):
+        """轉換為原本格式的 game_state 字典（用於 WebSocket 廣播）"""
+        return {
+            'stage': self.stage.label,
+            'community_cards': self.community_cards,
+            'hand_cards': self.hand_cards,
+            'pot_size': self.pot_size,
+            'player_stacks': self.player_stacks,
+            'current_bet': self.current_bet,
+            'position': self.position
+        }
+
+    def to_json(self):
+        """轉換為 JSON 字串（用於資料庫記錄）"""
+        return json.dumps(self.to_dict())
+
+    def __eq__(self, other):
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"GameState(stage={self.stage.label}, hand={' '.join(self.hand_cards)}, "
+                f"board={' '.join(self.community_cards)}, pot={self.pot_size}, bet={self.current_bet})")
@@ -0,0 +1,210 @@
+import itertools
+
+import numpy as np
+
+from cards import card_to_int, straight_high
+
+# 牌型類別（由弱到強）
+HAND_CATEGORIES = [
+    'high_card', 'one_pair', 'two_pair', 'three_of_a_kind', 'straight',
+    'flush', 'full_house', 'four_of_a_kind', 'straight_flush'
+]
+
+# 牌面值的加總鍵值：同張數的牌面組合（每種牌面最多 4 張）加總後互不相同，
+# 因此 5/6/7 張牌各自可以直接用加總結果當作查表索引
+_RANK_KEYS = [0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181]
+
+# 每張牌的編號為 suit * 13 + rank（0-51）
+_CARD_RANK = np.arange(52) % 13
+_CARD_SUIT = np.arange(52) // 13
+
+# 每張牌的合併鍵值：低 32 位元為牌面鍵值，高位元為花色計數（每種花色 3 位元）
+_CARD_KEY = (np.array([_RANK_KEYS[r] for r in _CARD_RANK], dtype=np.int64)
+             | (np.int64(1) << (32 + 3 * _CARD_SUIT)))
+# 每張牌在「花色 * 16 + 牌面」位元配置中的位元，用於取出同花的牌面遮罩
+_CARD_SUIT_BIT = np.int64(1) << (16 * _CARD_SUIT + _CARD_RANK)
+
+_CARD_KEY_LIST = _CARD_KEY.tolist()
+_CARD_SUIT_BIT_LIST = _CARD_SUIT_BIT.tolist()
+
+_tables = {}  # 延遲建立的查找表
+
+
+def _structured_value(category, ranks):
+    """將牌型類別與比較用的牌面序列組合成可直接比較大小的整數"""
+    value = category
+    for i in range(5):
+        value = (value << 4) | (ranks[i] if i < len(ranks) else 0)
+    return value
+
+
+def _rank_multiset_value(counts):
+    """計算沒有同花時，一組牌面（各牌面張數）能組成的最佳五張牌型"""
+    present = [r for r in range(12, -1, -1) if counts[r]]
+    quads = [r for r in present if counts[r] == 4]
+    trips = [r for r in present if counts[r] == 3]
+    pairs = [r for r in present if counts[r] == 2]
+
+    if quads:
+        kicker = [r for r in present if r != quads[0]][:1]
+        return _structured_value(7, [quads[0]] + kicker)
+    if trips and (len(trips) > 1 or pairs):
+        pair = max(trips[1:] + pairs)
+        return _structured_value(6, [trips[0], pair])
+
+    rank_mask = sum(1 << r for r in present)
+    high = straight_high(rank_mask)
+    if high >= 0:
+        return _structured_value(4, [high])
+    if trips:
+        kickers = [r for r in present if r != trips[0]][:2]
+        return _structured_value(3, [trips[0]] + kickers)
+    if len(pairs) >= 2:
+        kicker = [r for r in present if r not in pairs[:2]][:1]
+        return _structured_value(2, pairs[:2] + kicker)
+    if pairs:
+        kickers = [r for r in present if r != pairs[0]][:3]
+        return _structured_value(1, [pairs[0]] + kickers)
+    return _structured_value(0, present[:5])
+
+
+def _flush_value(rank_mask):
+    """計算同花花色中的牌面遮罩能組成的最佳五張牌型（同花順或同花）"""
+    high = straight_high(rank_mask)
+    if high >= 0:
+        return _structured_value(8, [high])
+    present = [r for r in range(12, -1, -1) if rank_mask >> r & 1]
+    return _structured_value(5, present[:5])
+
+
+def _build_base_tables():
+    """建立同花查找表與牌型分級（7462 種等價牌型，數值越大越強）"""
+    flush_structured = np.zeros(8192, dtype=np.int64)
+    for mask in range(8192):
+        if bin(mask).count('1') >= 5:
+            flush_structured[mask] = _flush_value(mask)
+
+    # 列舉所有五張牌的牌面組合，配合同花表即涵蓋全部等價牌型
+    structured = set(flush_structured[flush_structured > 0].tolist())
+    for combo in itertools.combinations_with_replacement(range(13), 5):
+        counts = [0] * 13
+        for r in combo:
+            counts[r] += 1
+        if max(counts) <= 4:
+            structured.add(_rank_multiset_value(counts))
+    ordered = np.array(sorted(structured), dtype=np.int64)
+
+    flush_table = np.zeros(8192, dtype=np.uint16)
+    has_flush = flush_structured > 0
+    flush_table[has_flush] = np.searchsorted(ordered, flush_structured[has_flush]) + 1
+
+    # 花色計數鍵值（每種花色 3 位元）對應到同花花色，沒有同花為 -1
+    flush_suit = np.full(4096, -1, dtype=np.int8)
+    for key in range(4096):
+        for suit in range(4):
+            if (key >> (3 * suit)) & 7 >= 5:
+                flush_suit[key] = suit
+
+    # 每個牌型類別在分級中的起點
+    category_start = np.searchsorted(ordered, np.arange(9, dtype=np.int64) << 20) + 1
+
+    _tables['ordered'] = ordered
+    _tables['flush'] = flush_table
+    _tables['flush_suit'] = flush_suit
+    _tables['category_start'] = category_start
+
+
+def _rank_table(n_cards):
+    """取得 n 張牌的牌面查找表（依需要才建立）"""
+    table = _tables.get(n_cards)
+    if table is not None:
+        return table
+    if 'ordered' not in _tables:
+        _build_base_tables()
+
+    ordered = _tables['ordered']
+    keys = []
+    values = []
+    for combo in itertools.combinations_with_replacement(range(13), n_cards):
+        counts = [0] * 13
+        for r in combo:
+            counts[r] += 1
+        if max(counts) > 4:
+            continue
+        keys.append(sum(_RANK_KEYS[r] for r in combo))
+        values.append(_rank_multiset_value(counts))
+
+    keys = np.array(keys, dtype=np.int64)
+    table = np.zeros(int(keys.max()) + 1, dtype=np.uint16)
+    table[keys] = np.searchsorted(ordered, np.array(values, dtype=np.int64)) + 1
+    _tables[n_cards] = table
+    return table
+
+
+def evaluate(cards):
+    """
+    計算單一手牌（5-7 張）的牌力
+    :param cards: 牌面列表，可以是字串（'AS'）或整數編號
+    :return: 1-7462 的整數，數值越大牌力越強
+    """
+    ids = [card_to_int(card) for card in cards]
+    if not 5 <= len(ids) <= 7:
+        raise ValueError(f"牌數必須介於 5 到 7 張：{len(ids)}")
+
+    key = 0
+    for card_id in ids:
+        key += _CARD_KEY_LIST[card_id]
+    table = _rank_table(len(ids))
+
+    suit = int(_tables['flush_suit'][key >> 32])
+    if suit >= 0:
+        bits = 0
+        for card_id in ids:
+            bits |= _CARD_SUIT_BIT_LIST[card_id]
+        return int(_tables['flush'][(bits >> (16 * suit)) & 0x1FFF])
+    return int(table[key & 0xFFFFFFFF])
+
+
+def evaluate_many(cards):
+    """
+    批次計算多手牌的牌力
+    :param cards: 形狀為 (N, k) 的整數陣列，k 為 5-7，每列是一手牌的整數編號
+    :return: 長度為 N 的 uint16 陣列，數值越大牌力越強
+    """
+    cards = np.asarray(cards)
+    if cards.ndim != 2 or not 5 <= cards.shape[1] <= 7:
+        raise ValueError(f"牌陣列形狀必須為 (N, 5-7)：{cards.shape}")
+    table = _rank_table(cards.shape[1])
+
+    key = _CARD_KEY[cards[:, 0]]
+    for col in range(1, cards.shape[1]):
+        key = key + _CARD_KEY[cards[:, col]]
+
+    scores = table[key & 0xFFFFFFFF]
+
+    # 只有少數牌組有同花，另外處理
+    suits = _tables['flush_suit'][key >> 32]
+    flush_rows = np.flatnonzero(suits >= 0)
+    if flush_rows.size:
+        flush_cards = cards[flush_rows]
+        bits = _CARD_SUIT_BIT[flush_cards].sum(axis=1)
+        rank_masks = (bits >> (16 * suits[flush_rows].astype(np.int64))) & 0x1FFF
+        scores[flush_rows] = _tables['flush'][rank_masks]
+    return scores
+
+
+def hand_category(score):
+    """
+    取得牌力分數所屬的牌型類別
+    :param score: evaluate 回傳的牌力分數（可為陣列）
+    :return: HAND_CATEGORIES 的索引
+    """
+    if 'category_start' not in _tables:
+        _build_base_tables()
+    category = np.searchsorted(_tables['category_start'], score, side='right') - 1
+    return int(category) if np.ndim(category) == 0 else category
+
+
+def hand_name(score):
+    """取得牌力分數的牌型名稱"""
+    return HAND_CATEGORIES[hand_category(score)]
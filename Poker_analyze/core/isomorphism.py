@@ -0,0 +1,48 @@
+import itertools
+
+from cards import cards_to_ints
+
+# 24 種花色排列，以及每種排列下 52 張牌的對應
+SUIT_PERMUTATIONS = list(itertools.permutations(range(4)))
+_PERMUTED_CARDS = [
+    [perm[card // 13] * 13 + card % 13 for card in range(52)]
+    for perm in SUIT_PERMUTATIONS
+]
+
+
+def canonical_permutation(*card_groups):
+    """
+    將多組牌（例如手牌、公共牌、死牌）映射到花色同構的標準形式
+    每組牌內的順序不影響結果；在 24 種花色排列中取字典序最小的一種
+    :param card_groups: 多組整數編號的牌
+    :return: (每組排序後的 tuple 所組成的 tuple, 所用的 52 張牌對應表)
+    """
+    best = None
+    best_mapping = None
+    for mapping in _PERMUTED_CARDS:
+        candidate = tuple(tuple(sorted(mapping[card] for card in group)) for group in card_groups)
+        if best is None or candidate < best:
+            best = candidate
+            best_mapping = mapping
+    return best, best_mapping
+
+
+def canonical_cards(*card_groups):
+    """回傳多組牌的花色同構標準形式（見 canonical_permutation）"""
+    return canonical_permutation(*card_groups)[0]
+
+
+def canonical_key(own_cards, common_cards, n_players, dead_cards=None, known_hands=None):
+    """
+    計算（手牌、公共牌、玩家數）的花色同構鍵值，花色互換後相同的情境會得到同一個鍵值
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param common_cards: 桌面上已經揭示的公共牌（可為 None）
+    :param n_players: 總共參與遊戲的玩家數量
+    :param dead_cards: （可選）其他已知不在牌堆中的牌
+    :param known_hands: （可選）已知的對手手牌列表，每位兩張牌
+    :return: 可作為快取鍵值的 tuple
+    """
+    groups = canonical_cards(cards_to_ints(own_cards), cards_to_ints(common_cards or []),
+                             cards_to_ints(dead_cards or []),
+                             *[cards_to_ints(hand) for hand in known_hands or []])
+    return groups + (n_players,)
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize=4096, ttl=None, clock=time.monotonic):
+        """
+        有容量上限的 LRU 快取，記錄命中、未命中、淘汰與過期次數
+        maxsize: 最多保留的項目數
+        ttl: （可選）項目的存活秒數，過期的項目視為未命中並移除
+        clock: 取得目前時間的函數（秒）
+        """
+        if maxsize <= 0:
+            raise ValueError(f"快取容量必須大於 0：{maxsize}")
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f"存活時間必須大於 0：{ttl}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (value, 過期時間或 None)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, key, expires):
+        """項目已過期時移除並回傳 True"""
+        if expires is None or self._clock() < expires:
+            return False
+        del self._data[key]
+        self.expirations += 1
+        return True
+
+    def get(self, key, default=None):
+        """取得快取值，命中時會移到最近使用的位置"""
+        try:
+            value, expires = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if self._expired(key, expires):
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """寫入快取值，超過容量時淘汰最久未使用的項目"""
+        expires = self._clock() + self.ttl if self.ttl is not None else None
+        self._data[key] = (value, expires)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """清空快取內容（統計數字保留）"""
+        self._data.clear()
+
+    def __contains__(self, key):
+        entry = self._data.get(key)
+        return entry is not None and not self._expired(key, entry[1])
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """回傳快取統計資訊"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
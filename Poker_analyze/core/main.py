@@ -1,13 +1,49 @@
-from screen_capture import ScreenCapture
-from poker_analyzer import PokerAnalyzer
-from poker_bot import PokerBot
 import os
 import sys
-import mysql.connector
-from dotenv import load_dotenv
+import time
+import importlib
+from contextlib import contextmanager
 import asyncio
-import websockets
 import json
+import threading
+
+from lru_cache import LRUCache
+
+# 較重的模組（dotenv、anthropic、mysql、pynput、websockets、numpy）都延後到實際使用的元件才匯入，
+# 讓 server.js 啟動此程序後 WebSocket 服務器能盡快接受連線
+
+# --profile-startup 依序量測匯入時間的模組（先匯入的共用依賴不會重複計入後面的模組）
+STARTUP_MODULES = ['dotenv', 'websockets', 'mysql.connector', 'numpy', 'cards', 'game_state', 'equity_session',
+                   'poker_bot', 'anthropic', 'poker_analyzer', 'pynput', 'screen_capture']
+
+EQUITY_SESSION_LIMIT = 64  # 最多保留的勝率計算階段（每手牌一個）
+DECISION_MEMO_SIZE = 1024  # 決策快取容量：同一情境的連續截圖直接沿用決策
+DECISION_MEMO_TTL = 300  # 決策快取項目的存活秒數
+
+@contextmanager
+def timed(timings, name):
+    """記錄區塊的執行時間（秒）到 timings[name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
+def check_screen_permission():
+    """macOS 下檢查螢幕截圖權限（AppKit 只在需要時匯入；AppKit 需在主執行緒呼叫，不可放進執行緒池）"""
+    if sys.platform != 'darwin':
+        return
+    try:
+        from AppKit import NSEvent
+        mask = NSEvent.eventWithType_location_modifierFlags_timestamp_windowNumber_context_subtype_data1_data2_(
+            14, (0, 0), 0, 0, 0, None, 0, 0, 0
+        )
+        if not mask:
+            print("警告：可能需要螢幕截圖權限")
+    except Exception as e:
+        print(f"權限檢查警告：{str(e)}")
+
 
 class WebSocketManager:
     def __init__(self, port=3002):
@@ -19,14 +55,21 @@ class WebSocketManager:
         self.poker_bot = None
         self.running = False
         self.system_initialized = False
+        self._init_lock = asyncio.Lock()
+        self.startup_timings = {}  # 各元件初始化時間（秒）
         
         # 新增資料庫連接
         self.db_pool = None
 
+        # 以手牌為鍵值的勝率計算階段，同一手牌的連續截圖沿用上一條街的模擬結果
+        self.equity_sessions = LRUCache(maxsize=EQUITY_SESSION_LIMIT)
+        self._equity_lock = threading.Lock()  # 勝率在執行緒池中計算，EquitySession 與快取不可同時更新
+
     async def initialize_database(self):
         try:
             print("初始化資料庫連接...")
-            import mysql.connector.pooling
+            with timed(self.startup_timings, 'import mysql.connector'):
+                import mysql.connector.pooling
             
             # 使用環境變數進行配置
             dbconfig = {
@@ -40,7 +83,8 @@ class WebSocketManager:
             }
             
             print("正在建立資料庫連接池...")
-            self.db_pool = mysql.connector.pooling.MySQLConnectionPool(**dbconfig)
+            with timed(self.startup_timings, 'init database'):
+                self.db_pool = mysql.connector.pooling.MySQLConnectionPool(**dbconfig)
             print("資料庫連接池建立成功")
             return True
             
@@ -73,13 +117,12 @@ class WebSocketManager:
             print("原始分析結果:", analysis_text)
             
             # 2. 解析遊戲狀態
-            game_state = {
-                'stage': 'preflop',
+            from game_state import GameState
+            fields = {
                 'community_cards': [],
                 'hand_cards': [],
                 'pot_size': 0.0,
                 'player_stacks': {},
-                'current_bet': 0.0,
                 'position': ''
             }
             
@@ -94,74 +137,80 @@ class WebSocketManager:
                     current_section = line[:-1].strip()
                     continue
                 
-                if current_section == '目前遊戲狀態':
-                    game_state['stage'] = line.lower()
-                elif current_section == '位置':
-                    game_state['position'] = line
+                if current_section == '位置':
+                    fields['position'] = line
                 elif current_section == '底池':
                     try:
-                        game_state['pot_size'] = float(line.replace('BB', '').strip())
+                        fields['pot_size'] = float(line.replace('BB', '').strip())
                     except ValueError:
                         print(f"無法轉換底池大小: {line}")
                 elif current_section == '公牌':
                     if line.lower() != 'na':
-                        game_state['community_cards'] = line.split()
+                        fields['community_cards'] = line.split()
                 elif current_section == '手牌':
                     if ':' in line:
                         player, cards = line.split(':', 1)
-                        game_state['hand_cards'] = cards.strip().split()
+                        fields['hand_cards'] = cards.strip().split()
                 elif current_section == '玩家持有籌碼':
                     for player_info in line.split(','):
                         if ':' in player_info:
                             player, stack = player_info.split(':')
                             try:
-                                game_state['player_stacks'][player.strip()] = float(stack.replace('BB', '').strip())
+                                fields['player_stacks'][player.strip()] = float(stack.replace('BB', '').strip())
                             except ValueError:
                                 print(f"無法轉換籌碼量: {stack}")
+            # 階段由公共牌數量判斷，無法辨識的牌面會被略過
+            game_state = GameState(**fields)
 
-            # 3. 取得機器人決策
-            decision = self.poker_bot.get_decision(game_state)
+            # 3. 計算勝率（數萬次模擬，放到執行緒池以免阻塞事件迴圈）
+            equity = await asyncio.get_running_loop().run_in_executor(None, self.calculate_equity, game_state)
+
+            # 4. 取得機器人決策（有勝率時以期望值決定加注尺寸）
+            decision = self.poker_bot.get_decision(
+                game_state, equity=equity['win'] + equity['tie'] / 2 if equity else None)
             print("機器人決策:", decision)
             
-            # 4. 準備資料庫記錄
+            # 5. 準備資料庫記錄
             if user_id and session_id:
                 # 準備資料庫記錄
                 db_record = {
                     'user_id': user_id,
                     'session_id': session_id,
                     'screenshot_path': image_path,
-                    'game_state': json.dumps(game_state),
-                    'player_cards': ' '.join(game_state['hand_cards']),
-                    'board_cards': ' '.join(game_state['community_cards']),
-                    'position': game_state['position'],
-                    'pot_size': float(game_state['pot_size']),
+                    'game_state': game_state.to_json(),
+                    'player_cards': ' '.join(game_state.hand_cards),
+                    'board_cards': ' '.join(game_state.community_cards),
+                    'position': game_state.position,
+                    'pot_size': game_state.pot_size,
                     'action_taken': decision['action'],
                     'action_amount': float(decision['amount']) if decision['amount'] else 0.0,
                     'ai_decision': json.dumps(decision)
                 }
                 
-                # 5. 儲存到資料庫
+                # 6. 儲存到資料庫
                 await self.save_game_record(**db_record)
                 print("遊戲記錄已保存到資料庫")
             
             return {
                 'type': 'analysis',
                 'screenshot': image_path,
-                'game_state': game_state,
+                'game_state': game_state.to_dict(),
                 'decision': decision,
+                'equity': equity,
                 'raw_analysis': analysis_text
             }
             
-            # 6. 準備回應
+            # 7. 準備回應
             response = {
                 'type': 'analysis',
                 'screenshot': image_path,
-                'game_state': game_state,
+                'game_state': game_state.to_dict(),
                 'decision': decision,
+                'equity': equity,
                 'raw_analysis': analysis_text
             }
             
-            # 7. 發送 WebSocket 更新
+            # 8. 發送 WebSocket 更新
             await self.send_update(response)
             
             return response
@@ -178,6 +227,33 @@ class WebSocketManager:
                 'message': error_message
             }
     
+    def calculate_equity(self, game_state):
+        """
+        計算目前手牌的勝率，同一手牌（手牌與玩家數相同）的連續截圖共用同一個 EquitySession
+        參數:
+            game_state: 解析後的 GameState
+        返回:
+            勝率結果字典，手牌無法辨識時為 None
+        """
+        if len(game_state.hand) != 2:
+            return None
+        n_players = max(len(game_state.player_stacks), 2)
+        from equity_session import EquitySession
+        try:
+            key = (game_state.hand_mask, n_players)
+            with self._equity_lock:
+                session = self.equity_sessions.get(key)
+                if session is None:
+                    session = EquitySession(list(game_state.hand), n_players)
+                    self.equity_sessions.put(key, session)
+                equity = session.update(list(game_state.board))
+            print(f"勝率：{equity['win']:.2%}，平手：{equity['tie']:.2%}"
+                  f"（沿用 {equity['reused']} 次模擬，新增 {equity['simulated']} 次）")
+            return equity
+        except ValueError as e:
+            print(f"無法計算勝率：{str(e)}")
+            return None
+
     def create_analyze_callback(self):
         async def callback(image_path):
             print("收到截圖回調")
@@ -215,8 +291,7 @@ class WebSocketManager:
     async def start_analysis(self):
         try:
             print("開始初始化截圖系統...")
-            if not self.screen_capture:
-                self.initialize_system()
+            await self.ensure_initialized()
             
             print("啟動截圖監聽...")
             if not self.running:
@@ -273,22 +348,36 @@ class WebSocketManager:
             self.screen_capture = None
             self.poker_analyzer = None
             self.poker_bot = None
+            self.system_initialized = False
             print("系統資源清理完成")
         except Exception as e:
             print(f"清理資源時發生錯誤: {str(e)}")
 
+    async def ensure_initialized(self):
+        """
+        在背景執行緒初始化系統組件（只初始化一次），初始化期間事件迴圈仍可處理 WebSocket 連線
+        """
+        async with self._init_lock:
+            if not self.system_initialized:
+                await asyncio.get_running_loop().run_in_executor(None, self.initialize_system)
+
     def initialize_system(self):
         print("初始化系統組件...")
         try:
             # 載入環境變數
+            from dotenv import load_dotenv
             load_dotenv()
             api_key = os.getenv('ANTHROPIC_API_KEY')
             if not api_key:
                 raise ValueError("請設定 ANTHROPIC_API_KEY 環境變數")
 
-            # 確認模型文件存在
+            # 確認模型文件存在（優先使用不比 model.json 舊的二進位模型）
             current_dir = os.path.dirname(os.path.abspath(__file__))
             model_path = os.path.join(current_dir, 'model.json')
+            binary_path = os.path.join(current_dir, 'model.bin')
+            if os.path.exists(binary_path) and (not os.path.exists(model_path)
+                                                or os.path.getmtime(binary_path) >= os.path.getmtime(model_path)):
+                model_path = binary_path
             if not os.path.exists(model_path):
                 raise FileNotFoundError(f"找不到模型文件：{model_path}")
 
@@ -296,21 +385,29 @@ class WebSocketManager:
             capture_region = (9, 70, 330, 707)
 
             print("初始化截圖模組...")
-            self.screen_capture = ScreenCapture(
-                capture_region=capture_region,
-                output_dir="poker_captures"
-            )
+            with timed(self.startup_timings, 'init screen_capture'):
+                from screen_capture import ScreenCapture
+                self.screen_capture = ScreenCapture(
+                    capture_region=capture_region,
+                    output_dir="poker_captures"
+                )
             
             print("初始化分析模組...")
-            self.poker_analyzer = PokerAnalyzer(api_key=api_key)
+            with timed(self.startup_timings, 'init poker_analyzer'):
+                from poker_analyzer import PokerAnalyzer
+                self.poker_analyzer = PokerAnalyzer(api_key=api_key)
             
             print("初始化決策模組...")
-            self.poker_bot = PokerBot(model_path=model_path)
+            with timed(self.startup_timings, 'init poker_bot'):
+                from poker_bot import PokerBot
+                self.poker_bot = PokerBot(model_path=model_path, memo_size=DECISION_MEMO_SIZE,
+                                          memo_ttl=DECISION_MEMO_TTL)
             
             print("驗證所有模組連接...")
             if not all([self.screen_capture, self.poker_analyzer, self.poker_bot]):
                 raise RuntimeError("部分模組初始化失敗")
                 
+            self.system_initialized = True
             print("系統組件初始化完成")
             
         except Exception as e:
@@ -441,17 +538,44 @@ class WebSocketManager:
             if connection:
                 connection.close()
 
+def profile_startup():
+    """
+    量測冷啟動：依序匯入 STARTUP_MODULES 並初始化各元件，列出每一項的耗時
+    返回:
+        {項目名稱: 秒數}，失敗的項目為錯誤訊息
+    """
+    timings = {}
+    for name in STARTUP_MODULES:
+        try:
+            with timed(timings, f'import {name}'):
+                importlib.import_module(name)
+        except Exception as e:
+            timings[f'import {name}'] = f'失敗：{str(e)}'
+
+    with timed(timings, 'check_screen_permission'):
+        check_screen_permission()
+    ws_manager = WebSocketManager()
+    try:
+        ws_manager.initialize_system()
+    except Exception:
+        pass  # 錯誤已由 initialize_system 輸出，仍列出已完成項目的時間
+    timings.update(ws_manager.startup_timings)
+
+    print("=== 冷啟動時間 ===")
+    for name, value in timings.items():
+        print(f"{name:<28}{value * 1000:>10.1f} ms" if isinstance(value, float) else f"{name:<28}{value}")
+    return timings
+
+
 async def main():
     ws_manager = WebSocketManager()
     
     try:
-        print("初始化系統...")
-        ws_manager.initialize_system()
-        
-        print("初始化資料庫連接...")
-        await ws_manager.initialize_database()
-        
-        # 啟動 WebSocket 服務器
+        from dotenv import load_dotenv
+        load_dotenv()
+
+        # 先啟動 WebSocket 服務器，再初始化較慢的元件
+        import websockets
         server = await websockets.serve(
             ws_manager.handler,
             "localhost",
@@ -459,6 +583,12 @@ async def main():
         )
         print(f"WebSocket 服務器運行在 port {ws_manager.port}")
 
+        print("初始化系統...")
+        await ws_manager.ensure_initialized()
+        
+        print("初始化資料庫連接...")
+        await ws_manager.initialize_database()
+
         # 啟動截圖監聽
         await ws_manager.start_analysis()
         print("系統就緒，請按空白鍵進行截圖分析...")
@@ -478,25 +608,19 @@ async def main():
         await ws_manager.cleanup()
 
 if __name__ == "__main__":
+    if '--profile-startup' in sys.argv:
+        profile_startup()
+        sys.exit(0)
+
     print("=== Python 程序啟動 ===")
     print("使用說明：")
     print("- 空白鍵：進行截圖和分析")
     print("- ESC 鍵：停止程序")
     print("- Ctrl+C：強制終止程序")
-    
-    # 檢查系統權限
-    try:
-        import ctypes
-        if sys.platform == 'darwin':  # macOS
-            from AppKit import NSEvent
-            mask = NSEvent.eventWithType_location_modifierFlags_timestamp_windowNumber_context_subtype_data1_data2_(
-                14, (0, 0), 0, 0, 0, None, 0, 0, 0
-            )
-            if not mask:
-                print("警告：可能需要螢幕截圖權限")
-    except Exception as e:
-        print(f"權限檢查警告：{str(e)}")
-    
+
+    # 檢查系統權限（在主執行緒進行，系統組件之後才在背景執行緒初始化）
+    check_screen_permission()
+
     try:
         print("初始化 WebSocket 管理器...")
         asyncio.run(main())
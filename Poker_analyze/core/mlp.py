@@ -0,0 +1,196 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+# model.json 中的層名稱與各層的激活函數（7 -> 32 -> 32 -> 41）
+DENSE_LAYERS = ['dense', 'dense_1', 'dense_2']
+ACTIVATIONS = ['relu', 'relu', 'softmax']
+
+# 二進位模型格式：檔頭（魔術字、版本、層數、資料 CRC32、資料長度）+ 每層描述
+# （輸入維度、輸出維度、激活函數代碼、kernel 位移、bias 位移），之後是 float32 權重，
+# 每個陣列都從 64 位元組對齊的位置開始，方便記憶體映射後直接使用
+_MAGIC = b'PKMB'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHII')
+_LAYER = struct.Struct('<IIIII')
+_ALIGN = 64
+_ACTIVATION_CODES = ['linear', 'relu', 'softmax']
+
+
+def load_json_weights(model_path):
+    """
+    從 model.json 讀出推論用的權重（忽略 optimizer_weights）
+    :param model_path: 模型文件路徑
+    :return: [(kernel, bias), ...]，皆為 float32
+    """
+    with open(model_path, 'r') as f:
+        model_data = json.load(f)
+    weights = []
+    for layer_name in DENSE_LAYERS:
+        layer_data = model_data['model_weights'][layer_name][layer_name]
+        kernel = np.array(layer_data['kernel:0'], dtype=np.float32)
+        bias = np.array(layer_data['bias:0'], dtype=np.float32)
+        weights.append((kernel, bias))
+    return weights
+
+
+def save_json_weights(weights, path):
+    """
+    以 model.json 的格式寫出推論權重（只含 model_weights，可由 load_json_weights 讀取）
+    :param weights: [(kernel, bias), ...]
+    :param path: 輸出檔案路徑
+    """
+    model_weights = {}
+    for layer_name, (kernel, bias) in zip(DENSE_LAYERS, weights):
+        model_weights[layer_name] = {layer_name: {
+            'kernel:0': np.asarray(kernel, dtype=np.float32).tolist(),
+            'bias:0': np.asarray(bias, dtype=np.float32).tolist()
+        }}
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump({'model_weights': model_weights}, f)
+    os.replace(temp_path, path)
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def save_binary_weights(weights, path, activations=ACTIVATIONS):
+    """
+    將推論權重寫成對齊的 float32 二進位檔
+    :param weights: [(kernel, bias), ...]
+    :param path: 輸出檔案路徑
+    :param activations: 各層的激活函數
+    :return: 寫入的位元組數
+    """
+    arrays = []
+    layers = []
+    offset = _aligned(_HEADER.size + _LAYER.size * len(weights))
+    data_start = offset
+    for (kernel, bias), activation in zip(weights, activations):
+        kernel = np.ascontiguousarray(kernel, dtype='<f4')
+        bias = np.ascontiguousarray(bias, dtype='<f4')
+        kernel_offset = offset
+        bias_offset = _aligned(kernel_offset + kernel.nbytes)
+        offset = _aligned(bias_offset + bias.nbytes)
+        layers.append((kernel.shape[0], kernel.shape[1], _ACTIVATION_CODES.index(activation),
+                       kernel_offset, bias_offset))
+        arrays += [(kernel_offset, kernel), (bias_offset, bias)]
+
+    data = bytearray(offset - data_start)
+    for array_offset, array in arrays:
+        start = array_offset - data_start
+        data[start:start + array.nbytes] = array.tobytes()
+    header = _HEADER.pack(_MAGIC, _VERSION, len(layers), zlib.crc32(data), len(data))
+    header += b''.join(_LAYER.pack(*layer) for layer in layers)
+
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(data_start, b'\0'))
+        f.write(data)
+    os.replace(temp_path, path)
+    return data_start + len(data)
+
+
+def load_binary_weights(path, verify=True):
+    """
+    以記憶體映射載入二進位模型，權重直接指向映射的頁面（多個行程可共用）
+    :param path: 模型檔案路徑
+    :param verify: 是否檢查資料的 CRC32
+    :return: ([(kernel, bias), ...], 激活函數列表)
+    """
+    buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    magic, version, n_layers, checksum, data_size = _HEADER.unpack_from(buffer, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"模型檔案格式錯誤：{path}")
+    layers = [_LAYER.unpack_from(buffer, _HEADER.size + i * _LAYER.size) for i in range(n_layers)]
+    data_start = _aligned(_HEADER.size + _LAYER.size * n_layers)
+    if len(buffer) != data_start + data_size:
+        raise ValueError(f"模型檔案長度不符：{path}")
+    if verify and zlib.crc32(buffer[data_start:]) != checksum:
+        raise ValueError(f"模型檔案校驗碼錯誤：{path}")
+
+    weights = []
+    activations = []
+    for in_dim, out_dim, activation, kernel_offset, bias_offset in layers:
+        kernel = np.ndarray((in_dim, out_dim), dtype='<f4', buffer=buffer, offset=kernel_offset)
+        bias = np.ndarray((out_dim,), dtype='<f4', buffer=buffer, offset=bias_offset)
+        weights.append((kernel, bias))
+        activations.append(_ACTIVATION_CODES[activation])
+    return weights, activations
+
+
+def weights_checksum(weights):
+    """推論權重的 CRC32（以 float32 計算，JSON 與二進位格式載入的相同權重結果一致）"""
+    checksum = 0
+    for kernel, bias in weights:
+        checksum = zlib.crc32(np.ascontiguousarray(kernel, dtype='<f4').tobytes(), checksum)
+        checksum = zlib.crc32(np.ascontiguousarray(bias, dtype='<f4').tobytes(), checksum)
+    return checksum
+
+
+def load_weights(model_path):
+    """
+    依副檔名載入模型權重：.bin 為二進位格式，其餘視為 model.json
+    :return: ([(kernel, bias), ...], 激活函數列表)
+    """
+    if model_path.endswith('.bin'):
+        return load_binary_weights(model_path)
+    return load_json_weights(model_path), list(ACTIVATIONS)
+
+
+class NumpyMLP:
+    def __init__(self, weights, activations=ACTIVATIONS):
+        """
+        以 NumPy 執行全連接網路的前向傳播，計算方式與 Keras Dense 層相同（float32）
+        weights: [(kernel, bias), ...]，kernel 形狀為 (輸入維度, 輸出維度)
+        activations: 各層的激活函數（'relu'、'softmax' 或 'linear'）
+        """
+        if len(weights) != len(activations):
+            raise ValueError(f"層數（{len(weights)}）與激活函數數量（{len(activations)}）不符")
+        self.weights = [(np.ascontiguousarray(kernel, dtype=np.float32),
+                         np.ascontiguousarray(bias, dtype=np.float32)) for kernel, bias in weights]
+        self.activations = list(activations)
+        self.input_dim = self.weights[0][0].shape[0]
+        self.output_dim = self.weights[-1][0].shape[1]
+        self._capacity = 0
+        self._buffers = []
+        self._reserve(1)
+
+    def _reserve(self, batch_size):
+        """預先配置每層輸出的緩衝區，批次變大時才重新配置"""
+        if batch_size <= self._capacity:
+            return
+        self._capacity = batch_size
+        self._buffers = [np.empty((batch_size, kernel.shape[1]), dtype=np.float32)
+                         for kernel, _ in self.weights]
+
+    def predict(self, x, verbose=0):
+        """
+        前向傳播（參數與 Keras model.predict 相容，verbose 不使用）
+        :param x: 形狀為 (N, 輸入維度) 的輸入
+        :return: 形狀為 (N, 輸出維度) 的 float32 輸出
+        """
+        x = np.asarray(x, dtype=np.float32)
+        if x.ndim == 1:
+            x = x[None, :]
+        n = x.shape[0]
+        self._reserve(n)
+        for (kernel, bias), activation, buffer in zip(self.weights, self.activations, self._buffers):
+            out = buffer[:n]
+            np.matmul(x, kernel, out=out)
+            out += bias
+            if activation == 'relu':
+                np.maximum(out, 0, out=out)
+            elif activation == 'softmax':
+                out -= out.max(axis=1, keepdims=True)
+                np.exp(out, out=out)
+                out /= out.sum(axis=1, keepdims=True)
+            elif activation != 'linear':
+                raise ValueError(f"不支援的激活函數：{activation}")
+            x = out
+        return x.copy()
@@ -0,0 +1,152 @@
+import numpy as np
+
+from cards import (CARD_MASKS, FULL_DECK_MASK, POPCOUNT, cards_to_ints, cards_to_mask, int_to_card,
+                   mask_to_ints, straight_high)
+from equity import _combination_index
+from hand_evaluator import HAND_CATEGORIES, evaluate_many, hand_category
+
+
+def mask_category(mask):
+    """
+    以位元運算判斷一組牌（最多 7 張，可少於 5 張）的牌型類別
+    :param mask: 52 位元遮罩
+    :return: HAND_CATEGORIES 的索引
+    """
+    s0, s1, s2, s3 = mask & 0x1FFF, (mask >> 13) & 0x1FFF, (mask >> 26) & 0x1FFF, mask >> 39
+    flush_ranks = 0
+    for suit_mask in (s0, s1, s2, s3):
+        if POPCOUNT[suit_mask] >= 5:
+            flush_ranks = suit_mask
+    if flush_ranks and straight_high(flush_ranks) >= 0:
+        return 8
+    if s0 & s1 & s2 & s3:
+        return 7
+    # 出現至少兩張 / 三張的牌面
+    pairs = (s0 & (s1 | s2 | s3)) | (s1 & (s2 | s3)) | (s2 & s3)
+    trips = (s0 & s1 & (s2 | s3)) | ((s0 | s1) & s2 & s3)
+    if trips and POPCOUNT[pairs] >= 2:
+        return 6
+    if flush_ranks:
+        return 5
+    if straight_high(s0 | s1 | s2 | s3) >= 0:
+        return 4
+    if trips:
+        return 3
+    if POPCOUNT[pairs] >= 2:
+        return 2
+    return 1 if pairs else 0
+
+
+_POPCOUNT = np.array(POPCOUNT, dtype=np.int8)
+_STRAIGHT_HIGH = np.array([straight_high(ranks) for ranks in range(1 << 13)], dtype=np.int8)
+_CARD_MASKS = np.array(CARD_MASKS, dtype=np.uint64)
+
+
+def mask_categories(masks):
+    """
+    mask_category 的批次版本：以陣列運算判斷多組牌的牌型類別
+    :param masks: 52 位元遮罩陣列（uint64，任意形狀）
+    :return: 與 masks 相同形狀的 HAND_CATEGORIES 索引陣列
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    s0, s1, s2, s3 = ((masks >> np.uint64(13 * suit)) & np.uint64(0x1FFF) for suit in range(4))
+    s0, s1, s2, s3 = (suit.astype(np.intp) for suit in (s0, s1, s2, s3))
+    flush_ranks = np.zeros_like(s0)
+    for suit_mask in (s0, s1, s2, s3):
+        flush_ranks = np.where(_POPCOUNT[suit_mask] >= 5, suit_mask, flush_ranks)
+    pairs = (s0 & (s1 | s2 | s3)) | (s1 & (s2 | s3)) | (s2 & s3)
+    trips = (s0 & s1 & (s2 | s3)) | ((s0 | s1) & s2 & s3)
+
+    # 由弱到強依序覆寫，最後留下的即為最強的牌型
+    categories = np.where(pairs != 0, 1, 0).astype(np.int8)
+    categories[_POPCOUNT[pairs] >= 2] = 2
+    categories[trips != 0] = 3
+    categories[_STRAIGHT_HIGH[s0 | s1 | s2 | s3] >= 0] = 4
+    categories[flush_ranks != 0] = 5
+    categories[(trips != 0) & (_POPCOUNT[pairs] >= 2)] = 6
+    categories[(s0 & s1 & s2 & s3) != 0] = 7
+    categories[(flush_ranks != 0) & (_STRAIGHT_HIGH[flush_ranks] >= 0)] = 8
+    return categories
+
+
+def count_outs_batch(hero_masks, board_masks):
+    """
+    count_outs 一張牌 outs 的批次版本：一次判斷每個狀態加上每張補牌後的牌型
+    :param hero_masks: 每個狀態手牌加公共牌的 52 位元遮罩 (N,)
+    :param board_masks: 每個狀態公共牌的 52 位元遮罩 (N,)
+    :return: (各牌型的 outs 數 (N, 牌型數)，剩餘牌數 (N,))
+    """
+    hero_masks = np.asarray(hero_masks, dtype=np.uint64)
+    board_masks = np.asarray(board_masks, dtype=np.uint64)
+    current = mask_categories(hero_masks)
+    categories = mask_categories(hero_masks[:, None] | _CARD_MASKS)
+    board_categories = mask_categories(board_masks[:, None] | _CARD_MASKS)
+    unseen = (hero_masks[:, None] & _CARD_MASKS) == 0
+    improved = unseen & (categories > current[:, None]) & (categories > board_categories)
+    counts = np.zeros((len(hero_masks), len(HAND_CATEGORIES)), dtype=np.int64)
+    for category in range(len(HAND_CATEGORIES)):
+        counts[:, category] = np.count_nonzero(improved & (categories == category), axis=1)
+    return counts, np.count_nonzero(unseen, axis=1)
+
+
+def _two_card_categories(hero, board, deck):
+    """列舉轉牌與河牌的所有組合，回傳 (自己最終牌型, 公共牌本身的牌型) 兩個陣列"""
+    runouts = np.asarray(deck)[_combination_index(len(deck), 2)]
+    n = len(runouts)
+    final_board = np.hstack([np.tile(board, (n, 1)), runouts])
+    final_hero = hand_category(evaluate_many(np.hstack([np.tile(hero, (n, 1)), final_board])))
+    return final_hero, hand_category(evaluate_many(final_board))
+
+
+def count_outs(own_cards, common_cards, two_card=False):
+    """
+    完整列舉剩餘牌堆，計算能讓手牌升級的補牌（outs）
+    只計算真正用到自己手牌的升級：補牌後公共牌本身就達到的牌型不算 outs
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param common_cards: 翻牌或轉牌（3 或 4 張公共牌）
+    :param two_card: 是否另外計算到河牌為止的升級機率（翻牌時需列舉所有轉河牌組合，每次約 0.5 毫秒）
+    :return: 結果字典，包含目前牌型、各牌型的 outs 數與補牌、下一張的升級機率；
+             two_card 為 True 時另含到河牌為止的升級機率（two_card、two_card_categories）
+    """
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards)
+    if len(hero) != 2 or len(board) not in (3, 4):
+        raise ValueError(f"需要兩張手牌與 3 或 4 張公共牌：{own_cards} {common_cards}")
+    hero_mask = cards_to_mask(hero + board)
+    board_mask = cards_to_mask(board)
+    deck = mask_to_ints(FULL_DECK_MASK & ~hero_mask)
+    current = mask_category(hero_mask)
+
+    # 一張牌的升級：每張補牌各自以位元運算判斷牌型
+    outs = {}
+    for card in deck:
+        category = mask_category(hero_mask | CARD_MASKS[card])
+        if category > current and category > mask_category(board_mask | CARD_MASKS[card]):
+            outs.setdefault(HAND_CATEGORIES[category], []).append(int_to_card(card))
+    n_outs = sum(len(cards) for cards in outs.values())
+    one_card = n_outs / len(deck)
+    result = {
+        'current': HAND_CATEGORIES[current],
+        'outs': {name: len(cards) for name, cards in outs.items()},
+        'out_cards': outs,
+        'total_outs': n_outs,
+        'remaining': len(deck),
+        'one_card': one_card
+    }
+    if not two_card:
+        return result
+
+    # 兩張牌（翻牌到河牌）的升級機率：以查表評估器一次評估所有轉河牌組合
+    two_card = one_card
+    two_card_categories = {name: len(cards) / len(deck) for name, cards in outs.items()}
+    if len(board) == 3:
+        final_hero, final_board = _two_card_categories(hero, board, deck)
+        improved = (final_hero > current) & (final_hero > final_board)
+        two_card = float(np.count_nonzero(improved)) / len(final_hero)
+        counts = np.bincount(final_hero[improved], minlength=len(HAND_CATEGORIES))
+        two_card_categories = {HAND_CATEGORIES[category]: int(count) / len(final_hero)
+                               for category, count in enumerate(counts) if count}
+
+    result['two_card'] = two_card
+    result['two_card_categories'] = two_card_categories
+    return result
@@ -1,17 +1,78 @@
 import numpy as np
-import json
-import tensorflow as tf
 import os
 
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # 設置 TensorFlow 日誌級別
+from bet_sizing import raise_chips, size_actions
+from cards import cards_to_ints, cards_to_mask, int_to_card
+from flop_table import flop_features, load_flop_table
+from game_state import GameState, Stage
+from hand_evaluator import HAND_CATEGORIES
+from lru_cache import LRUCache
+from mlp import NumpyMLP, load_weights, weights_checksum
+from outs import count_outs_batch
+from preflop_policy import DEFAULT_POLICY_PATH, load_preflop_policy
+
+BACKENDS = ('numpy', 'keras')  # 可用的推論後端
+MEMO_STEP = 1e-3  # 決策快取鍵的量化間距：狀態向量差距在此範圍內視為相同的情境
+# 補牌機率計算的牌型類別
+STRAIGHT, FLUSH, STRAIGHT_FLUSH = (HAND_CATEGORIES.index(name) for name in ('straight', 'flush', 'straight_flush'))
+
+# 模型輸出索引對應的標準動作，超出範圍的索引視為棄牌；
+# 加注的 amount 為「底池 + 跟注額」的倍數，get_decisions 輸出前會換算為投入的籌碼（BB）
+ACTIONS = [
+    {'action': 'fold', 'amount': 0},
+    {'action': 'check', 'amount': 0},
+    {'action': 'call', 'amount': None},
+    {'action': 'raise', 'amount': 1.0},
+    {'action': 'raise', 'amount': 2.0},
+    {'action': 'raise', 'amount': 3.0}
+]
 
 class PokerBot:
-    def __init__(self, model_path='model.json'):
+    def __init__(self, model_path='model.json', backend='numpy', memo_size=0, memo_ttl=None,
+                 policy_path=DEFAULT_POLICY_PATH, flop_features=False):
         """
         初始化撲克機器人
-        model_path: 模型文件路徑
+        model_path: 模型文件路徑（model.json，或由 convert_model.py 產生的 .bin 二進位檔）
+        backend: 推論後端，'numpy'（預設，不需要 TensorFlow）或 'keras'
+        memo_size: 決策快取的容量，0 表示不使用快取
+        memo_ttl: （可選）決策快取項目的存活秒數
+        policy_path: 翻牌前策略表路徑（由 preflop_policy.py 編譯），None 表示不使用
+        flop_features: 翻牌圈的四個強度輸入是否改為翻牌特徵表的 [E[HS], 正潛力, 負潛力, 目前牌力]；
+                       內附的模型是以 [基礎牌力, 同花潛力, 順子潛力, 高牌價值] 訓練，只有以新格式重新訓練的模型才能開啟
         """
+        if backend not in BACKENDS:
+            raise ValueError(f"不支援的推論後端：{backend}")
+        if flop_features and load_flop_table() is None:
+            raise FileNotFoundError("翻牌特徵表不存在，請先執行 flop_table.py 產生 flop_strength.bin")
+        self.flop_features = flop_features
+        self.backend = backend
+        self.model_path = model_path
+        # 決策快取：以量化後的狀態向量與階段為鍵；手牌強度快取：以手牌與公共牌為鍵
+        self.decision_memo = LRUCache(maxsize=memo_size, ttl=memo_ttl) if memo_size else None
+        self.strength_memo = LRUCache(maxsize=memo_size, ttl=memo_ttl) if memo_size else None
+        self.policy_path = policy_path
+        self.model_checksum = None  # 目前模型權重的校驗碼
         self.model = self._load_model(model_path)
+        self.preflop_policy = self._load_policy()
+
+    def reload_model(self, model_path=None):
+        """
+        重新載入模型（例如模型檔更新後），並清空依賴舊模型的決策快取
+        參數:
+            model_path: （可選）新的模型文件路徑，預設沿用目前的路徑
+        """
+        self.model_path = model_path or self.model_path
+        self.model = self._load_model(self.model_path)
+        self.preflop_policy = self._load_policy()
+        if self.decision_memo is not None:
+            self.decision_memo.clear()
+            self.strength_memo.clear()
+
+    def memo_stats(self):
+        """回傳決策快取與手牌強度快取的統計資訊（未啟用快取時回傳 None）"""
+        if self.decision_memo is None:
+            return None
+        return {'decisions': self.decision_memo.stats(), 'strengths': self.strength_memo.stats()}
     
     def _load_model(self, model_path):
         try:
@@ -19,182 +80,160 @@ class PokerBot:
                 raise FileNotFoundError(f"模型文件不存在：{model_path}")
                 
             print(f"正在載入模型：{model_path}")
-            with open(model_path, 'r') as f:
-                model_data = json.load(f)
-            
-            model = tf.keras.Sequential([
-                tf.keras.layers.Dense(32, activation='relu', input_shape=(7,)),
-                tf.keras.layers.Dense(32, activation='relu'),
-                tf.keras.layers.Dense(41, activation='softmax')
-            ])
+            weights, activations = load_weights(model_path)
+            self.model_checksum = weights_checksum(weights)
             
-            weights = []
-            for layer_name in ['dense', 'dense_1', 'dense_2']:
-                layer_data = model_data['model_weights'][layer_name][layer_name]
-                kernel = np.array(layer_data['kernel:0'])
-                bias = np.array(layer_data['bias:0'])
-                weights.extend([kernel, bias])
-            
-            model.set_weights(weights)
-            print("模型載入成功")
+            if self.backend == 'keras':
+                model = self._build_keras_model(weights)
+            else:
+                model = NumpyMLP(weights, activations)
+            print(f"模型載入成功（{self.backend} 後端）")
             return model
             
         except Exception as e:
             print(f"模型載入失敗：{str(e)}")
             raise
     
-    def _get_card_value(self, card_str):
-        """
-        將牌面值轉換為數字
-        參數:
-            card_str: 牌面值字串（如 'Q'、'K'、'A'）
-        返回:
-            對應的數值（2-14）
-        """
+    def _load_policy(self):
+        """載入翻牌前策略表；表格是以其他模型權重編譯時視為過期，改回模型推論"""
+        policy = load_preflop_policy(self.policy_path)
+        if policy is not None and policy.is_stale(self.model_checksum):
+            print(f"翻牌前策略表已過期（模型權重已變更），請重新執行 preflop_policy.py：{self.policy_path}")
+            return None
+        return policy
+
+    def _build_keras_model(self, weights):
+        """建立 Keras 模型；只有選擇 keras 後端時才會匯入 TensorFlow"""
+        os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'  # 設置 TensorFlow 日誌級別
+        import tensorflow as tf
+
+        model = tf.keras.Sequential([
+            tf.keras.layers.Dense(32, activation='relu', input_shape=(7,)),
+            tf.keras.layers.Dense(32, activation='relu'),
+            tf.keras.layers.Dense(41, activation='softmax')
+        ])
+        model.set_weights([array for layer in weights for array in layer])
+        return model
+
+    def _calculate_hand_strength(self, hand_cards, community_cards):
+        """進階手牌強度計算（單一手牌，計算方式見 _strength_features）"""
         try:
-            # 擴展撲克牌面值映射
-            value_map = {
-                'T': 10,
-                'J': 11,
-                'Q': 12,
-                'K': 13,
-                'A': 14
-            }
-            
-            # 如果是字母牌面，從映射取值
-            if card_str in value_map:
-                return value_map[card_str]
-            # 如果是數字牌面，直接轉換
-            elif card_str.isdigit():
-                return int(card_str)
-            else:
-                print(f"無效的牌面值: {card_str}")
-                return 0
-                
+            return self._strength_features([tuple(cards_to_ints(hand_cards))],
+                                           [tuple(cards_to_ints(community_cards))])[0]
         except Exception as e:
-            print(f"牌面值轉換錯誤：{str(e)}")
-            return 0  # 發生錯誤時返回預設值
-    
-    def _determine_stage(self, num_community_cards):
+            print(f"計算手牌強度時發生錯誤：{str(e)}")
+            return np.array([0.0, 0.0, 0.0, 0.0])
+
+    def _strength_features(self, hands, boards, verbose=False):
         """
-        根據公共牌數量確定遊戲階段
-        
+        進階手牌強度計算（批次）：以陣列運算一次計算 [基礎牌力, 同花潛力, 順子潛力, 高牌價值]
         參數:
-            num_community_cards: 公共牌數量
-            
+            hands: 每個狀態的手牌整數編號（只使用前兩張）
+            boards: 每個狀態的公共牌整數編號
+            verbose: 是否逐手輸出分析結果
         返回:
-            遊戲階段字符串
+            形狀為 (N, 4) 的手牌強度特徵；手牌不足兩張、或需要計算補牌時有重複的牌，該列為 0
         """
-        if num_community_cards == 0:
-            return 'preflop'
-        elif num_community_cards == 3:
-            return 'flop'
-        elif num_community_cards == 4:
-            return 'turn'
-        elif num_community_cards == 5:
-            return 'river'
-        return 'preflop'  # 預設值
+        strengths = np.zeros((len(hands), 4))
+        rows = []
+        for row, (hand, board) in enumerate(zip(hands, boards)):
+            # 需要計算補牌時（翻牌與轉牌）手牌與公共牌不能重複
+            cards = hand[:2] + (board if 3 <= len(board) < 5 else ())
+            if len(hand) >= 2 and len(set(cards)) == len(cards):
+                rows.append(row)
+        rows = np.array(rows, dtype=np.intp)
+        if not rows.size:
+            return strengths
+        first = np.array([hands[row][0] for row in rows])
+        second = np.array([hands[row][1] for row in rows])
 
-    def _calculate_hand_strength(self, hand_cards, community_cards):
-        """進階手牌強度計算"""
-        try:
-            if not hand_cards or len(hand_cards) < 2:
-                return np.array([0.0, 0.0, 0.0, 0.0])
+        # 手牌特性分析（數值 2-14）
+        high_card = np.maximum(first % 13, second % 13) + 2
+        low_card = np.minimum(first % 13, second % 13) + 2
+        is_pair = high_card == low_card
+        suited = first // 13 == second // 13
+        gap = high_card - low_card
+        connected = gap == 1
 
-            print(f"分析牌面：手牌 {' '.join(hand_cards)}, 公共牌 {' '.join(community_cards)}")
+        # 計算基礎牌力分數：對子最大值為 1.0，非對子依高牌、間隔與同花計分
+        gap_penalty = np.where(gap <= 4, np.maximum(0, (4 - gap) / 4), 0)
+        base_strength = np.where(is_pair, 0.5 + (high_card / 14.0) * 0.5,
+                                 (high_card / 14.0 * 0.6) + (gap_penalty * 0.2) + np.where(suited, 0.2, 0))
 
-            # 基礎牌力評估
-            card_values = [self._get_card_value(card[0]) for card in hand_cards]
-            card_suits = [card[1] for card in hand_cards]
-            
-            # 計算對子/高牌價值
-            is_pair = card_values[0] == card_values[1]
-            high_card = max(card_values)
-            
-            # 手牌特性分析
-            suited = card_suits[0] == card_suits[1]
-            connected = abs(card_values[0] - card_values[1]) == 1
-            gap = abs(card_values[0] - card_values[1])
-            
-            # 計算基礎牌力分數
-            base_strength = 0.0
-            if is_pair:
-                # 對子基礎分數
-                pair_value = max(card_values)
-                base_strength = 0.5 + (pair_value / 14.0) * 0.5  # 最大值為 1.0
-            else:
-                # 非對子手牌評分
-                high_card_score = high_card / 14.0
-                gap_penalty = max(0, (4 - gap) / 4) if gap <= 4 else 0
-                suited_bonus = 0.2 if suited else 0
-                base_strength = (high_card_score * 0.6) + (gap_penalty * 0.2) + suited_bonus
-
-            # 根據特定組合調整分數
-            if high_card >= 13:  # K 以上的高牌
-                base_strength += 0.1
-            if suited and connected:  # 同花連牌
-                base_strength += 0.15
-            if connected and min(card_values) >= 10:  # 高張連牌
-                base_strength += 0.1
-
-            print(f"手牌基礎強度計算結果：")
-            print(f"基礎分數：{base_strength:.2f}")
-            print(f"是否成對：{is_pair}")
-            print(f"同花：{suited}")
-            print(f"連牌：{connected}")
-
-            return np.array([
-                base_strength,  # 基礎牌力
-                0.2 if suited else 0.0,  # 同花潛力
-                0.2 if connected else 0.0,  # 順子潛力
-                0.1 if high_card >= 13 else 0.0  # 高牌價值
-            ])
+        # 根據特定組合調整分數：K 以上的高牌、同花連牌、高張連牌
+        base_strength += np.where(high_card >= 13, 0.1, 0)
+        base_strength += np.where(suited & connected, 0.15, 0)
+        base_strength += np.where(connected & (low_card >= 10), 0.1, 0)
 
-        except Exception as e:
-            print(f"計算手牌強度時發生錯誤：{str(e)}")
-            return np.array([0.0, 0.0, 0.0, 0.0])
+        # 翻牌後改用 outs 計算實際的補牌機率
+        flush_potential = np.where(suited, 0.2, 0.0)
+        straight_potential = np.where(connected, 0.2, 0.0)
+        postflop = [i for i, row in enumerate(rows) if len(boards[row]) >= 3]
+        if postflop:
+            flush_potential[postflop], straight_potential[postflop] = self._draw_probabilities(
+                [hands[rows[i]][:2] for i in postflop], [boards[rows[i]] for i in postflop])
 
-    def _calculate_total_strength(self, hand_cards, community_cards, game_state):
-        """計算綜合手牌強度"""
-        strength_metrics = self._calculate_hand_strength(hand_cards, community_cards)
-        
-        # 基礎牌力
-        base_strength = strength_metrics[0]
-        
-        # 潛力值
-        potential = strength_metrics[1]
-        
-        # 階段權重
-        stage_weight = 1.2 if game_state['stage'] == 'preflop' else 1.0
-        
-        # 計算總體強度
-        total_strength = (base_strength * 0.6 + potential * 0.4) * stage_weight
-        
-        return total_strength
-
-    def _has_straight_draw(self, card_values, community_cards):
-        """計算順子聽牌機會"""
-        all_values = card_values + [self._get_card_value(card[0]) for card in community_cards]
-        all_values = sorted(set(all_values))
-        max_consecutive = 1
-        current_consecutive = 1
-        
-        for i in range(1, len(all_values)):
-            if all_values[i] - all_values[i-1] == 1:
-                current_consecutive += 1
-                max_consecutive = max(max_consecutive, current_consecutive)
-            else:
-                current_consecutive = 1
-                
-        return 1.0 if max_consecutive >= 4 else 0.0
+        strengths[rows] = np.stack([
+            base_strength,  # 基礎牌力
+            flush_potential,  # 同花潛力
+            straight_potential,  # 順子潛力
+            np.where(high_card >= 13, 0.1, 0.0)  # 高牌價值
+        ], axis=1)
 
-    def _has_flush_draw(self, card_suits):
-        """計算同花聽牌機會"""
-        suit_counts = {}
-        for suit in card_suits:
-            suit_counts[suit] = suit_counts.get(suit, 0) + 1
-        
-        return 1.0 if max(suit_counts.values()) >= 4 else 0.0
+        # 翻牌圈：明確開啟 flop_features 時改用 [E[HS], 正潛力, 負潛力, 目前牌力] 填入四個強度欄位
+        # （模型需以此格式訓練）；預設維持訓練時的基礎評估與 outs 補牌機率
+        if self.flop_features:
+            for row in rows:
+                if len(boards[row]) != 3:
+                    continue
+                try:
+                    features = flop_features(list(hands[row][:2]), list(boards[row]))
+                except ValueError as e:
+                    if verbose:
+                        print(f"無法取得翻牌特徵，改用基礎評估：{str(e)}")
+                    continue
+                strengths[row] = [features['ehs'], features['ppot'], features['npot'], features['hs']]
+
+        if verbose:
+            for row in rows:
+                print(f"分析牌面：手牌 {' '.join(map(int_to_card, hands[row]))}，"
+                      f"公共牌 {' '.join(map(int_to_card, boards[row]))}：強度特徵 "
+                      f"{'、'.join(f'{value:.2f}' for value in strengths[row])}")
+        return strengths
+
+    def _calculate_total_strengths(self, strengths, stages):
+        """
+        計算綜合手牌強度（批次）
+        參數:
+            strengths: 形狀為 (N, 4) 的手牌強度特徵
+            stages: 每個狀態的遊戲階段（Stage）
+        返回:
+            形狀為 (N,) 的綜合強度
+        """
+        base_strength = strengths[:, 0]  # 基礎牌力
+        potential = strengths[:, 1]  # 潛力值
+        stage_weight = np.where(np.asarray(stages) == Stage.PREFLOP, 1.2, 1.0)  # 階段權重
+        return (base_strength * 0.6 + potential * 0.4) * stage_weight
+
+    def _draw_probabilities(self, hands, boards):
+        """
+        以 outs 計算下一張牌完成同花與順子的機率（批次，一次判斷所有狀態與所有補牌）
+        參數:
+            hands: 每個狀態的兩張手牌（整數編號）
+            boards: 每個狀態的 3-5 張公共牌（河牌圈已沒有補牌，機率為 0）
+        返回:
+            (同花機率, 順子機率) 兩個形狀為 (N,) 的陣列
+        """
+        flush = np.zeros(len(hands))
+        straight = np.zeros(len(hands))
+        rows = [row for row, board in enumerate(boards) if len(board) < 5]
+        if rows:
+            board_masks = [cards_to_mask(boards[row]) for row in rows]
+            hero_masks = [cards_to_mask(hands[row]) | mask for row, mask in zip(rows, board_masks)]
+            counts, remaining = count_outs_batch(hero_masks, board_masks)
+            flush[rows] = (counts[:, FLUSH] + counts[:, STRAIGHT_FLUSH]) / remaining
+            straight[rows] = counts[:, STRAIGHT] / remaining
+        return flush, straight
 
     def _get_position_weight(self, position):
         """計算位置權重"""
@@ -208,115 +247,228 @@ class PokerBot:
         }
         return position_weights.get(position.upper(), 0.5)
         
-    def _preprocess_state(self, game_state):
+    def _preprocess_states(self, states, strengths):
         """
-        將遊戲狀態轉換為模型輸入格式
+        將多個遊戲狀態轉換為模型輸入格式
+        參數:
+            states: GameState 列表
+            strengths: 形狀為 (N, 4) 的手牌強度特徵
+        返回:
+            形狀為 (N, 7) 的輸入矩陣
         """
-        state_vector = np.zeros(7)
-        
-        stage_map = {'preflop': 0, 'flop': 1, 'turn': 2, 'river': 3}
-        if game_state['stage'] is not None:
-            state_vector[0] = stage_map.get(game_state['stage'].lower(), 0)
-        
-        if game_state['current_bet'] > 0:
-            state_vector[1] = game_state['pot_size'] / game_state['current_bet']
-        
-        player_stacks = list(game_state['player_stacks'].values())
-        if player_stacks:
-            state_vector[2] = min(player_stacks) / max(game_state['pot_size'], 1)
-        
-        state_vector[3:] = self._calculate_hand_strength(
-            game_state['hand_cards'],
-            game_state['community_cards']
+        pot_size = np.array([state.pot_size for state in states])
+        current_bet = np.array([state.current_bet for state in states])
+        min_stack = np.array([min(state.player_stacks.values(), default=0) for state in states], dtype=float)
+
+        state_vectors = np.zeros((len(states), 7))
+        state_vectors[:, 0] = [state.stage for state in states]
+        np.divide(pot_size, current_bet, out=state_vectors[:, 1], where=current_bet > 0)
+        state_vectors[:, 2] = min_stack / np.maximum(pot_size, 1)
+        state_vectors[:, 3:] = strengths
+        return state_vectors
+
+    def _decode_action_indices(self, action_probs, stages, strengths):
+        """
+        將模型輸出轉換為 ACTIONS 的索引（批次）
+        參數:
+            action_probs: 形狀為 (N, 輸出維度) 的動作機率
+            stages: 每個狀態的遊戲階段（Stage）
+            strengths: 形狀為 (N, 4) 的手牌強度特徵
+        返回:
+            形狀為 (N,) 的動作索引
+        """
+        action_idx = np.argmax(action_probs, axis=1)
+        action_idx[action_idx >= len(ACTIONS)] = 0
+
+        # 翻牌前依綜合強度直接加注
+        stages = np.asarray(stages)
+        total_strength = self._calculate_total_strengths(strengths, stages)
+        preflop = stages == Stage.PREFLOP
+        return np.where(preflop & (total_strength > 0.8), 5,
+                        np.where(preflop & (total_strength > 0.6), 4, action_idx))
+
+    def _decode_actions(self, action_probs, states, strengths):
+        """
+        將模型輸出轉換為動作（批次）
+        參數:
+            action_probs: 形狀為 (N, 輸出維度) 的動作機率
+            states: GameState 列表
+            strengths: 形狀為 (N, 4) 的手牌強度特徵
+        返回:
+            每個狀態的 {'action', 'amount'} 字典列表
+        """
+        stages = np.array([state.stage for state in states])
+        return [dict(ACTIONS[idx]) for idx in self._decode_action_indices(action_probs, stages, strengths)]
+
+    def _hand_strengths(self, states, verbose=False):
+        """計算每個狀態的手牌強度特徵，相同的手牌與公共牌只計算一次，未快取的組合一次批次計算"""
+        keys = [(state.hand, state.board) for state in states]
+        known = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self.strength_memo.get(key) if self.strength_memo is not None else None
+            if cached is None:
+                missing.append(key)
+            else:
+                known[key] = cached
+        if missing:
+            computed = self._strength_features([key[0] for key in missing], [key[1] for key in missing], verbose)
+            for key, values in zip(missing, computed):
+                known[key] = values
+                if self.strength_memo is not None:
+                    self.strength_memo.put(key, values)
+        strengths = np.zeros((len(states), 4))
+        for row, key in enumerate(keys):
+            strengths[row] = known[key]
+        return strengths
+
+    def _memo_key(self, state_vector, stage):
+        """決策快取的鍵：量化後的 7 維狀態向量加上遊戲階段"""
+        return tuple(np.round(state_vector / MEMO_STEP).astype(np.int64).tolist()) + (stage,)
+
+    def _predict_decisions(self, states, verbose=False):
+        """
+        計算特徵、前向傳播並轉換為動作：有策略表時翻牌前直接查表（不需計算手牌強度），
+        啟用快取時只對未命中的狀態進行推論；verbose 時逐手輸出手牌強度分析
+        """
+        decisions = [None] * len(states)
+        pending = list(range(len(states)))
+
+        if self.preflop_policy is not None:
+            preflop = [row for row in pending if states[row].stage == Stage.PREFLOP and len(states[row].hand) == 2]
+            if preflop:
+                ratios = self._preprocess_states([states[row] for row in preflop], np.zeros((len(preflop), 4)))
+                action_idx = self.preflop_policy.lookup([states[row].hand for row in preflop],
+                                                        ratios[:, 1], ratios[:, 2])
+                for row, idx in zip(preflop, action_idx):
+                    decisions[row] = ACTIONS[idx]
+                pending = [row for row in pending if decisions[row] is None]
+        if not pending:
+            return [dict(decision) for decision in decisions]
+
+        pending_states = [states[row] for row in pending]
+        strengths = self._hand_strengths(pending_states, verbose)
+        state_vectors = self._preprocess_states(pending_states, strengths)
+        misses = list(range(len(pending)))
+        keys = None
+        if self.decision_memo is not None:
+            keys = [self._memo_key(vector, state.stage) for vector, state in zip(state_vectors, pending_states)]
+            for i, row in enumerate(pending):
+                decisions[row] = self.decision_memo.get(keys[i])
+            misses = [i for i, row in enumerate(pending) if decisions[row] is None]
+
+        if misses:
+            action_probs = self.model.predict(state_vectors[misses], verbose=0)
+            decoded = self._decode_actions(action_probs, [pending_states[i] for i in misses], strengths[misses])
+            for i, decision in zip(misses, decoded):
+                decisions[pending[i]] = decision
+                if keys is not None:
+                    self.decision_memo.put(keys[i], decision)
+        return [dict(decision) for decision in decisions]
+
+    def _effective_stack(self, state):
+        """有效籌碼以最小籌碼量近似（與模型輸入相同），沒有籌碼資訊時為 0"""
+        return min(state.player_stacks.values(), default=0)
+
+    def _to_chips(self, decision, state):
+        """
+        將模型決策的金額換算為本次投入的籌碼（BB）：跟注為需跟注的金額，加注為跟注加上底池倍數的加注額
+        參數:
+            decision: {'action', 'amount'} 字典（加注的 amount 為底池倍數）
+            state: GameState
+        返回:
+            金額已換算的決策字典
+        """
+        if decision['action'] == 'call':
+            return {'action': 'call', 'amount': state.current_bet}
+        if decision['action'] == 'raise':
+            return {'action': 'raise', 'amount': raise_chips(decision['amount'], state.pot_size, state.current_bet,
+                                                             self._effective_stack(state))}
+        return decision
+
+    def _size_decisions(self, decisions, states, equities):
+        """
+        以期望值求解器決定模型所選動作的金額（批次，只需一次向量化計算）：
+        動作維持模型的選擇，加注時從尺寸網格中選期望值最高的尺寸，對手數為其他玩家數
+        參數:
+            decisions: 模型的決策字典列表
+            states: GameState 列表
+            equities: 每個狀態的勝率（勝率 + 平局率 / 2）
+        返回:
+            每個狀態的 {'action', 'amount', 'ev'} 字典列表
+        """
+        return size_actions(
+            [decision['action'] for decision in decisions],
+            equities,
+            [state.pot_size for state in states],
+            [state.current_bet for state in states],
+            [self._effective_stack(state) for state in states],
+            [max(len(state.player_stacks) - 1, 1) for state in states]
         )
-        
-        return state_vector.reshape(1, -1)
-    
-    def _decode_action(self, action_probs, game_state):
-        try:
-            probs = action_probs[0]
-            max_prob_idx = np.argmax(probs)
-            
-            # 定義標準動作
-            actions = {
-                0: {'action': 'fold', 'amount': 0},
-                1: {'action': 'check', 'amount': 0},
-                2: {'action': 'call', 'amount': None},
-                3: {'action': 'raise', 'amount': 1.0},  # 直接使用數值
-                4: {'action': 'raise', 'amount': 2.0},
-                5: {'action': 'raise', 'amount': 3.0}
-            }
-            
-            # 根據不同階段和手牌強度決定行動
-            total_strength = self._calculate_total_strength(
-                game_state['hand_cards'],
-                game_state['community_cards'],
-                game_state
-            )
-            
-            # 獲取基礎決策
-            decision = actions.get(max_prob_idx, {'action': 'fold', 'amount': 0})
-            
-            # 根據階段和強度調整決策
-            if game_state['stage'] == 'preflop':
-                if total_strength > 0.8:
-                    decision = {'action': 'raise', 'amount': 3.0}
-                elif total_strength > 0.6:
-                    decision = {'action': 'raise', 'amount': 2.0}
-                    
-            return decision
-            
-        except Exception as e:
-            print(f"決策轉換錯誤：{str(e)}")
-            return {'action': 'fold', 'amount': 0}
-    
-    def get_decision(self, game_state):
-        """改進的決策函數"""
+
+    def get_decisions(self, game_states, equities=None, verbose=False):
+        """
+        批次決策：整批狀態只做一次前向傳播，相同的手牌與公共牌只計算一次手牌強度
+        啟用決策快取（memo_size > 0）時，量化後相同的狀態直接沿用先前的決策
+        金額為本次投入的籌碼（BB）；提供勝率時由期望值求解器決定加注尺寸，結果另含期望值 'ev'（BB）
+        參數:
+            game_states: GameState 或遊戲狀態字典的列表（格式與 get_decision 相同）
+            equities: （可選）與 game_states 對應的勝率列表，None 的項目使用模型的加注尺寸
+            verbose: 是否逐手輸出手牌強度分析（批次重播與自我對戰時關閉）
+        返回:
+            與 game_states 順序相同的決策字典列表
+        """
+        results = [None] * len(game_states)
+        states = []
+        indices = []
+        for i, game_state in enumerate(game_states):
+            try:
+                states.append(GameState.coerce(game_state))
+                indices.append(i)
+            except Exception as e:
+                print(f"決策過程發生錯誤：{str(e)}")
+                results[i] = {'action': 'fold', 'amount': 0, 'error': str(e)}
+        if not states:
+            return results
+
         try:
-            # 過濾無效的公共牌
-            community_cards = [
-                card for card in game_state.get('community_cards', [])
-                if card not in ['NA', '(尚未發牌)']
-            ]
-            
-            # 過濾手牌中的註釋
-            hand_cards = [
-                card for card in game_state.get('hand_cards', [])
-                if not card.startswith('(') and card != 'NA'
-            ]
-            
-            # 更新遊戲狀態
-            stage = self._determine_stage(len(community_cards))
-            
-            # 建立清理後的遊戲狀態
-            state = {
-                'stage': stage,
-                'community_cards': community_cards,
-                'hand_cards': hand_cards,
-                'pot_size': game_state.get('pot_size', 0),
-                'player_stacks': game_state.get('player_stacks', {}),
-                'current_bet': game_state.get('current_bet', 0)
-            }
-            
             # 獲取模型預測和決策
-            state_vector = self._preprocess_state(state)
-            action_probs = self.model.predict(state_vector, verbose=0)
-            decision = self._decode_action(action_probs, state)
-            
-            return {
+            decisions = [self._to_chips(decision, state)
+                         for decision, state in zip(self._predict_decisions(states, verbose), states)]
+            # 有勝率的狀態由期望值求解器決定模型所選動作的金額
+            sized = [row for row, i in enumerate(indices) if equities is not None and equities[i] is not None]
+            if sized:
+                solved = self._size_decisions([decisions[row] for row in sized], [states[row] for row in sized],
+                                              [equities[indices[row]] for row in sized])
+                for row, decision in zip(sized, solved):
+                    decisions[row] = decision
+        except Exception as e:
+            print(f"決策過程發生錯誤：{str(e)}")
+            for i in indices:
+                results[i] = {'action': 'fold', 'amount': 0, 'error': str(e)}
+            return results
+
+        for i, state, decision in zip(indices, states, decisions):
+            results[i] = {
                 'action': decision['action'],
                 'amount': decision['amount'],
-                'stage': stage,
+                'stage': state.stage.label,
                 'cards': {
-                    'community': community_cards,
-                    'hand': hand_cards
+                    'community': state.community_cards,
+                    'hand': state.hand_cards
                 }
             }
-        
-        except Exception as e:
-            print(f"決策過程發生錯誤：{str(e)}")
-            return {
-                'action': 'fold',
-                'amount': 0,
-                'error': str(e)
-            }
\ No newline at end of file
+            if 'ev' in decision:
+                results[i]['ev'] = decision['ev']
+        return results
+
+    def get_decision(self, game_state, equity=None, verbose=True):
+        """
+        改進的決策函數
+        參數:
+            game_state: GameState，或含 hand_cards、community_cards、pot_size、player_stacks、
+                        current_bet 的遊戲狀態字典
+            equity: （可選）目前手牌的勝率，提供時以期望值求解器決定加注尺寸
+            verbose: 是否輸出手牌強度分析
+        """
+        return self.get_decisions([game_state], [equity], verbose)[0]
@@ -0,0 +1,124 @@
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from preflop_table import N_CLASSES, hand_class_cards, hand_class_index
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_POLICY_PATH = os.path.join(CORE_DIR, 'preflop_policy.bin')
+
+# 量化網格：底池/下注比與最小籌碼/底池比（0 代表沒有下注或沒有籌碼資訊），其餘以對數間距涵蓋常見範圍
+POT_ODDS_GRID = np.concatenate([[0.0], np.geomspace(0.25, 100, 47)]).astype(np.float32)
+STACK_RATIO_GRID = np.concatenate([[0.0], np.geomspace(0.1, 1000, 63)]).astype(np.float32)
+
+# 檔案格式：32 位元組檔頭（含模型權重校驗碼）+ 兩個 float32 網格 + uint8 陣列 (169, 底池網格, 籌碼網格)，
+# 每格為 PokerBot 的動作索引
+_MAGIC = b'PFPL'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHHHI')
+_HEADER_SIZE = 32
+_CHUNK_SIZE = 65536  # 編譯時每次前向傳播的狀態數
+
+
+def _nearest(grid, values):
+    """回傳每個值最接近的網格點索引"""
+    midpoints = (grid[1:] + grid[:-1]) / 2
+    return np.searchsorted(midpoints, values)
+
+
+def build_policy(bot, path=DEFAULT_POLICY_PATH):
+    """
+    以完整的決策流程（模型 + 翻牌前加注規則）計算所有起手牌類別與網格點的動作，寫入二進位檔案
+    :param bot: 已載入模型的 PokerBot
+    :param path: 輸出檔案路徑
+    :return: 動作索引陣列 (169, 底池網格, 籌碼網格)
+    """
+    start = time.time()
+    strengths = bot._strength_features([tuple(hand_class_cards(index)) for index in range(N_CLASSES)],
+                                       [()] * N_CLASSES)
+
+    shape = (N_CLASSES, len(POT_ODDS_GRID), len(STACK_RATIO_GRID))
+    vectors = np.zeros(shape + (7,))
+    vectors[..., 1] = POT_ODDS_GRID[None, :, None]
+    vectors[..., 2] = STACK_RATIO_GRID[None, None, :]
+    vectors[..., 3:] = strengths[:, None, None, :]
+    vectors = vectors.reshape(-1, 7)
+    cell_strengths = vectors[:, 3:]
+    stages = np.zeros(len(vectors), dtype=np.int64)  # 全部為翻牌前
+
+    policy = np.empty(len(vectors), dtype=np.uint8)
+    for begin in range(0, len(vectors), _CHUNK_SIZE):
+        end = begin + _CHUNK_SIZE
+        action_probs = bot.model.predict(vectors[begin:end], verbose=0)
+        policy[begin:end] = bot._decode_action_indices(action_probs, stages[begin:end], cell_strengths[begin:end])
+    policy = policy.reshape(shape)
+
+    header = _HEADER.pack(_MAGIC, _VERSION, *shape, bot.model_checksum)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(POT_ODDS_GRID.tobytes())
+        f.write(STACK_RATIO_GRID.tobytes())
+        f.write(policy.tobytes())
+    os.replace(temp_path, path)
+    print(f"翻牌前策略表已寫入：{path}（{policy.size:,} 格，{time.time() - start:.1f} 秒）")
+    return policy
+
+
+class PreflopPolicyTable:
+    def __init__(self, path=DEFAULT_POLICY_PATH):
+        """
+        以記憶體映射載入翻牌前策略表
+        path: 策略表檔案路徑
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"策略表檔案不存在：{path}")
+        with open(path, 'rb') as f:
+            magic, version, n_classes, n_pot, n_stack, checksum = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION or n_classes != N_CLASSES:
+            raise ValueError(f"策略表檔案格式錯誤：{path}")
+
+        self.path = path
+        self.model_checksum = checksum  # 編譯時模型權重的校驗碼
+        self.pot_odds_grid = np.memmap(path, dtype=np.float32, mode='r', offset=_HEADER_SIZE, shape=(n_pot,))
+        self.stack_ratio_grid = np.memmap(path, dtype=np.float32, mode='r', offset=_HEADER_SIZE + 4 * n_pot,
+                                          shape=(n_stack,))
+        self.table = np.memmap(path, dtype=np.uint8, mode='r', offset=_HEADER_SIZE + 4 * (n_pot + n_stack),
+                               shape=(n_classes, n_pot, n_stack))
+
+    def is_stale(self, model_checksum):
+        """模型權重與編譯時不同時，策略表已過期"""
+        return model_checksum != self.model_checksum
+
+    def lookup(self, hands, pot_odds, stack_ratios):
+        """
+        查詢翻牌前動作（取最接近的網格點）
+        :param hands: 兩張手牌的列表，例如 [(51, 50), ...]
+        :param pot_odds: 底池/下注比
+        :param stack_ratios: 最小籌碼/底池比
+        :return: 動作索引陣列
+        """
+        classes = np.array([hand_class_index(*hand) for hand in hands])
+        return self.table[classes, _nearest(self.pot_odds_grid, pot_odds),
+                          _nearest(self.stack_ratio_grid, stack_ratios)]
+
+
+def load_preflop_policy(path=DEFAULT_POLICY_PATH):
+    """載入策略表，檔案不存在時回傳 None"""
+    return PreflopPolicyTable(path) if path and os.path.exists(path) else None
+
+
+if __name__ == '__main__':
+    from poker_bot import PokerBot
+
+    default_model = os.path.join(CORE_DIR, 'model.bin')
+    if not os.path.exists(default_model):
+        default_model = os.path.join(CORE_DIR, 'model.json')
+    parser = argparse.ArgumentParser(description='編譯 PokerBot 的翻牌前策略表')
+    parser.add_argument('--model', default=default_model, help='模型文件路徑')
+    parser.add_argument('--output', default=DEFAULT_POLICY_PATH, help='輸出檔案路徑')
+    args = parser.parse_args()
+    build_policy(PokerBot(model_path=args.model, policy_path=None), args.output)
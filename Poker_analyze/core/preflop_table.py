@@ -0,0 +1,144 @@
+import argparse
+import os
+import struct
+import time
+
+import numpy as np
+
+from cards import RANKS, card_to_int
+from equity import equity_result, monte_carlo_equity, parallel_monte_carlo_equity
+
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'preflop_equity.bin')
+MAX_OPPONENTS = 9  # 表格涵蓋 1-9 位隨機對手（2-10 人桌）
+N_CLASSES = 169  # 起手牌的等價類別數
+
+# 檔案格式：32 位元組檔頭 + float32 陣列 (169, 9, 2)，最後一維為 [勝率, 平手率]
+_MAGIC = b'PFEQ'
+_VERSION = 1
+_HEADER = struct.Struct('<4sHHHHQ')
+_HEADER_SIZE = 32
+
+
+def hand_class_index(card_a, card_b):
+    """
+    計算兩張手牌所屬的起手牌類別（13x13 表格，對角線為對子，右上為同花，左下為不同花）
+    :param card_a: 第一張手牌（字串或整數編號）
+    :param card_b: 第二張手牌（字串或整數編號）
+    :return: 0-168 的類別索引
+    """
+    a = card_to_int(card_a)
+    b = card_to_int(card_b)
+    high, low = max(a % 13, b % 13), min(a % 13, b % 13)
+    if a // 13 == b // 13:  # 同花
+        return (12 - high) * 13 + (12 - low)
+    return (12 - low) * 13 + (12 - high)
+
+
+def hand_class_name(index):
+    """將類別索引轉換為名稱，例如 'AA'、'AKs'、'72o'"""
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANKS[12 - row] * 2
+    if row < col:
+        return RANKS[12 - row] + RANKS[12 - col] + 's'
+    return RANKS[12 - col] + RANKS[12 - row] + 'o'
+
+
+def hand_class_cards(index):
+    """回傳代表該類別的一組手牌（整數編號）"""
+    row, col = divmod(index, 13)
+    if row <= col:
+        high, low = 12 - row, 12 - col
+    else:
+        high, low = 12 - col, 12 - row
+    if row < col:  # 同花：兩張都是梅花
+        return [high, low]
+    return [high, 13 + low]  # 對子或不同花：梅花 + 方塊
+
+
+def build_table(path=DEFAULT_TABLE_PATH, trials=1_000_000, workers=None, seed=0):
+    """
+    離線計算 169 種起手牌對 1-9 位隨機對手的勝率表，寫入二進位檔案
+    :param path: 輸出檔案路徑
+    :param trials: 每格的模擬次數
+    :param workers: （可選）平行模擬的工作行程數
+    :param seed: 亂數種子，每格使用由 (seed, 類別, 對手數) 衍生的獨立種子
+    """
+    table = np.zeros((N_CLASSES, MAX_OPPONENTS, 2), dtype=np.float32)
+    start = time.time()
+    for index in range(N_CLASSES):
+        cards = hand_class_cards(index)
+        for n_opponents in range(1, MAX_OPPONENTS + 1):
+            cell_seed = [seed, index, n_opponents]
+            if workers and workers > 1:
+                result = parallel_monte_carlo_equity(cards, n_opponents + 1, trials=trials,
+                                                     seed=cell_seed, workers=workers)
+            else:
+                result = monte_carlo_equity(cards, n_opponents + 1, trials=trials, seed=cell_seed)
+            table[index, n_opponents - 1] = result['win'], result['tie']
+        print(f"{hand_class_name(index):>4} 完成（{index + 1}/{N_CLASSES}，{time.time() - start:.0f} 秒）")
+
+    header = _HEADER.pack(_MAGIC, _VERSION, N_CLASSES, MAX_OPPONENTS, 2, trials)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(_HEADER_SIZE, b'\0'))
+        f.write(table.tobytes())
+    os.replace(temp_path, path)
+    print(f"翻牌前勝率表已寫入：{path}")
+
+
+class PreflopEquityTable:
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        """
+        以記憶體映射載入翻牌前勝率表，多個行程可以共用同一份資料
+        path: 勝率表檔案路徑
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"勝率表檔案不存在：{path}")
+        with open(path, 'rb') as f:
+            magic, version, n_classes, max_opponents, n_values, trials = _HEADER.unpack(
+                f.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"勝率表檔案格式錯誤：{path}")
+
+        self.path = path
+        self.trials = trials
+        self.max_opponents = max_opponents
+        self.table = np.memmap(path, dtype=np.float32, mode='r', offset=_HEADER_SIZE,
+                               shape=(n_classes, max_opponents, n_values))
+
+    def lookup(self, own_cards, n_players):
+        """
+        查詢翻牌前勝率
+        :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+        :param n_players: 總共參與遊戲的玩家數量
+        :return: 與 monte_carlo_equity 相同格式的字典，並附上 table=True
+        """
+        n_opponents = n_players - 1
+        if not 1 <= n_opponents <= self.max_opponents:
+            raise ValueError(f"勝率表不支援 {n_players} 位玩家")
+        win, tie = self.table[hand_class_index(*own_cards), n_opponents - 1]
+        result = equity_result(round(float(win) * self.trials), round(float(tie) * self.trials),
+                               self.trials)
+        result['table'] = True
+        return result
+
+
+_loaded_tables = {}
+
+
+def load_preflop_table(path=DEFAULT_TABLE_PATH):
+    """取得已載入的勝率表（同一路徑只載入一次），檔案不存在時回傳 None"""
+    if path not in _loaded_tables:
+        _loaded_tables[path] = PreflopEquityTable(path) if os.path.exists(path) else None
+    return _loaded_tables[path]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='建立翻牌前勝率表')
+    parser.add_argument('--output', default=DEFAULT_TABLE_PATH, help='輸出檔案路徑')
+    parser.add_argument('--trials', type=int, default=1_000_000, help='每格的模擬次數')
+    parser.add_argument('--workers', type=int, default=None, help='平行模擬的工作行程數')
+    parser.add_argument('--seed', type=int, default=0, help='亂數種子')
+    args = parser.parse_args()
+    build_table(args.output, trials=args.trials, workers=args.workers, seed=args.seed)
@@ -0,0 +1,279 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+import numpy as np
+
+from mlp import load_weights, save_binary_weights, save_json_weights
+from selfplay import (POLICIES, STARTING_STACK, decisions_to_actions, default_model_path, observation_states,
+                      play_hands)
+
+STATE_DIM = 7  # _preprocess_states 的狀態向量長度
+N_ACTIONS = 41  # 模型輸出層的動作數
+N_DECODED = 6  # PokerBot 會解讀的動作索引（0-5），其餘索引一律視為棄牌
+FOLD_EQUIVALENT = np.r_[0, N_DECODED:N_ACTIONS]  # 與棄牌（索引 0）等價的輸出
+LAYER_SIZES = [STATE_DIM, 32, 32, N_ACTIONS]
+REWARD_SCALE = 1 / STARTING_STACK  # 獎勵以起始籌碼為單位，避免大底池的誤差主導更新
+
+
+class ReplayBuffer:
+    def __init__(self, capacity=100_000, state_dim=STATE_DIM):
+        """
+        預先配置的環狀經驗回放緩衝區，寫滿後覆蓋最舊的轉移，記憶體用量固定
+        capacity: 最多保留的轉移數
+        state_dim: 狀態向量長度
+        """
+        if capacity <= 0:
+            raise ValueError(f"緩衝區容量必須大於 0：{capacity}")
+        self.capacity = capacity
+        self.states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.actions = np.zeros(capacity, dtype=np.int16)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros((capacity, state_dim), dtype=np.float32)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.position = 0  # 下一筆寫入的位置
+        self.size = 0
+
+    def add(self, states, actions, rewards, next_states, dones):
+        """批次寫入轉移（超過容量時只保留最後 capacity 筆）"""
+        n = len(actions)
+        if n > self.capacity:
+            states, actions, rewards, next_states, dones = (
+                array[-self.capacity:] for array in (states, actions, rewards, next_states, dones))
+            n = self.capacity
+        index = (self.position + np.arange(n)) % self.capacity
+        self.states[index] = states
+        self.actions[index] = actions
+        self.rewards[index] = rewards
+        self.next_states[index] = next_states
+        self.dones[index] = dones
+        self.position = (self.position + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample(self, batch_size, rng):
+        """均勻抽樣一批轉移，回傳 (states, actions, rewards, next_states, dones)"""
+        if not self.size:
+            raise ValueError("緩衝區沒有資料")
+        index = rng.integers(0, self.size, batch_size)
+        return (self.states[index], self.actions[index], self.rewards[index], self.next_states[index],
+                self.dones[index])
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        """緩衝區佔用的位元組數"""
+        return sum(array.nbytes for array in (self.states, self.actions, self.rewards, self.next_states, self.dones))
+
+
+class QTrainer:
+    def __init__(self, weights=None, learning_rate=1e-3, gamma=0.99, target_sync=500, seed=None):
+        """
+        以 NumPy 訓練與 PokerBot 相同結構的網路（7 -> 32 -> 32 -> 41）
+        輸出層視為各動作的 Q 值（匯出後 PokerBot 的 softmax 不改變最大值所在的動作）
+        weights: （可選）初始權重 [(kernel, bias), ...]，預設隨機初始化
+        learning_rate: Adam 學習率
+        gamma: 折扣因子
+        target_sync: 每隔幾次更新將目標網路同步為目前的權重
+        seed: （可選）亂數種子
+        """
+        self.rng = np.random.default_rng(seed)
+        if weights is None:
+            weights = [(self.rng.normal(0, np.sqrt(2 / n_in), (n_in, n_out)).astype(np.float32),
+                        np.zeros(n_out, dtype=np.float32))
+                       for n_in, n_out in zip(LAYER_SIZES[:-1], LAYER_SIZES[1:])]
+        self.params = [np.array(array, dtype=np.float32) for layer in weights for array in layer]
+        self.target_params = [param.copy() for param in self.params]
+        self.learning_rate = learning_rate
+        self.gamma = gamma
+        self.target_sync = target_sync
+        self.steps = 0
+        # Adam 的一階與二階動差
+        self._m = [np.zeros_like(param) for param in self.params]
+        self._v = [np.zeros_like(param) for param in self.params]
+
+    @property
+    def weights(self):
+        """目前的權重 [(kernel, bias), ...]"""
+        return [(self.params[i], self.params[i + 1]) for i in range(0, len(self.params), 2)]
+
+    @staticmethod
+    def _forward(params, states):
+        """前向傳播，回傳 (Q 值, 兩個隱藏層的輸出)"""
+        w1, b1, w2, b2, w3, b3 = params
+        h1 = np.maximum(states @ w1 + b1, 0)
+        h2 = np.maximum(h1 @ w2 + b2, 0)
+        return h2 @ w3 + b3, h1, h2
+
+    def q_values(self, states):
+        """計算一批狀態的 Q 值 (N, 41)"""
+        return self._forward(self.params, np.asarray(states, dtype=np.float32))[0]
+
+    def select_actions(self, states, epsilon=0.0):
+        """ε-greedy 選擇動作（只在 PokerBot 會解讀的索引 0-5 之間選擇）"""
+        actions = self.q_values(states)[:, :N_DECODED].argmax(axis=1)
+        explore = self.rng.random(len(actions)) < epsilon
+        actions[explore] = self.rng.integers(0, N_DECODED, int(explore.sum()))
+        return actions
+
+    def train_step(self, states, actions, rewards, next_states, dones):
+        """
+        以一批轉移做一次向量化的 Q-learning 更新
+        棄牌的轉移同時更新所有與棄牌等價的輸出，避免未訓練的輸出在匯出後被選中
+        :return: 均方誤差
+        """
+        next_q = self._forward(self.target_params, next_states)[0][:, :N_DECODED].max(axis=1)
+        targets = rewards + self.gamma * next_q * ~dones
+
+        q, h1, h2 = self._forward(self.params, states)
+        mask = np.zeros_like(q)
+        rows = np.arange(len(actions))
+        mask[rows, actions] = 1
+        fold = actions == 0
+        mask[np.ix_(fold, FOLD_EQUIVALENT)] = 1
+        errors = (q - targets[:, None]) * mask
+        loss = float((errors ** 2).sum() / len(actions))
+
+        # 反向傳播
+        w1, b1, w2, b2, w3, b3 = self.params
+        grad_q = 2 * errors / len(actions)
+        grad_h2 = (grad_q @ w3.T) * (h2 > 0)
+        grad_h1 = (grad_h2 @ w2.T) * (h1 > 0)
+        grads = [states.T @ grad_h1, grad_h1.sum(axis=0), h1.T @ grad_h2, grad_h2.sum(axis=0),
+                 h2.T @ grad_q, grad_q.sum(axis=0)]
+        self._adam(grads)
+
+        self.steps += 1
+        if self.steps % self.target_sync == 0:
+            self.target_params = [param.copy() for param in self.params]
+        return loss
+
+    def _adam(self, grads, beta1=0.9, beta2=0.999, eps=1e-8):
+        t = self.steps + 1
+        for param, grad, m, v in zip(self.params, grads, self._m, self._v):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            param -= self.learning_rate * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+
+    def train(self, buffer, steps, batch_size=256):
+        """從緩衝區抽樣訓練 steps 次，回傳平均損失"""
+        losses = [self.train_step(*buffer.sample(batch_size, self.rng)) for _ in range(steps)]
+        return float(np.mean(losses)) if losses else 0.0
+
+    def export(self, path):
+        """匯出權重：.bin 為二進位格式，其餘為 model.json 格式（PokerBot 可直接載入）"""
+        if path.endswith('.bin'):
+            save_binary_weights(self.weights, path)
+        else:
+            save_json_weights(self.weights, path)
+
+
+class QLearningPolicy:
+    """
+    自我對戰中收集轉移的策略：以 PokerBot 的特徵計算狀態向量，ε-greedy 選擇動作，
+    並記錄每張桌子的決策順序，牌局結束後由 finish_hand 轉換為轉移
+    """
+    name = 'q'
+
+    def __init__(self, trainer, epsilon=0.1, model_path=None):
+        from poker_bot import ACTIONS, PokerBot
+
+        self.trainer = trainer
+        self.epsilon = epsilon
+        self._actions = ACTIONS
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.bot = PokerBot(model_path=model_path or default_model_path(), policy_path=None)
+        self._records = []  # (桌號, 狀態向量, 動作索引)
+
+    def act(self, obs):
+        states = observation_states(obs)
+        strengths = self.bot._hand_strengths(states)
+        vectors = self.bot._preprocess_states(states, strengths).astype(np.float32)
+        action_idx = self.trainer.select_actions(vectors, self.epsilon)
+        self._records.extend(zip(obs['table'].tolist(), vectors, action_idx.tolist()))
+        # 與 PokerBot 相同將底池倍數換算為投入的籌碼，學習到的動作索引才與實際對局的加注額一致
+        decisions = [self.bot._to_chips(dict(self._actions[idx]), state) for idx, state in zip(action_idx, states)]
+        return decisions_to_actions(decisions, obs)
+
+    def finish_hand(self, rewards):
+        """
+        將這一手的決策轉換為轉移：同一桌的下一個決策為下一狀態，最後一個決策得到整手的輸贏
+        :param rewards: 每張桌子的輸贏（大盲）
+        :return: (states, actions, rewards, next_states, dones)
+        """
+        records, self._records = self._records, []
+        n = len(records)
+        tables = np.array([record[0] for record in records], dtype=np.int64)
+        states = np.array([record[1] for record in records], dtype=np.float32).reshape(n, STATE_DIM)
+        actions = np.array([record[2] for record in records], dtype=np.int16)
+
+        # 依桌號穩定排序後，同桌相鄰的決策即為前後狀態
+        order = np.argsort(tables, kind='stable')
+        tables, states, actions = tables[order], states[order], actions[order]
+        dones = np.ones(n, dtype=bool)
+        dones[:-1] = tables[1:] != tables[:-1]
+        next_states = np.zeros_like(states)
+        next_states[:-1][~dones[:-1]] = states[1:][~dones[:-1]]
+        step_rewards = np.where(dones, np.asarray(rewards, dtype=np.float32)[tables], 0).astype(np.float32)
+        return states, actions, step_rewards, next_states, dones
+
+
+def train_selfplay(trainer, buffer, opponents=('call',), rounds=100, n_tables=256, steps_per_round=50,
+                   batch_size=256, epsilon=0.1, seed=None):
+    """
+    交替進行自我對戰收集轉移與批次更新
+    :param trainer: QTrainer
+    :param buffer: ReplayBuffer
+    :param opponents: 對手策略名稱（見 selfplay.POLICIES），每桌人數為對手數 + 1
+    :param rounds: 回合數，每回合所有桌子各進行一手
+    :param n_tables: 同步進行的桌數
+    :param steps_per_round: 每回合的更新次數
+    :param batch_size: 每次更新的批次大小
+    :param epsilon: 探索機率
+    :param seed: （可選）牌局的亂數種子
+    :return: 每回合的 {'round', 'reward', 'loss', 'buffer'} 列表
+    """
+    rng = np.random.default_rng(seed)
+    learner = QLearningPolicy(trainer, epsilon=epsilon)
+    policies = [learner] + [POLICIES[name](rng=rng) for name in opponents]
+    history = []
+    start = time.time()
+    for round_index in range(rounds):
+        results = play_hands(policies, n_tables, rng, rotation=round_index)
+        buffer.add(*learner.finish_hand(results[:, 0] * REWARD_SCALE))
+        loss = trainer.train(buffer, steps_per_round, batch_size) if len(buffer) >= batch_size else 0.0
+        history.append({'round': round_index, 'reward': float(results[:, 0].mean()), 'loss': loss,
+                        'buffer': len(buffer)})
+        print(f"回合 {round_index + 1}/{rounds}：平均輸贏 {results[:, 0].mean():+.3f} BB，"
+              f"損失 {loss:.4f}，緩衝區 {len(buffer):,}（{time.time() - start:.0f} 秒）")
+    return history
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='以自我對戰離線訓練 PokerBot 的 Q-learning 模型')
+    parser.add_argument('--init', default=None, help='初始模型（model.json 或 .bin），預設隨機初始化')
+    parser.add_argument('--output', default='model_q.json', help='匯出的模型路徑（.json 或 .bin）')
+    parser.add_argument('--opponents', nargs='+', default=['call'], help='對手策略')
+    parser.add_argument('--rounds', type=int, default=100, help='回合數')
+    parser.add_argument('--tables', type=int, default=256, help='同步進行的桌數')
+    parser.add_argument('--steps', type=int, default=50, help='每回合的更新次數')
+    parser.add_argument('--batch-size', type=int, default=256, help='每次更新的批次大小')
+    parser.add_argument('--buffer', type=int, default=100_000, help='經驗回放緩衝區容量')
+    parser.add_argument('--epsilon', type=float, default=0.1, help='探索機率')
+    parser.add_argument('--learning-rate', type=float, default=1e-3, help='學習率')
+    parser.add_argument('--seed', type=int, default=None, help='亂數種子')
+    args = parser.parse_args()
+
+    initial = load_weights(args.init)[0] if args.init else None
+    trainer = QTrainer(initial, learning_rate=args.learning_rate, seed=args.seed)
+    buffer = ReplayBuffer(args.buffer)
+    print(f"經驗回放緩衝區：{args.buffer:,} 筆，{buffer.nbytes / 2 ** 20:.1f} MB")
+    train_selfplay(trainer, buffer, opponents=args.opponents, rounds=args.rounds, n_tables=args.tables,
+                   steps_per_round=args.steps, batch_size=args.batch_size, epsilon=args.epsilon, seed=args.seed)
+    trainer.export(args.output)
+    print(f"模型已匯出：{os.path.abspath(args.output)}")
@@ -0,0 +1,260 @@
+import re
+
+import numpy as np
+
+from cards import RANKS, card_to_int, cards_to_ints
+from equity import BATCH_SIZE, DEFAULT_TRIALS, _remaining_deck, equity_result
+from hand_evaluator import evaluate_many
+
+N_COMBOS = 1326  # 兩張手牌的組合數 C(52, 2)
+MAX_RESAMPLE_ROUNDS = 1000  # 對手之間牌面衝突時重新抽樣的次數上限
+
+
+def combo_index(card_a, card_b):
+    """
+    計算兩張手牌在 1326 種組合中的索引（組合數系統：b * (b - 1) / 2 + a，a < b）
+    :param card_a: 第一張牌（字串或整數編號）
+    :param card_b: 第二張牌（字串或整數編號）
+    :return: 0-1325 的組合索引
+    """
+    a, b = sorted((card_to_int(card_a), card_to_int(card_b)))
+    if a == b:
+        raise ValueError(f"手牌重複：{card_a} {card_b}")
+    return b * (b - 1) // 2 + a
+
+
+# 每個組合索引對應的兩張牌，形狀為 (1326, 2)
+COMBO_CARDS = np.array([(a, b) for b in range(52) for a in range(b)], dtype=np.int8)
+_CARD_MASKS = np.uint64(1) << np.arange(52, dtype=np.uint64)
+# 每個組合的 52 位元遮罩（位元 i 代表整數編號 i 的牌），用於判斷抽樣時的牌面衝突
+_COMBO_MASKS = np.bitwise_or.reduce(np.uint64(1) << COMBO_CARDS.astype(np.uint64), axis=1)
+
+
+def _rank_index(char):
+    return RANKS.index(char.upper())
+
+
+def _class_combos(high, low, kind):
+    """列出某個起手牌類別的所有組合索引，kind 為 's'（同花）、'o'（不同花）或 ''（兩者）"""
+    combos = []
+    for suit_a in range(4):
+        for suit_b in range(4):
+            if high == low and suit_a >= suit_b:
+                continue
+            if high != low and kind == 's' and suit_a != suit_b:
+                continue
+            if high != low and kind == 'o' and suit_a == suit_b:
+                continue
+            combos.append(combo_index(suit_a * 13 + high, suit_b * 13 + low))
+    return combos
+
+
+_TOKEN = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)(\+)?$', re.IGNORECASE)
+_DASH = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)-([2-9TJQKA])([2-9TJQKA])([so]?)$', re.IGNORECASE)
+_COMBO = re.compile(r'^([2-9TJQKA][cdhs])([2-9TJQKA][cdhs])$', re.IGNORECASE)
+
+
+def _token_combos(token):
+    """將單一範圍記號（例如 'TT+'、'AQs+'、'A2s-A5s'、'AsKs'）展開成組合索引"""
+    if token.lower() in ('any', 'random', '*'):
+        return list(range(N_COMBOS))
+
+    match = _COMBO.match(token)
+    if match:
+        return [combo_index(match.group(1), match.group(2))]
+
+    match = _DASH.match(token)
+    if match:
+        first_high, first_low = _rank_index(match.group(1)), _rank_index(match.group(2))
+        last_high, last_low = _rank_index(match.group(4)), _rank_index(match.group(5))
+        kind = match.group(3).lower()
+        combos = []
+        if first_high == first_low and last_high == last_low:  # 對子區間，例如 22-55
+            for rank in range(min(first_high, last_high), max(first_high, last_high) + 1):
+                combos += _class_combos(rank, rank, '')
+            return combos
+        if first_high != last_high:
+            raise ValueError(f"無效的範圍記號：{token}")
+        for low in range(min(first_low, last_low), max(first_low, last_low) + 1):
+            combos += _class_combos(first_high, low, kind)
+        return combos
+
+    match = _TOKEN.match(token)
+    if not match:
+        raise ValueError(f"無效的範圍記號：{token}")
+    high, low = _rank_index(match.group(1)), _rank_index(match.group(2))
+    high, low = max(high, low), min(high, low)
+    kind = match.group(3).lower()
+    if high == low and kind:
+        raise ValueError(f"對子不能指定同花或不同花：{token}")
+
+    if not match.group(4):
+        return _class_combos(high, low, kind)
+    combos = []
+    if high == low:  # TT+ 代表 TT 到 AA
+        for rank in range(high, 13):
+            combos += _class_combos(rank, rank, '')
+    else:  # AQs+ 代表 AQs、AKs（踢腳往上直到比高張小一級）
+        for kicker in range(low, high):
+            combos += _class_combos(high, kicker, kind)
+    return combos
+
+
+def parse_range(spec):
+    """
+    將範圍轉換為 1326 維的權重向量
+    :param spec: 範圍字串（例如 "TT+, AQs+, KQo, AJs:0.5"，冒號後為權重）、
+                 {組合或記號: 權重} 字典、長度 1326 的權重陣列，或 None（任意手牌）
+    :return: 長度 1326 的 float64 權重陣列
+    """
+    if spec is None:
+        return np.ones(N_COMBOS)
+    if isinstance(spec, np.ndarray) or isinstance(spec, (list, tuple)):
+        weights = np.asarray(spec, dtype=np.float64)
+        if weights.shape != (N_COMBOS,):
+            raise ValueError(f"權重向量長度必須為 {N_COMBOS}：{weights.shape}")
+        return weights
+    if isinstance(spec, dict):
+        items = spec.items()
+    else:
+        items = []
+        for part in spec.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            token, _, weight = part.partition(':')
+            items.append((token.strip(), float(weight) if weight else 1.0))
+
+    weights = np.zeros(N_COMBOS)
+    for token, weight in items:
+        weights[_token_combos(token)] = weight
+    return weights
+
+
+def _alias_table(weights):
+    """
+    以 Vose 別名法建立抽樣表，之後每次抽樣都是 O(1)
+    :param weights: 各組合的權重（只保留正權重的組合）
+    :return: (組合索引, 保留機率, 別名位置)；權重全部相同時保留機率與別名位置為 None（直接均勻抽樣）
+    """
+    combos = np.flatnonzero(weights > 0)
+    if np.all(weights[combos] == weights[combos[0]]):
+        return combos, None, None
+    scaled = weights[combos] * (len(combos) / weights[combos].sum())
+    prob = np.ones(len(combos))
+    alias = np.arange(len(combos))
+    small = [i for i in range(len(combos)) if scaled[i] < 1.0]
+    large = [i for i in range(len(combos)) if scaled[i] >= 1.0]
+    while small and large:
+        less, more = small.pop(), large.pop()
+        prob[less] = scaled[less]
+        alias[less] = more
+        scaled[more] -= 1.0 - scaled[less]
+        (small if scaled[more] < 1.0 else large).append(more)
+    return combos, prob, alias
+
+
+def _sample_combos(table, n, rng):
+    """依別名表抽出 n 個組合索引"""
+    combos, prob, alias = table
+    slot = (rng.random(n) * len(combos)).astype(np.intp)
+    if prob is None:
+        return combos[slot]
+    keep = rng.random(n) < prob[slot]
+    return combos[np.where(keep, slot, alias[slot])]
+
+
+def _sample_opponents(tables, n, rng):
+    """
+    抽出每次模擬所有對手的手牌：各對手獨立依範圍抽樣，對手之間有牌面衝突的模擬整組重新抽樣
+    （整組拒絕抽樣才能得到正確的聯合分布，只重抽衝突的對手會使結果依對手順序而不同）
+    :param tables: 每位對手的別名表
+    :param n: 模擬次數
+    :param rng: numpy 亂數產生器
+    :return: (對手手牌的組合索引 (n, 對手數)，已使用牌的 52 位元遮罩 (n,))
+    """
+    combos = np.empty((n, len(tables)), dtype=np.intp)
+    used = np.zeros(n, dtype=np.uint64)
+    pending = np.arange(n)
+    for _ in range(MAX_RESAMPLE_ROUNDS):
+        dealt = np.zeros(pending.size, dtype=np.uint64)
+        collided = np.zeros(pending.size, dtype=bool)
+        for i, table in enumerate(tables):
+            combos[pending, i] = _sample_combos(table, pending.size, rng)
+            masks = _COMBO_MASKS[combos[pending, i]]
+            collided |= (dealt & masks) != 0
+            dealt |= masks
+        used[pending] = dealt
+        pending = pending[collided]
+        if not pending.size:
+            return combos, used
+    raise ValueError("對手範圍之間衝突過多，無法抽出不重複的手牌")
+
+
+def range_equity(own_cards, opponent_ranges, common_cards=None, trials=DEFAULT_TRIALS, seed=None,
+                 dead_cards=None):
+    """
+    計算對上各對手範圍（加權手牌組合）的勝率
+    與已知牌衝突的組合會先從各範圍剔除，對手之間有衝突的模擬整組重新抽樣，
+    剩餘公共牌再從每次模擬各自的可用牌中隨機抽出
+    :param own_cards: 自己手中的兩張牌，例如['AS', 'KH']
+    :param opponent_ranges: 每位對手的範圍列表（格式見 parse_range，None 為任意手牌）
+    :param common_cards: （可選）桌面上已經揭示的公共牌
+    :param trials: 模擬次數
+    :param seed: （可選）亂數種子
+    :param dead_cards: （可選）已知不在牌堆中的牌（亮出、棄掉或燒掉的牌）
+    :return: 與 monte_carlo_equity 相同格式的字典
+    """
+    if not opponent_ranges:
+        raise ValueError("至少需要一位對手")
+    hero = cards_to_ints(own_cards)
+    board = cards_to_ints(common_cards or [])
+    known = hero + board + cards_to_ints(dead_cards or [])
+    rng = np.random.default_rng(seed)
+    n_opponents = len(opponent_ranges)
+    n_missing = 5 - len(board)
+
+    # 剔除與已知牌衝突的組合後，建立每位對手的抽樣表
+    deck = _remaining_deck(known)
+    available = np.ones(52, dtype=bool)
+    available[known] = False
+    valid = available[COMBO_CARDS].all(axis=1)
+    tables = []
+    for spec in opponent_ranges:
+        weights = parse_range(spec) * valid
+        if weights.sum() <= 0:
+            raise ValueError(f"範圍在移除已知牌後沒有任何可用組合：{spec}")
+        tables.append(_alias_table(weights))
+
+    if len(deck) < n_missing + 2 * n_opponents:
+        raise ValueError(f"剩餘牌數不足以發給 {n_opponents} 位對手")
+
+    batch = min(trials, BATCH_SIZE)
+    hands = np.empty((batch, n_opponents + 1, 7), dtype=np.int8)
+    hands[:, 0, :2] = hero
+    hands[:, :, 2:2 + len(board)] = board
+
+    n_win = 0
+    n_tie = 0
+    done = 0
+    while done < trials:
+        n = min(batch, trials - done)
+        combos, used = _sample_opponents(tables, n, rng)
+        hands[:n, 1:, :2] = COMBO_CARDS[combos]
+
+        # 剩餘公共牌逐張從牌堆均勻抽出，抽到已發出的牌時只重抽那些模擬
+        for j in range(n_missing):
+            card = deck[(rng.random(n) * len(deck)).astype(np.intp)]
+            pending = np.flatnonzero(used & _CARD_MASKS[card])
+            while pending.size:
+                card[pending] = deck[(rng.random(pending.size) * len(deck)).astype(np.intp)]
+                pending = pending[(used[pending] & _CARD_MASKS[card[pending]]) != 0]
+            used |= _CARD_MASKS[card]
+            hands[:n, :, 2 + len(board) + j] = card[:, None]
+
+        scores = evaluate_many(hands[:n].reshape(-1, 7)).reshape(n, n_opponents + 1)
+        best_opponent = scores[:, 1:].max(axis=1)
+        n_win += int(np.count_nonzero(scores[:, 0] > best_opponent))
+        n_tie += int(np.count_nonzero(scores[:, 0] == best_opponent))
+        done += n
+    return equity_result(n_win, n_tie, trials)
@@ -0,0 +1,304 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import time
+from collections import Counter
+
+import numpy as np
+
+from equity import DEFAULT_TRIALS
+from game_state import GameState
+
+CORE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DUMP_PATH = os.path.join(os.path.dirname(CORE_DIR), 'poker_db.sql')
+TABLE = 'game_history'
+# 傾印檔沒有 CREATE TABLE 時使用的欄位順序（與 poker_db.sql 相同）
+DEFAULT_COLUMNS = ['id', 'user_id', 'session_id', 'screenshot_path', 'game_state', 'player_cards', 'board_cards',
+                   'position', 'pot_size', 'action_taken', 'action_amount', 'ai_decision', 'timestamp']
+AMOUNT_TOLERANCE = 1e-6
+PERCENTILES = (50, 90, 99)
+
+# mysqldump 的 VALUES 內容：字串（反斜線跳脫）、NULL、數字，以及括號與逗號
+_TOKEN = re.compile(r"\s*(?:'((?:[^'\\]|\\.)*)'|(NULL)|([(),;])|([^\s,()';]+))", re.S)
+_ESCAPE = re.compile(r"\\(.)", re.S)
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+
+def _unescape(text):
+    """還原 mysqldump 字串的反斜線跳脫"""
+    return _ESCAPE.sub(lambda match: _ESCAPES.get(match.group(1), match.group(1)), text)
+
+
+def _number(text):
+    """將未加引號的值轉換為數字（無法轉換時保留原字串）"""
+    try:
+        return float(text) if '.' in text or 'e' in text.lower() else int(text)
+    except ValueError:
+        return text
+
+
+def _parse_values(text):
+    """逐列解析 INSERT ... VALUES 之後的內容，產生每列的值列表"""
+    row = None
+    for match in _TOKEN.finditer(text):
+        string, null, symbol, bare = match.groups()
+        if symbol == '(':
+            row = []
+        elif symbol == ')':
+            if row is not None:
+                yield row
+            row = None
+        elif symbol is None and row is not None:
+            if string is not None:
+                row.append(_unescape(string))
+            elif null:
+                row.append(None)
+            else:
+                row.append(_number(bare))
+
+
+def iter_dump_rows(path=DEFAULT_DUMP_PATH, table=TABLE):
+    """
+    逐列讀取 mysqldump 傾印檔中某個資料表的 INSERT 資料（每個 INSERT 敘述佔一行，與 mysqldump 輸出相同）
+    :param path: .sql 傾印檔路徑
+    :param table: 資料表名稱
+    :return: 產生 {欄位: 值} 字典的產生器
+    """
+    create_prefix = f'CREATE TABLE `{table}`'
+    insert_prefix = f'INSERT INTO `{table}` VALUES '
+    columns = DEFAULT_COLUMNS
+    in_create = False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith(create_prefix):
+                in_create, columns = True, []
+            elif in_create:
+                column = re.match(r'\s*`([^`]+)`', line)
+                if column:
+                    columns.append(column.group(1))
+                else:
+                    in_create = False
+            elif line.startswith(insert_prefix):
+                for values in _parse_values(line[len(insert_prefix):]):
+                    yield dict(zip(columns, values))
+
+
+def iter_db_rows(fetch_size=1000, table=TABLE):
+    """
+    以環境變數（DB_HOST、DB_USER、DB_PASSWORD、DB_NAME、DB_PORT）連接資料庫，依 id 逐批讀取
+    :param fetch_size: 每次從伺服器取回的列數
+    :param table: 資料表名稱
+    :return: 產生 {欄位: 值} 字典的產生器
+    """
+    import mysql.connector
+
+    connection = mysql.connector.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+        database=os.getenv('DB_NAME'),
+        port=int(os.getenv('DB_PORT', '3306'))
+    )
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(f"SELECT id, game_state, ai_decision FROM `{table}` ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
+    finally:
+        connection.close()
+
+
+def _stored_decision(row):
+    """解析資料列中記錄的決策，沒有動作時回傳 None"""
+    try:
+        decision = json.loads(row.get('ai_decision') or 'null')
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(decision, dict) or 'action' not in decision:
+        return None
+    return decision
+
+
+def _same_decision(stored, current):
+    """動作相同且金額在容許誤差內"""
+    return (stored['action'] == current['action']
+            and abs(float(stored.get('amount') or 0) - float(current.get('amount') or 0)) <= AMOUNT_TOLERANCE)
+
+
+def _row_equity(state, trials, seed):
+    """
+    與 main.py 相同的方式計算勝率（勝率 + 平局率 / 2），手牌無法辨識或無法計算時為 None
+    :param state: GameState
+    :param trials: 模擬次數
+    :param seed: 亂數種子（使重播結果可重現）
+    """
+    if len(state.hand) != 2:
+        return None
+    from equity_session import EquitySession
+    try:
+        session = EquitySession(list(state.hand), max(len(state.player_stacks), 2), trials=trials, seed=seed)
+        equity = session.update(list(state.board))
+    except ValueError:
+        return None
+    return equity['win'] + equity['tie'] / 2
+
+
+def _batches(rows, batch_size):
+    """將資料列串流切成固定大小的批次"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def replay(rows, bot, batch_size=256, max_examples=20, equity_trials=0):
+    """
+    以目前的 PokerBot 重新決策歷史記錄，比對記錄中的決策
+    :param rows: 資料列的可迭代物件（需有 id、game_state、ai_decision 欄位）
+    :param bot: PokerBot
+    :param batch_size: 每次 get_decisions 的狀態數
+    :param max_examples: 保留的差異範例數
+    :param equity_trials: 每列重新計算勝率的模擬次數並傳給 get_decisions（與 main.py 相同以期望值決定加注尺寸），
+                          0 表示不計算（加注尺寸只來自模型，與正式環境不同）
+    :return: 結果字典（差異統計、動作轉換次數、批次延遲百分位數與吞吐量）
+    """
+    counts = Counter()
+    transitions = Counter()
+    examples = []
+    latencies = []
+    decide_seconds = 0.0
+    equity_seconds = 0.0
+    start = time.perf_counter()
+
+    for batch in _batches(rows, batch_size):
+        records = []
+        states = []
+        for row in batch:
+            counts['rows'] += 1
+            try:
+                states.append(GameState.from_json(row['game_state']))
+                records.append(row)
+            except (TypeError, ValueError, AttributeError) as e:
+                counts['invalid_states'] += 1
+                print(f"略過無法解析的遊戲狀態（id {row.get('id')}）：{str(e)}")
+        if not states:
+            continue
+
+        equities = None
+        if equity_trials > 0:
+            equity_start = time.perf_counter()
+            equities = [_row_equity(state, equity_trials, row.get('id')) for row, state in zip(records, states)]
+            equity_seconds += time.perf_counter() - equity_start
+
+        batch_start = time.perf_counter()
+        decisions = bot.get_decisions(states, equities)
+        elapsed = time.perf_counter() - batch_start
+        latencies.append(elapsed)
+        decide_seconds += elapsed
+
+        for row, state, decision in zip(records, states, decisions):
+            counts['replayed'] += 1
+            if 'error' in decision:
+                counts['errors'] += 1
+            stored = _stored_decision(row)
+            if stored is None:
+                counts['missing_decisions'] += 1
+                continue
+            counts['compared'] += 1
+            if _same_decision(stored, decision):
+                continue
+            counts['diffs'] += 1
+            if stored['action'] != decision['action']:
+                counts['action_diffs'] += 1
+            transitions[f"{stored['action']} -> {decision['action']}"] += 1
+            if len(examples) < max_examples:
+                examples.append({'id': row.get('id'), 'state': repr(state), 'stored': stored,
+                                 'current': {'action': decision['action'], 'amount': decision['amount']}})
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'rows': counts['rows'],
+        'replayed': counts['replayed'],
+        'invalid_states': counts['invalid_states'],
+        'errors': counts['errors'],
+        'missing_decisions': counts['missing_decisions'],
+        'compared': counts['compared'],
+        'diffs': counts['diffs'],
+        'diff_rate': counts['diffs'] / counts['compared'] if counts['compared'] else 0.0,
+        'action_diffs': counts['action_diffs'],
+        'equity_trials': equity_trials,
+        'transitions': dict(transitions.most_common()),
+        'examples': examples,
+        'batch_size': batch_size,
+        'batches': len(latencies),
+        'batch_latency_ms': {f'p{q}': float(np.percentile(latencies_ms, q)) if len(latencies_ms) else 0.0
+                             for q in PERCENTILES},
+        'states_per_second': counts['replayed'] / decide_seconds if decide_seconds else 0.0,
+        'equity_seconds': equity_seconds,
+        'seconds': time.perf_counter() - start
+    }
+
+
+def print_report(report):
+    """輸出重播結果摘要"""
+    print(f"資料列 {report['rows']:,}，重新決策 {report['replayed']:,}，"
+          f"無法解析 {report['invalid_states']:,}，決策錯誤 {report['errors']:,}，無原決策 {report['missing_decisions']:,}")
+    print(f"決策差異：{report['diffs']:,} / {report['compared']:,}（{report['diff_rate']:.1%}），"
+          f"其中動作不同 {report['action_diffs']:,}")
+    if report['equity_trials']:
+        print(f"已重新計算勝率（每列 {report['equity_trials']:,} 次模擬，耗時 {report['equity_seconds']:.2f} 秒）")
+    else:
+        print("未傳入勝率：加注尺寸只來自模型，正式環境（main.py）會以期望值決定尺寸，金額差異僅供參考")
+    for transition, count in report['transitions'].items():
+        print(f"  {transition}：{count:,}")
+    for example in report['examples']:
+        stored, current = example['stored'], example['current']
+        print(f"  id {example['id']}：{example['state']}  "
+              f"{stored['action']} {stored.get('amount', 0)} -> {current['action']} {current['amount']}")
+    latency = '，'.join(f"{name} {value:.2f} ms" for name, value in report['batch_latency_ms'].items())
+    print(f"批次延遲（{report['batches']:,} 批，每批 {report['batch_size']} 筆）：{latency}")
+    print(f"吞吐量：{report['states_per_second']:,.0f} 狀態/秒，總耗時 {report['seconds']:.2f} 秒")
+
+
+if __name__ == '__main__':
+    from poker_bot import PokerBot
+    from selfplay import default_model_path
+
+    parser = argparse.ArgumentParser(description='以目前的 PokerBot 重播 game_history，比對決策差異與效能')
+    parser.add_argument('--dump', default=DEFAULT_DUMP_PATH, help='mysqldump 傾印檔路徑（未指定 --db 時使用）')
+    parser.add_argument('--db', action='store_true', help='改為從資料庫讀取（使用 DB_* 環境變數）')
+    parser.add_argument('--model', default=None, help='模型文件路徑（預設優先使用 model.bin）')
+    parser.add_argument('--batch-size', type=int, default=256, help='每次批次決策的狀態數')
+    parser.add_argument('--memo-size', type=int, default=0, help='決策快取容量（0 為停用）')
+    parser.add_argument('--equity', action='store_true', help='每列重新計算勝率並傳給 get_decisions（與 main.py 相同）')
+    parser.add_argument('--equity-trials', type=int, default=DEFAULT_TRIALS, help='重新計算勝率時的模擬次數')
+    parser.add_argument('--examples', type=int, default=20, help='列出的差異範例數')
+    parser.add_argument('--output', default=None, help='（可選）結果 JSON 檔案路徑')
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot = PokerBot(model_path=args.model or default_model_path(), memo_size=args.memo_size)
+    if args.db:
+        from dotenv import load_dotenv
+        load_dotenv()
+        source = iter_db_rows()
+    else:
+        source = iter_dump_rows(args.dump)
+    report = replay(source, bot, batch_size=args.batch_size, max_examples=args.examples,
+                    equity_trials=args.equity_trials if args.equity else 0)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果已寫入：{args.output}")
@@ -0,0 +1,367 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+from equity import _get_executor
+from hand_evaluator import evaluate_many, hand_category
+
+# 動作代碼：棄牌、過牌或跟注、加注（加注額為超過目前最高下注的部分，單位為大盲）
+FOLD, CALL, RAISE = 0, 1, 2
+
+SMALL_BLIND = 0.5
+BIG_BLIND = 1.0
+STARTING_STACK = 100.0  # 每手牌開始時的籌碼（大盲），每手重新補滿
+BOARD_SIZES = [0, 3, 4, 5]  # 各條街的公共牌數量
+
+
+class CallPolicy:
+    """永遠過牌或跟注的基準對手"""
+    name = 'call'
+
+    def __init__(self, rng=None):
+        pass
+
+    def act(self, obs):
+        n = len(obs['to_call'])
+        return np.full(n, CALL, dtype=np.int8), np.zeros(n)
+
+
+class RandomPolicy:
+    """隨機行動的基準對手：10% 棄牌、60% 跟注、30% 加注半個到一個底池"""
+    name = 'random'
+
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+
+    def act(self, obs):
+        n = len(obs['to_call'])
+        actions = np.searchsorted([0.1, 0.7], self.rng.random(n), side='right').astype(np.int8)
+        return actions, obs['pot'] * self.rng.uniform(0.5, 1.0, n)
+
+
+class TightPolicy:
+    """
+    依牌力行動的基準對手：翻牌前只玩對子與兩張 T 以上的高牌，
+    翻牌後兩對以上加注一個底池、一對跟注，其餘過牌或棄牌
+    """
+    name = 'tight'
+
+    def __init__(self, rng=None):
+        pass
+
+    def act(self, obs):
+        hole = obs['hole']
+        ranks = hole % 13
+        n = len(hole)
+        actions = np.full(n, FOLD, dtype=np.int8)
+        sizes = obs['pot'].copy()
+
+        preflop = obs['n_board'] == 0
+        pair = ranks[:, 0] == ranks[:, 1]
+        high = ranks.min(axis=1) >= 8  # 兩張都是 T 以上
+        actions[preflop & (pair | high)] = CALL
+        actions[preflop & ((pair & (ranks[:, 0] >= 9)) | (high & (ranks.max(axis=1) == 12)))] = RAISE
+
+        postflop = np.flatnonzero(~preflop)
+        if postflop.size:
+            # 公共牌數量不同的列分開評估（評估器需要固定張數）
+            category = np.zeros(n, dtype=np.int64)
+            for n_board in (3, 4, 5):
+                rows = postflop[obs['n_board'][postflop] == n_board]
+                if rows.size:
+                    cards = np.hstack([hole[rows], obs['board'][rows, :n_board]])
+                    category[rows] = hand_category(evaluate_many(cards))
+            actions[postflop[category[postflop] == 1]] = CALL
+            actions[postflop[category[postflop] >= 2]] = RAISE
+        return actions, sizes
+
+
+def default_model_path():
+    """PokerBot 預設使用的模型檔：有二進位模型時優先使用"""
+    core_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.join(core_dir, 'model.bin')
+    return model_path if os.path.exists(model_path) else os.path.join(core_dir, 'model.json')
+
+
+def observation_states(obs):
+    """將批次觀察轉換為 PokerBot 使用的 GameState 列表"""
+    from game_state import GameState
+
+    states = []
+    for i in range(len(obs['to_call'])):
+        states.append(GameState(
+            hand_cards=obs['hole'][i].tolist(),
+            community_cards=obs['board'][i, :obs['n_board'][i]].tolist(),
+            pot_size=obs['pot'][i],
+            current_bet=obs['to_call'][i],
+            player_stacks={str(seat): stack for seat, stack in enumerate(obs['stacks'][i].tolist())}
+        ))
+    return states
+
+
+def decisions_to_actions(decisions, obs):
+    """
+    將 PokerBot 格式的決策轉換為引擎的動作代碼與加注額
+    決策的 amount 為本次投入的籌碼（跟注 + 加注額）；面對下注時的過牌視為棄牌
+    """
+    n = len(decisions)
+    actions = np.full(n, CALL, dtype=np.int8)
+    sizes = np.zeros(n)
+    for i, decision in enumerate(decisions):
+        if decision['action'] == 'raise':
+            actions[i] = RAISE
+            sizes[i] = max(float(decision['amount'] or 0) - obs['to_call'][i], 0)
+        elif decision['action'] == 'fold' or (decision['action'] == 'check' and obs['to_call'][i] > 0):
+            actions[i] = FOLD
+    return actions, sizes
+
+
+class PokerBotPolicy:
+    """以 PokerBot.get_decisions 批次決策"""
+    name = 'pokerbot'
+
+    def __init__(self, rng=None, model_path=None):
+        from poker_bot import PokerBot
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.bot = PokerBot(model_path=model_path or default_model_path(), memo_size=65536)
+
+    def act(self, obs):
+        decisions = self.bot.get_decisions(observation_states(obs))
+        return decisions_to_actions(decisions, obs)
+
+
+POLICIES = {policy.name: policy for policy in (CallPolicy, RandomPolicy, TightPolicy, PokerBotPolicy)}
+
+
+def _next_seats(seats, can_act):
+    """每張桌子從 seats 的下一個座位開始，找出第一個還能行動的座位"""
+    n_seats = can_act.shape[1]
+    candidates = (seats[:, None] + np.arange(1, n_seats + 1)) % n_seats
+    first = np.argmax(np.take_along_axis(can_act, candidates, axis=1), axis=1)
+    return candidates[np.arange(len(seats)), first]
+
+
+def _showdown(contrib, folded, scores):
+    """
+    依投入金額分層計算主池與邊池，每一層由仍在牌局中、且投入達到該層的最大牌力平分
+    :param contrib: 每位玩家投入的總金額 (N, P)
+    :param folded: 是否已棄牌 (N, P)
+    :param scores: 七張牌的牌力 (N, P)
+    :return: 每位玩家分得的金額 (N, P)
+    """
+    payout = np.zeros_like(contrib)
+    scores = np.where(folded, -1, scores.astype(np.int64))
+    levels = np.sort(contrib, axis=1)
+    previous = np.zeros(len(contrib))
+    for k in range(contrib.shape[1]):
+        level = levels[:, k]
+        layer = (np.minimum(contrib, level[:, None]) - np.minimum(contrib, previous[:, None])).sum(axis=1)
+        eligible = ~folded & (contrib >= level[:, None])
+        # 投入達到該層的玩家都已棄牌時，這層歸還給仍在牌局中的玩家比牌
+        nobody = ~eligible.any(axis=1)
+        eligible[nobody] = ~folded[nobody]
+        best = np.where(eligible, scores, -2).max(axis=1)
+        winners = eligible & (scores == best[:, None])
+        payout += layer[:, None] * winners / winners.sum(axis=1, keepdims=True)
+        previous = level
+    return payout
+
+
+def play_hands(policies, n_tables, rng, rotation=0, stack=STARTING_STACK):
+    """
+    所有桌子同步進行一手無限注德州撲克（按鈕固定在 0 號座位，座位順序依 rotation 輪換）
+    :param policies: 每個參賽者的策略物件，數量即為每桌人數
+    :param n_tables: 同時進行的桌數
+    :param rng: numpy 亂數產生器
+    :param rotation: 座位輪換量，第 t 桌 s 號座位由參賽者 (s + rotation + t) % 人數 使用
+    :param stack: 起始籌碼（大盲），也可以是每個座位各自的起始籌碼
+    :return: 每個參賽者在每一桌的輸贏 (n_tables, 人數)，單位為大盲
+    """
+    n_seats = len(policies)
+    rows = np.arange(n_tables)
+    cards = np.argsort(rng.random((n_tables, 52)), axis=1)[:, :2 * n_seats + 5].astype(np.int8)
+    hole = cards[:, :2 * n_seats].reshape(n_tables, n_seats, 2)
+    board = cards[:, 2 * n_seats:]
+    owner = (np.arange(n_seats)[None, :] + rotation + rows[:, None]) % n_seats
+
+    stacks = np.broadcast_to(np.asarray(stack, dtype=float), (n_tables, n_seats)).copy()
+    contrib = np.zeros((n_tables, n_seats))
+    street_bet = np.zeros((n_tables, n_seats))
+    folded = np.zeros((n_tables, n_seats), dtype=bool)
+
+    # 盲注：單挑時按鈕為小盲
+    small_blind, big_blind = (0, 1) if n_seats == 2 else (1, 2)
+    for seat, blind in ((small_blind, SMALL_BLIND), (big_blind, BIG_BLIND)):
+        paid = np.minimum(stacks[:, seat], blind)
+        stacks[:, seat] -= paid
+        street_bet[:, seat] = paid
+        contrib[:, seat] = paid
+
+    for street, n_board in enumerate(BOARD_SIZES):
+        if street > 0:
+            street_bet[:] = 0
+        current_max = street_bet.max(axis=1)
+        min_raise = np.full(n_tables, BIG_BLIND)
+        acted = np.zeros((n_tables, n_seats), dtype=bool)
+        first = (big_blind + 1) % n_seats if street == 0 else 1 % n_seats
+        to_act = _next_seats(np.full(n_tables, first - 1), ~folded & (stacks > 0))
+
+        while True:
+            can_act = ~folded & (stacks > 0)
+            needs_action = can_act & (~acted | (street_bet < current_max[:, None]))
+            live = (~folded).sum(axis=1) > 1
+            # 只剩一位可行動的玩家且已跟上最高下注時，不需要再行動
+            settled = (can_act.sum(axis=1) <= 1) & ((street_bet >= current_max[:, None]) | ~can_act).all(axis=1)
+            pending = np.flatnonzero(live & needs_action.any(axis=1) & ~settled)
+            if not pending.size:
+                break
+            seats = to_act[pending]
+            # 輪到的座位已不需行動（例如已全下）時，先移到下一位需要行動的玩家
+            skip = ~needs_action[pending, seats]
+            if skip.any():
+                to_act[pending[skip]] = _next_seats(seats[skip] - 1, needs_action[pending[skip]])
+                seats = to_act[pending]
+
+            to_call = current_max[pending] - street_bet[pending, seats]
+            actions = np.empty(len(pending), dtype=np.int8)
+            sizes = np.empty(len(pending))
+            players = owner[pending, seats]
+            for index, policy in enumerate(policies):
+                mask = players == index
+                if not mask.any():
+                    continue
+                tables = pending[mask]
+                obs = {
+                    'table': tables,
+                    'hole': hole[tables, seats[mask]],
+                    'board': board[tables],
+                    'n_board': np.full(len(tables), n_board),
+                    'pot': contrib[tables].sum(axis=1),
+                    'to_call': to_call[mask],
+                    'stack': stacks[tables, seats[mask]],
+                    'stacks': stacks[tables],
+                    'min_raise': min_raise[tables],
+                    'position': seats[mask],  # 距離按鈕的座位數
+                    'n_active': (~folded[tables]).sum(axis=1)
+                }
+                actions[mask], sizes[mask] = policy.act(obs)
+
+            # 不需跟注時棄牌視為過牌；已行動過的玩家只面對不完整的全下加注時，不能再加注
+            actions[(actions == FOLD) & (to_call <= 0)] = CALL
+            actions[(actions == RAISE) & acted[pending, seats]] = CALL
+            fold = actions == FOLD
+            folded[pending[fold], seats[fold]] = True
+
+            raise_to = current_max[pending] + np.maximum(sizes, min_raise[pending])
+            target = np.where(actions == RAISE, raise_to, current_max[pending])
+            pay = np.clip(target - street_bet[pending, seats], 0, stacks[pending, seats])
+            pay[fold] = 0
+            stacks[pending, seats] -= pay
+            street_bet[pending, seats] += pay
+            contrib[pending, seats] += pay
+
+            # 加注：完整加注才更新最小加注額並重新開放加注；不完整的全下加注只需要其他玩家補齊跟注
+            new_bet = street_bet[pending, seats]
+            increase = new_bet - current_max[pending]
+            raised = increase > 0
+            full_raise = raised & (increase >= min_raise[pending])
+            min_raise[pending[full_raise]] = increase[full_raise]
+            current_max[pending[raised]] = new_bet[raised]
+            acted[pending[full_raise]] = False
+            acted[pending, seats] = True
+            to_act[pending] = _next_seats(seats, ~folded[pending] & (stacks[pending] > 0))
+
+    hands = np.concatenate([hole, np.broadcast_to(board[:, None, :], (n_tables, n_seats, 5))], axis=2)
+    scores = evaluate_many(hands.reshape(-1, 7)).reshape(n_tables, n_seats)
+    net = _showdown(contrib, folded, scores) - contrib
+
+    result = np.empty_like(net)
+    result[rows[:, None], owner] = net
+    return result
+
+
+def _play_shard(lineup, n_tables, n_hands, seed_sequence, stack=STARTING_STACK):
+    """在子行程中建立策略並連續進行 n_hands 輪，回傳每桌每手的輸贏 (n_hands * n_tables, 人數)"""
+    rng = np.random.default_rng(seed_sequence)
+    policies = [POLICIES[name](rng=rng) for name in lineup]
+    return np.vstack([play_hands(policies, n_tables, rng, rotation=hand, stack=stack) for hand in range(n_hands)])
+
+
+def summarize(lineup, results, confidence=0.95):
+    """
+    計算每個參賽者的 bb/100 與信賴區間（同名參賽者合併計算每個座位的平均）
+    :param lineup: 參賽者名稱列表
+    :param results: 每桌每手的輸贏 (手數, 人數)
+    :return: {名稱: {'bb_per_100', 'ci_low', 'ci_high', 'hands'}}
+    """
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    summary = {}
+    for name in dict.fromkeys(lineup):
+        samples = results[:, [i for i, player in enumerate(lineup) if player == name]].mean(axis=1) * 100
+        mean = float(samples.mean())
+        half_width = z * float(samples.std(ddof=1)) / len(samples) ** 0.5 if len(samples) > 1 else float('inf')
+        summary[name] = {'bb_per_100': mean, 'ci_low': mean - half_width, 'ci_high': mean + half_width,
+                         'hands': len(samples)}
+    return summary
+
+
+def run_match(lineup, n_tables=1000, n_hands=100, workers=None, seed=None, stack=STARTING_STACK):
+    """
+    讓多個策略自我對戰並回報 bb/100
+    :param lineup: 每桌座位的參賽者名稱，例如 ['pokerbot', 'call']（見 POLICIES）
+    :param n_tables: 每個工作行程同步進行的桌數
+    :param n_hands: 每張桌子進行的手數
+    :param workers: （可選）工作行程數，預設為 CPU 核心數
+    :param seed: （可選）亂數種子
+    :param stack: 起始籌碼（大盲）
+    :return: summarize 的結果，另含 total_hands、seconds 與 hands_per_hour
+    """
+    for name in lineup:
+        if name not in POLICIES:
+            raise ValueError(f"不支援的策略：{name}（可用：{', '.join(POLICIES)}）")
+    if not 2 <= len(lineup) <= 9:
+        raise ValueError(f"每桌人數必須為 2-9：{len(lineup)}")
+    workers = workers or os.cpu_count() or 1
+    seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+
+    start = time.time()
+    if workers == 1:
+        results = _play_shard(lineup, n_tables, n_hands, seed_sequences[0], stack)
+    else:
+        executor = _get_executor(workers)
+        futures = [executor.submit(_play_shard, lineup, n_tables, n_hands, seed_sequence, stack)
+                   for seed_sequence in seed_sequences]
+        results = np.vstack([future.result() for future in futures])
+    elapsed = time.time() - start
+
+    summary = summarize(lineup, results)
+    summary['total_hands'] = len(results)
+    summary['seconds'] = elapsed
+    summary['hands_per_hour'] = len(results) / elapsed * 3600
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='以自我對戰評估 PokerBot（bb/100 與信賴區間）')
+    parser.add_argument('--lineup', nargs='+', default=['pokerbot', 'call'],
+                        help=f"每桌座位的參賽者（可用：{', '.join(POLICIES)}）")
+    parser.add_argument('--tables', type=int, default=1000, help='每個工作行程同步進行的桌數')
+    parser.add_argument('--hands', type=int, default=100, help='每張桌子進行的手數')
+    parser.add_argument('--workers', type=int, default=None, help='工作行程數')
+    parser.add_argument('--seed', type=int, default=None, help='亂數種子')
+    args = parser.parse_args()
+
+    summary = run_match(args.lineup, n_tables=args.tables, n_hands=args.hands, workers=args.workers,
+                        seed=args.seed)
+    for name in dict.fromkeys(args.lineup):
+        item = summary[name]
+        print(f"{name:>10}：{item['bb_per_100']:+8.2f} bb/100"
+              f"（95% 信賴區間 {item['ci_low']:+.2f} ~ {item['ci_high']:+.2f}）")
+    print(f"共 {summary['total_hands']:,} 手，{summary['seconds']:.1f} 秒"
+          f"（{summary['hands_per_hour']:,.0f} 手/小時）")
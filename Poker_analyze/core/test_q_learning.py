@@ -0,0 +1,55 @@
+import numpy as np
+
+from bet_sizing import raise_chips
+from poker_bot import ACTIONS
+from q_learning import QLearningPolicy, QTrainer
+from selfplay import decisions_to_actions, observation_states
+
+# (底池, 需跟注金額)：沒有下注的底池 20，以及面對 5 的下注、底池 30
+SPOTS = [(20.0, 0.0), (30.0, 5.0)]
+STACK = 500.0
+
+
+class FixedTrainer(QTrainer):
+    """固定選擇某個動作索引的訓練器"""
+
+    def __init__(self, index):
+        super().__init__(seed=0)
+        self.index = index
+
+    def select_actions(self, states, epsilon=0.0):
+        return np.full(len(states), self.index)
+
+
+def _observation():
+    n = len(SPOTS)
+    return {
+        'table': np.arange(n),
+        'hole': np.array([[12, 25]] * n),
+        'board': np.array([[0, 14, 28, 0, 0]] * n),
+        'n_board': np.full(n, 3),
+        'pot': np.array([pot for pot, _ in SPOTS]),
+        'to_call': np.array([to_call for _, to_call in SPOTS]),
+        'stacks': np.full((n, 2), STACK)
+    }
+
+
+def test_learner_raise_sizes_match_pokerbot():
+    obs = _observation()
+    policy = QLearningPolicy(FixedTrainer(0), epsilon=0.0)
+    states = observation_states(obs)
+    for index, action in enumerate(ACTIONS):
+        policy.trainer = FixedTrainer(index)
+        learner = policy.act(obs)
+        bot = decisions_to_actions([policy.bot._to_chips(dict(action), state) for state in states], obs)
+        assert np.array_equal(learner[0], bot[0])
+        assert np.allclose(learner[1], bot[1])
+        if action['action'] == 'raise':
+            # 加注額為底池倍數換算的籌碼（跟注之外再投入的部分）
+            expected = [raise_chips(action['amount'], pot, to_call, STACK) - to_call for pot, to_call in SPOTS]
+            assert np.allclose(learner[1], expected)
+
+
+if __name__ == '__main__':
+    test_learner_raise_sizes_match_pokerbot()
+    print("Q-learning 加注額測試通過")
@@ -0,0 +1,26 @@
+import numpy as np
+
+from ranges import COMBO_CARDS, _alias_table, _sample_opponents, parse_range, range_equity
+
+TRIALS = 200_000
+
+
+def test_opponent_order_does_not_change_joint_distribution():
+    # 對手範圍 AA,KK 與 AA：AA 對手固定拿走兩張 A，剩下的 A 只有 1 組，因此 P(第一位拿到 AA) = 1/7
+    tables = [_alias_table(parse_range(spec)) for spec in ('AA,KK', 'AA')]
+    combos, _ = _sample_opponents(tables, TRIALS, np.random.default_rng(0))
+    holds_aces = (COMBO_CARDS[combos[:, 0]] % 13 == 12).all(axis=1)
+    assert abs(holds_aces.mean() - 1 / 7) < 0.005
+
+
+def test_range_equity_independent_of_opponent_order():
+    forward = range_equity(['Qs', 'Js'], ['AA,KK', 'AA'], trials=TRIALS, seed=1)
+    reverse = range_equity(['Qs', 'Js'], ['AA', 'AA,KK'], trials=TRIALS, seed=2)
+    assert abs(forward['win'] - reverse['win']) < 0.006
+    assert abs(forward['tie'] - reverse['tie']) < 0.006
+
+
+if __name__ == '__main__':
+    test_opponent_order_does_not_change_joint_distribution()
+    test_range_equity_independent_of_opponent_order()
+    print("範圍抽樣測試通過")
@@ -0,0 +1,46 @@
+import numpy as np
+
+from selfplay import CALL, RAISE, play_hands
+
+
+class ScriptedPolicy:
+    """固定動作與加注額的策略，並記錄翻牌前每次面對的跟注額"""
+
+    def __init__(self, action, size=0.0):
+        self.action = action
+        self.size = size
+        self.preflop_to_call = []
+
+    def act(self, obs):
+        n = len(obs['to_call'])
+        self.preflop_to_call += obs['to_call'][obs['n_board'] == 0].tolist()
+        return np.full(n, self.action, dtype=np.int8), np.full(n, self.size)
+
+
+def _play_preflop(big_blind_stack):
+    """
+    三人桌（0 號按鈕、1 號小盲、2 號大盲）：按鈕加注到 3，小盲跟注，大盲以剩餘籌碼全下
+    :return: 小盲翻牌前每次面對的跟注額
+    """
+    button = ScriptedPolicy(RAISE, 2.0)
+    small_blind = ScriptedPolicy(CALL)
+    big_blind = ScriptedPolicy(RAISE, 1000.0)
+    play_hands([button, small_blind, big_blind], 1, np.random.default_rng(0),
+               stack=[100.0, 100.0, big_blind_stack])
+    return small_blind.preflop_to_call
+
+
+def test_short_all_in_does_not_reopen_betting():
+    # 大盲全下到 4，只比 3 多 1（不到最小加注額 2）：按鈕只能補齊跟注，小盲只需再跟 1
+    assert _play_preflop(4.0) == [2.5, 1.0]
+
+
+def test_full_all_in_raise_reopens_betting():
+    # 大盲全下到 10 是完整加注：按鈕可以再加注到 17，小盲需再跟 14
+    assert _play_preflop(10.0) == [2.5, 14.0]
+
+
+if __name__ == '__main__':
+    test_short_all_in_does_not_reopen_betting()
+    test_full_all_in_raise_reopens_betting()
+    print("短碼全下測試通過")